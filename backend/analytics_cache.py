@@ -0,0 +1,209 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from logging_setup import setup_logger
+
+logger = setup_logger("analytics_cache")
+
+
+class LocalCacheBackend:
+    """In-process LRU store with a per-entry expiry time."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def bump_generation(self):
+        with self._lock:
+            self._generation += 1
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl, generation=None):
+        """Store ``value`` unless the generation moved past ``generation``; returns whether it was stored."""
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCacheBackend:
+    """Store shared by several workers, kept in Redis. Requires the ``redis`` package."""
+
+    def __init__(self, url, prefix="analytics:"):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+        # Kept outside the prefix so keys() and clear() never see it.
+        self._generation_key = "generation:" + prefix
+
+    def get(self, key):
+        raw = self._client.get(self._prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    def generation(self):
+        return int(self._client.get(self._generation_key) or 0)
+
+    def bump_generation(self):
+        self._client.incr(self._generation_key)
+
+    def set(self, key, value, ttl, generation=None):
+        """Store ``value`` unless any worker bumped the generation past ``generation``.
+
+        The check and the write run as one WATCH/MULTI transaction on the generation key.
+        """
+        def store(pipe):
+            if generation is not None and int(pipe.get(self._generation_key) or 0) != generation:
+                return False
+            pipe.multi()
+            pipe.setex(self._prefix + key, int(max(ttl, 1)), json.dumps(value))
+            return True
+
+        return self._client.transaction(store, self._generation_key, value_from_callable=True)
+
+    def delete(self, key):
+        self._client.delete(self._prefix + key)
+
+    def keys(self):
+        return [
+            raw.decode()[len(self._prefix):]
+            for raw in self._client.scan_iter(match=self._prefix + "*")
+        ]
+
+    def clear(self):
+        for key in self.keys():
+            self.delete(key)
+
+
+class AnalyticsCache:
+    """Cache of analytics results keyed on the requested date range.
+
+    ``invalidate_date`` drops every cached range that contains the given date, so
+    a write to one day only evicts the ranges it can affect. The invalidation
+    generation lives in the backend, so with Redis a write on one worker also stops
+    a slow read on another from caching the result it read before the write.
+    """
+
+    def __init__(self, backend=None, ttl=60):
+        self.backend = backend or LocalCacheBackend()
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(start_date, end_date):
+        return f"{start_date.isoformat()}:{end_date.isoformat()}"
+
+    @staticmethod
+    def parse_key(key):
+        start, end = key.split(":")
+        return date.fromisoformat(start), date.fromisoformat(end)
+
+    @property
+    def generation(self):
+        """Counter bumped by every invalidation; pass it back to ``set``."""
+        return self.backend.generation()
+
+    def get(self, start_date, end_date):
+        value = self.backend.get(self.make_key(start_date, end_date))
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, start_date, end_date, value, generation=None):
+        """Store a result unless an invalidation happened since ``generation`` was read.
+
+        This keeps a slow read that raced with a write from caching the old result.
+        """
+        return self.backend.set(self.make_key(start_date, end_date), value, self.ttl, generation)
+
+    def invalidate_date(self, expense_date):
+        """Drop every cached range that covers ``expense_date``."""
+        return self.invalidate_range(expense_date, expense_date)
+
+    def invalidate_range(self, start_date, end_date):
+        """Drop every cached range that overlaps [start_date, end_date]."""
+        self.backend.bump_generation()
+        removed = 0
+        for key in self.backend.keys():
+            start, end = self.parse_key(key)
+            if start <= end_date and start_date <= end:
+                self.backend.delete(key)
+                removed += 1
+        with self._lock:
+            self.invalidations += removed
+        if removed:
+            logger.info("Invalidated %s cached analytics ranges overlapping %s - %s", removed, start_date, end_date)
+        return removed
+
+    def clear(self):
+        self.backend.bump_generation()
+        self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "entries": len(self.backend.keys()),
+                "ttl": self.ttl,
+            }
+
+
+def create_cache_from_env():
+    """Build the cache from ANALYTICS_CACHE_TTL, ANALYTICS_CACHE_SIZE and ANALYTICS_CACHE_URL.
+
+    When ANALYTICS_CACHE_URL (e.g. ``redis://localhost:6379/0``) is set, workers share
+    one Redis-backed cache; otherwise each process keeps its own LRU.
+    """
+    ttl = float(os.getenv("ANALYTICS_CACHE_TTL", "60"))
+    url = os.getenv("ANALYTICS_CACHE_URL")
+    if url:
+        backend = RedisCacheBackend(url)
+    else:
+        backend = LocalCacheBackend(max_entries=int(os.getenv("ANALYTICS_CACHE_SIZE", "256")))
+    return AnalyticsCache(backend=backend, ttl=ttl)
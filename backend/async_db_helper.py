@@ -0,0 +1,131 @@
+import asyncio
+from contextlib import asynccontextmanager
+import time
+import db_helper
+import metrics
+from logging_setup import SAMPLED, setup_logger
+
+logger = setup_logger("async_db_helper")
+
+_pool = None
+_pool_lock = asyncio.Lock()
+
+async def get_pool():
+    """Return the shared aiomysql pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                # Imported on first use: only BACKEND_MODE=async needs aiomysql.
+                import aiomysql
+
+                # autocommit keeps idle connections out of a transaction; aiomysql
+                # closes connections that are returned with one still open.
+                config = db_helper.get_mysql_config()
+                _pool = await aiomysql.create_pool(
+                    host=config["host"],
+                    port=config["port"],
+                    user=config["user"],
+                    password=config["password"],
+                    db=config["database"],
+                    minsize=1,
+                    maxsize=db_helper.pool_size,
+                    pool_recycle=int(db_helper.pool_recycle),
+                    autocommit=True,
+                )
+    return _pool
+
+async def close_pool():
+    """Close the pool and wait for its connections to shut down."""
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+
+def _pool_stats(pool):
+    return {
+        "max_size": pool.maxsize,
+        "size": pool.size,
+        "in_use": pool.size - pool.freesize,
+        "idle": pool.freesize,
+    }
+
+async def get_pool_stats():
+    """Return in-use/idle counts for the async connection pool."""
+    return _pool_stats(await get_pool())
+
+def peek_pool_stats():
+    """Return the pool's counts without creating it; empty before the first query."""
+    return _pool_stats(_pool) if _pool is not None else {}
+
+@asynccontextmanager
+async def get_db_cursor(commit=False):
+    import aiomysql
+
+    pool = await get_pool()
+    started = time.perf_counter()
+    connection = await asyncio.wait_for(pool.acquire(), timeout=db_helper.pool_timeout)
+    metrics.POOL_ACQUIRE_LATENCY.observe(time.perf_counter() - started, "async")
+    try:
+        async with connection.cursor(aiomysql.DictCursor) as cursor:
+            try:
+                if commit:
+                    await connection.begin()
+                yield cursor
+                if commit:
+                    await connection.commit()
+            except aiomysql.Error as err:
+                logger.error("Database connection error: %s", err)
+                if commit:
+                    await connection.rollback()
+                raise
+    finally:
+        pool.release(connection)
+
+
+async def fetch_expenses_for_date(expense_date):
+    """Fetch expenses for a specific date."""
+    logger.info("Fetching expenses for %s", expense_date, extra=SAMPLED)
+    try:
+        async with get_db_cursor() as cursor, metrics.observe_query_async("fetch_expenses_for_date") as timer:
+            await cursor.execute(db_helper.FETCH_FOR_DATE_QUERY, (expense_date,))
+            rows = await cursor.fetchall()
+            timer.rows = len(rows)
+            return rows
+    except Exception as e:
+        logger.error("Error fetching expenses for date %s: %s", expense_date, e)
+        return []
+
+async def replace_expenses_for_date(expense_date, expenses):
+    """Async counterpart of db_helper.replace_expenses_for_date."""
+    logger.info("Replacing expenses for %s with %s rows", expense_date, len(expenses))
+    async with get_db_cursor(commit=True) as cursor, metrics.observe_query_async("replace_expenses_for_date") as timer:
+        await cursor.execute(db_helper.LOCK_FOR_DATE_QUERY, (expense_date,))
+        stored = [(row["amount"], row["category"], row["notes"]) for row in await cursor.fetchall()]
+        if db_helper.expense_rows_match(stored, expenses):
+            logger.info("Expenses for %s unchanged, skipping write", expense_date)
+            timer.rows = 0
+            return False
+        await cursor.execute(db_helper.DELETE_FOR_DATE_QUERY, (expense_date,))
+        if expenses:
+            await cursor.executemany(db_helper.INSERT_EXPENSE_QUERY, [
+                (expense_date, amount, category, notes) for amount, category, notes in expenses
+            ])
+        await cursor.execute(db_helper.ROLLUP_DELETE_QUERY, (expense_date,))
+        await cursor.execute(db_helper.ROLLUP_REFRESH_QUERY, (expense_date,))
+        timer.rows = len(expenses)
+    return True
+
+async def fetch_expense_summary(start_date, end_date):
+    """Fetch summary of expenses between two dates from the daily rollup."""
+    logger.info("Fetching expense summary for %s to %s", start_date, end_date, extra=SAMPLED)
+    try:
+        async with get_db_cursor() as cursor, metrics.observe_query_async("fetch_expense_summary") as timer:
+            await cursor.execute(db_helper.SUMMARY_QUERY, (start_date, end_date))
+            rows = await cursor.fetchall()
+            timer.rows = len(rows)
+            return rows
+    except Exception as e:
+        logger.error("Error fetching expense summary: %s", e)
+        return []
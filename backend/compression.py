@@ -0,0 +1,163 @@
+import zlib
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it responses fall back to gzip
+    brotli = None
+
+ENCODINGS = ("br", "gzip")
+# Already compressed, or streamed to the client as it happens; sent as they are.
+EXCLUDED_CONTENT_TYPES = (
+    "application/gzip", "application/x-gzip", "application/zip", "text/event-stream",
+    "audio/*", "font/woff", "font/woff2", "image/*", "video/*",
+)
+# Chunks at least this large are compressed on a worker thread instead of the event loop.
+THREAD_MINIMUM_SIZE = 128 * 1024
+
+
+def accepts_encoding(accept_encoding, encoding):
+    """True when an Accept-Encoding header lists ``encoding`` without q=0."""
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() == encoding:
+            return params.replace(" ", "").lower() not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def encoded_etag(etag, encoding):
+    """The strong ETag of the ``encoding``-compressed body; weak ETags cover every encoding as they are."""
+    if not etag.startswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def strip_encoding(etag):
+    """Undo encoded_etag, so a client's If-None-Match can be compared with the identity ETag."""
+    for encoding in ENCODINGS:
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[: -len(suffix)] + '"'
+    return etag
+
+
+def _is_excluded(content_type):
+    media_type = content_type.partition(";")[0].strip().lower()
+    return media_type in EXCLUDED_CONTENT_TYPES or media_type.partition("/")[0] + "/*" in EXCLUDED_CONTENT_TYPES
+
+
+class GzipEncoder:
+    content_encoding = "gzip"
+
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, body, more_body):
+        return self._compressor.compress(body) + self._compressor.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+
+
+class BrotliEncoder:
+    content_encoding = "br"
+
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, body, more_body):
+        compressed = self._compressor.process(body)
+        # Streamed exports flush each chunk so the client can decode as it goes.
+        return compressed + (self._compressor.flush() if more_body else self._compressor.finish())
+
+
+class CompressingSend:
+    """The ``send`` of one response: holds back the start message until the first body chunk shows
+    whether the response is worth compressing, then rewrites its headers to match.
+    """
+
+    def __init__(self, send, encoder, minimum_size):
+        self.send = send
+        self.encoder = encoder
+        self.minimum_size = minimum_size
+        self.start = None
+        self.passthrough = False
+        self.compressing = False
+
+    async def _compress(self, body, more_body):
+        if len(body) >= THREAD_MINIMUM_SIZE:
+            return await anyio.to_thread.run_sync(self.encoder.compress, body, more_body)
+        return self.encoder.compress(body, more_body)
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self.passthrough = (
+                "content-encoding" in headers or message["status"] == 206
+                or _is_excluded(headers.get("content-type", ""))
+            )
+            if self.passthrough:
+                await self.send(message)
+            else:
+                self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send_start()
+            await self.send(message)
+            return
+        body, more_body = message.get("body", b""), message.get("more_body", False)
+        if self.start is None:
+            if self.compressing:
+                message["body"] = await self._compress(body, more_body)
+            await self.send(message)
+            return
+        if len(body) < self.minimum_size and not more_body:
+            await self._send_start()
+            await self.send(message)
+            return
+        self.compressing = True
+        message["body"] = await self._compress(body, more_body)
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers.add_vary_header("Accept-Encoding")
+        headers["Content-Encoding"] = self.encoder.content_encoding
+        if "etag" in headers:
+            headers["ETag"] = encoded_etag(headers["etag"], self.encoder.content_encoding)
+        if more_body:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(len(message["body"]))
+        await self._send_start()
+        await self.send(message)
+
+    async def _send_start(self):
+        if self.start is not None:
+            start, self.start = self.start, None
+            await self.send(start)
+
+
+class CompressionMiddleware:
+    """Compress responses of at least ``minimum_size`` bytes with brotli when the client
+    accepts it and the ``brotli`` package is installed, otherwise with gzip.
+
+    A compressed response's strong ETag gets the encoding as a suffix (``"v-7-br"``), so
+    each representation has its own validator; see strip_encoding.
+    """
+
+    def __init__(self, app, minimum_size=1000, compresslevel=6, brotli_quality=4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+        self.brotli_quality = brotli_quality
+
+    def _encoder(self, scope):
+        accept_encoding = Headers(scope=scope).get("Accept-Encoding", "")
+        if brotli is not None and accepts_encoding(accept_encoding, "br"):
+            return BrotliEncoder(self.brotli_quality)
+        if accepts_encoding(accept_encoding, "gzip"):
+            return GzipEncoder(self.compresslevel)
+        return None
+
+    async def __call__(self, scope, receive, send):
+        encoder = self._encoder(scope) if scope["type"] == "http" else None
+        if encoder is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, CompressingSend(send, encoder, self.minimum_size))
@@ -0,0 +1,114 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+
+
+class CachedExpense:
+    """One cached expense row; about a third of the size of the dict a dictionary cursor returns."""
+
+    __slots__ = ("amount", "category", "notes")
+
+    def __init__(self, amount, category, notes):
+        self.amount = amount
+        self.category = category
+        self.notes = notes
+
+
+def _row_size(record):
+    # The category string is interned and shared by every row, so only the row's own objects count.
+    return sys.getsizeof(record) + sys.getsizeof(record.amount) + sys.getsizeof(record.notes)
+
+
+class DayCache:
+    """Expense rows of recent dates, for GET /expenses/{date}.
+
+    Only dates within ``window_days`` of today are cached, least recently used first
+    out once the rows take more than ``max_bytes``. Each entry remembers the ETag of
+    its date when it was read; a lookup with a different ETag is a miss, so writes
+    from other workers are noticed as soon as the shared version store sees them.
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, window_days=60):
+        self.max_bytes = max_bytes
+        self.window_days = window_days
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _in_window(self, expense_date):
+        return self.max_bytes > 0 and expense_date >= date.today() - timedelta(days=self.window_days)
+
+    def get(self, expense_date, etag):
+        """The cached rows of ``expense_date`` as dicts, or None on a miss or a stale ETag."""
+        with self._lock:
+            entry = self._entries.get(expense_date)
+            if entry is None or entry[0] != etag:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(expense_date)
+            self.hits += 1
+            records = entry[1]
+        return [{"amount": r.amount, "category": r.category, "notes": r.notes} for r in records]
+
+    def set(self, expense_date, etag, rows):
+        """Cache ``rows`` (dicts with amount, category and notes) read while ``etag`` was current."""
+        if not rows or not self._in_window(expense_date):
+            return
+        records = tuple(
+            CachedExpense(float(row["amount"]), sys.intern(row["category"]), row["notes"]) for row in rows
+        )
+        size = sys.getsizeof(records) + sum(_row_size(record) for record in records)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._drop(expense_date)
+            self._entries[expense_date] = (etag, records, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def _drop(self, expense_date):
+        entry = self._entries.pop(expense_date, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def invalidate(self, expense_date):
+        with self._lock:
+            self._drop(expense_date)
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "dates": len(self._entries),
+                "rows": sum(len(entry[1]) for entry in self._entries.values()),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+def create_day_cache_from_env():
+    """DAY_CACHE_MAX_BYTES bounds the cache (0 disables it); DAY_CACHE_DAYS is how far back it reaches."""
+    return DayCache(
+        max_bytes=int(os.getenv("DAY_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+        window_days=int(os.getenv("DAY_CACHE_DAYS", "60")),
+    )
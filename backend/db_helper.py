@@ -1,8 +1,14 @@
 import os
+import threading
+from decimal import Decimal
 from dotenv import load_dotenv
 from contextlib import contextmanager
-import mysql.connector
-from logging_setup import setup_logger
+import metrics
+from logging_setup import SAMPLED, setup_logger
+from storage import (
+    DuckDBStore, ExpenseStore, SQLiteStore, build_expenses_page_query, build_range_totals_query,
+    expense_rows_match, range_totals_params, split_range_totals,
+)
 
 logger = setup_logger("db_helper")
 
@@ -15,105 +21,499 @@ def get_env_variable(var_name):
         raise ValueError(f"Missing required environment variable: {var_name}")
     return value
 
-# Retrieve and validate environment variables
-try:
-    host = get_env_variable("DB_HOST")
-    port = int(get_env_variable("DB_PORT"))
-    user = get_env_variable("DB_USER")
-    password = get_env_variable("DB_PASSWORD")
-    database = get_env_variable("DB_NAME")
-except ValueError as e:
-    logger.error(str(e))
-    raise
+# Storage engine: "mysql" (default), "sqlite" or "duckdb"; see storage.py. The embedded
+# engines keep their data in STORAGE_PATH and need none of the DB_* settings.
+storage_engine = os.getenv("STORAGE_ENGINE", "mysql").lower()
+storage_path = os.getenv("STORAGE_PATH", "expenses.db")
+if storage_engine not in ("mysql", "sqlite", "duckdb"):
+    raise ValueError(f"STORAGE_ENGINE must be 'mysql', 'sqlite' or 'duckdb', got {storage_engine!r}")
+
+# Connection pool settings (optional)
+pool_size = int(os.getenv("DB_POOL_SIZE", "5"))
+pool_timeout = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+pool_recycle = float(os.getenv("DB_POOL_RECYCLE", "1800"))
+pool_ping_interval = float(os.getenv("DB_POOL_PING_INTERVAL", "30"))
+
+# Read replicas (optional, MySQL only): comma-separated host[:port] list. Replicas further
+# than DB_REPLICA_MAX_LAG seconds behind the primary are skipped; see replication.py.
+replica_addresses = os.getenv("DB_REPLICAS", "")
+replica_max_lag = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+
+_mysql_config = None
+
+def get_mysql_config():
+    """Return the MySQL connection settings, read and validated on first use."""
+    global _mysql_config
+    if _mysql_config is None:
+        # Retrieve and validate environment variables
+        try:
+            _mysql_config = {
+                "host": get_env_variable("DB_HOST"),
+                "port": int(get_env_variable("DB_PORT")),
+                "user": get_env_variable("DB_USER"),
+                "password": get_env_variable("DB_PASSWORD"),
+                "database": get_env_variable("DB_NAME"),
+            }
+        except ValueError as e:
+            logger.error(str(e))
+            raise
+    return _mysql_config
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Return the shared MySQL connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Imported here so the embedded engines never load mysql.connector.
+                from db_pool import ConnectionPool
+
+                _pool = ConnectionPool(
+                    connect_args=get_mysql_config(),
+                    max_size=pool_size,
+                    acquire_timeout=pool_timeout,
+                    recycle_seconds=pool_recycle,
+                    ping_interval=pool_ping_interval,
+                    on_acquire=lambda waited: metrics.POOL_ACQUIRE_LATENCY.observe(waited, "sync"),
+                )
+    return _pool
+
+# daily_category_totals holds SUM(amount) per (expense_date, category). Every write
+# to a date rebuilds that date's rollup rows inside the same transaction.
+ROLLUP_DELETE_QUERY = "DELETE FROM daily_category_totals WHERE expense_date = %s"
+ROLLUP_REFRESH_QUERY = """
+    INSERT INTO daily_category_totals (expense_date, category, total)
+    SELECT expense_date, category, SUM(amount)
+    FROM expenses
+    WHERE expense_date = %s
+    GROUP BY expense_date, category
+"""
+
+# Statements used by more than one function (and by async_db_helper). query_plans.py
+# runs EXPLAIN on these to make sure none of them falls back to a full table scan.
+FETCH_FOR_DATE_QUERY = "SELECT * FROM expenses WHERE expense_date = %s"
+LOCK_FOR_DATE_QUERY = """
+    SELECT amount, category, notes FROM expenses
+    WHERE expense_date = %s
+    FOR UPDATE
+"""
+DELETE_FOR_DATE_QUERY = "DELETE FROM expenses WHERE expense_date = %s"
+INSERT_EXPENSE_QUERY = """
+    INSERT INTO expenses (expense_date, amount, category, notes)
+    VALUES (%s, %s, %s, %s)
+"""
+SUMMARY_QUERY = """
+    SELECT category, SUM(total) as total
+    FROM daily_category_totals
+    WHERE expense_date BETWEEN %s AND %s
+    GROUP BY category
+"""
 
 @contextmanager
-def get_db_cursor(commit=False):
-    connection = None
-    try:
-        connection = mysql.connector.connect(
-            host=host,
-            port=port,
-            user=user,
-            password=password,
-            database=database
-        )
-        cursor = connection.cursor(dictionary=True)
-        yield cursor
-        if commit:
-            connection.commit()
-    except mysql.connector.Error as err:
-        logger.error(f"Database connection error: {err}")
-        if commit:
-            connection.rollback()
-        raise
-    finally:
-        if cursor:
+def get_db_cursor(commit=False, pool=None):
+    """Yield a dictionary cursor on a MySQL connection; for the MySQL-only tools (migrate, rollup, query_plans)."""
+    if pool is None and storage_engine != "mysql":
+        raise RuntimeError(f"get_db_cursor needs STORAGE_ENGINE=mysql, not {storage_engine!r}")
+    import mysql.connector
+
+    with (pool if pool is not None else get_pool()).connection() as connection:
+        cursor = None
+        try:
+            cursor = connection.cursor(dictionary=True)
+            yield cursor
+            if commit:
+                connection.commit()
+        except mysql.connector.Error as err:
+            logger.error("Database connection error: %s", err)
+            if commit:
+                connection.rollback()
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+
+
+def refresh_rollup_for_date(cursor, expense_date):
+    """Recompute the daily_category_totals rows of one date using an open cursor."""
+    cursor.execute(ROLLUP_DELETE_QUERY, (expense_date,))
+    cursor.execute(ROLLUP_REFRESH_QUERY, (expense_date,))
+
+
+def build_monthly_summary_query(by_category):
+    """Return the MySQL query used by fetch_monthly_summary."""
+    group_columns = "year, month, category" if by_category else "year, month"
+    category_column = "category, " if by_category else ""
+    return f"""
+        SELECT YEAR(expense_date) AS year, MONTH(expense_date) AS month, {category_column}SUM(total) AS total
+        FROM daily_category_totals
+        WHERE expense_date BETWEEN %s AND %s
+        GROUP BY {group_columns}
+        ORDER BY {group_columns}
+    """
+
+
+class MySQLStore(ExpenseStore):
+    """A MySQL server: by default the one configured by DB_HOST, DB_PORT, ..., through the
+    shared pool, or the server at ``connect_args`` through a pool of its own whose
+    acquire times are labelled ``name`` (replicas).
+    """
+
+    engine = "mysql"
+
+    def __init__(self, connect_args=None, name=None):
+        self.connect_args = connect_args
+        self.name = name
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def pool(self):
+        if self.connect_args is None:
+            return get_pool()
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    from db_pool import ConnectionPool
+
+                    self._pool = ConnectionPool(
+                        connect_args=self.connect_args,
+                        max_size=pool_size,
+                        acquire_timeout=pool_timeout,
+                        recycle_seconds=pool_recycle,
+                        ping_interval=pool_ping_interval,
+                        on_acquire=lambda waited: metrics.POOL_ACQUIRE_LATENCY.observe(waited, self.name),
+                    )
+        return self._pool
+
+    def _cursor(self, commit=False):
+        return get_db_cursor(commit, pool=self.pool())
+
+    def replication_lag(self):
+        # Seconds_Behind_Source is NULL while replication is stopped or broken.
+        with self._cursor() as cursor:
+            cursor.execute("SHOW REPLICA STATUS")
+            rows = cursor.fetchall()
+        if not rows:
+            return 0.0
+        lag = rows[0]["Seconds_Behind_Source"]
+        return None if lag is None else float(lag)
+
+    def fetch_all_records(self):
+        with self._cursor() as cursor:
+            cursor.execute("SELECT * FROM expenses")
+            return cursor.fetchall()
+
+    def stream_expense_records(self, start_date, end_date, batch_size):
+        # The cursor is unbuffered, so rows stay on the server until fetchmany reads
+        # them. The connection is held until the generator is exhausted or closed.
+        query = "SELECT id, expense_date, amount, category, notes FROM expenses"
+        conditions, params = [], []
+        if start_date is not None:
+            conditions.append("expense_date >= %s")
+            params.append(start_date)
+        if end_date is not None:
+            conditions.append("expense_date <= %s")
+            params.append(end_date)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY expense_date, id"
+
+        pool = self.pool()
+        connection = pool.acquire()
+        completed = False
+        try:
+            cursor = connection.cursor(dictionary=True, buffered=False)
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
             cursor.close()
-        if connection:
-            connection.close()
+            completed = True
+        finally:
+            # Unread rows left on the wire make the connection unusable; drop it rather than drain it.
+            pool.release(connection, discard=not completed)
+
+    def fetch_expenses_page(self, start_date, end_date, category, after, limit):
+        query, params = build_expenses_page_query(start_date, end_date, category, after, limit)
+        with self._cursor() as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+
+    def fetch_expenses_for_date(self, expense_date):
+        with self._cursor() as cursor:
+            cursor.execute(FETCH_FOR_DATE_QUERY, (expense_date,))
+            return cursor.fetchall()
+
+    def insert_expense(self, expense_date, amount, category, notes):
+        with self._cursor(commit=True) as cursor:
+            cursor.execute(INSERT_EXPENSE_QUERY, (expense_date, amount, category, notes))
+            refresh_rollup_for_date(cursor, expense_date)
+
+    def delete_expenses_for_date(self, expense_date):
+        with self._cursor(commit=True) as cursor:
+            cursor.execute(DELETE_FOR_DATE_QUERY, (expense_date,))
+            cursor.execute(ROLLUP_DELETE_QUERY, (expense_date,))
+
+    @staticmethod
+    def _replace_date(cursor, expense_date, expenses):
+        cursor.execute(LOCK_FOR_DATE_QUERY, (expense_date,))
+        stored = [(row["amount"], row["category"], row["notes"]) for row in cursor.fetchall()]
+        if expense_rows_match(stored, expenses):
+            return False
+        cursor.execute(DELETE_FOR_DATE_QUERY, (expense_date,))
+        if expenses:
+            # executemany rewrites this into a single multi-row INSERT.
+            cursor.executemany(INSERT_EXPENSE_QUERY, [
+                (expense_date, amount, category, notes) for amount, category, notes in expenses
+            ])
+        refresh_rollup_for_date(cursor, expense_date)
+        return True
+
+    def replace_expenses_for_date(self, expense_date, expenses):
+        with self._cursor(commit=True) as cursor:
+            return self._replace_date(cursor, expense_date, expenses)
+
+    def replace_expenses_for_dates(self, submissions):
+        # Dates are locked in ascending order so concurrent batches cannot deadlock.
+        with self._cursor(commit=True) as cursor:
+            return [d for d in sorted(submissions) if self._replace_date(cursor, d, submissions[d])]
+
+    def bulk_insert_expenses(self, expenses):
+        if not expenses:
+            return 0
+        rollup_query = """
+            INSERT INTO daily_category_totals (expense_date, category, total)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE total = total + VALUES(total)
+        """
+        totals = {}
+        for expense_date, amount, category, notes in expenses:
+            totals[(expense_date, category)] = totals.get((expense_date, category), 0) + Decimal(str(amount))
+        with self._cursor(commit=True) as cursor:
+            cursor.executemany(INSERT_EXPENSE_QUERY, expenses)
+            cursor.executemany(rollup_query, [
+                (expense_date, category, total) for (expense_date, category), total in totals.items()
+            ])
+        return len(expenses)
+
+    def fetch_expense_summary(self, start_date, end_date):
+        with self._cursor() as cursor:
+            cursor.execute(SUMMARY_QUERY, (start_date, end_date))
+            return cursor.fetchall()
+
+    def fetch_expense_summaries(self, ranges):
+        query = build_range_totals_query(len(ranges), "daily_category_totals", "total")
+        with self._cursor() as cursor:
+            cursor.execute(query, range_totals_params(ranges))
+            return split_range_totals(cursor.fetchall(), len(ranges))
+
+    def fetch_monthly_summary(self, start_date, end_date, by_category):
+        with self._cursor() as cursor:
+            cursor.execute(build_monthly_summary_query(by_category), (start_date, end_date))
+            return cursor.fetchall()
+
+    def stats(self):
+        return self.pool().stats()
+
+
+def get_replica_configs():
+    """Connection settings of each DB_REPLICAS host[:port], sharing the primary's user, password and database."""
+    configs = []
+    for address in filter(None, (part.strip() for part in replica_addresses.split(","))):
+        host, _, port = address.partition(":")
+        configs.append({**get_mysql_config(), "host": host, "port": int(port or 3306)})
+    return configs
+
+# The server's VersionStore, set before the first query; replica reads consult it for
+# dates any worker wrote recently. See ReplicatedStore.
+version_store = None
+
+def create_store(engine, path=None, versions=None):
+    """Build the ExpenseStore for ``engine`` ("mysql", "sqlite" or "duckdb")."""
+    if engine == "mysql":
+        replicas = [
+            MySQLStore(config, name=f"replica{number}") for number, config in enumerate(get_replica_configs(), 1)
+        ]
+        if replicas:
+            from replication import ReplicatedStore
+
+            return ReplicatedStore(MySQLStore(), replicas, max_lag=replica_max_lag, versions=versions)
+        return MySQLStore()
+    if engine == "sqlite":
+        return SQLiteStore(path)
+    if engine == "duckdb":
+        return DuckDBStore(path)
+    raise ValueError(f"Unknown storage engine: {engine}")
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """Return the store every function below uses, creating it from STORAGE_ENGINE on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_store(storage_engine, storage_path, versions=version_store)
+    return _store
+
+def set_store(store):
+    """Replace the store used by this module; returns the previous one."""
+    global _store
+    with _store_lock:
+        previous, _store = _store, store
+    return previous
+
+def get_pool_stats():
+    """Return in-use/idle counts and acquire wait times for the connection pool."""
+    return get_store().stats()
 
 
 def fetch_all_records():
     """Fetch all records from the expenses table."""
-    query = "SELECT * FROM expenses"
     try:
-        with get_db_cursor() as cursor:
-            cursor.execute(query)
-            return cursor.fetchall()
+        with metrics.observe_query("fetch_all_records") as timer:
+            rows = get_store().fetch_all_records()
+            timer.rows = len(rows)
+            return rows
     except Exception as e:
-        logger.error(f"Error fetching records: {e}")
+        logger.error("Error fetching records: %s", e)
         return []
 
+def stream_expense_records(start_date=None, end_date=None, batch_size=1000):
+    """Yield expenses in batches of ``batch_size`` without loading the table into memory.
+
+    The store holds its connection until the generator is exhausted or closed.
+    """
+    logger.info("Streaming expenses for %s to %s", start_date, end_date)
+    return get_store().stream_expense_records(start_date, end_date, batch_size)
+
+def fetch_expenses_page(start_date=None, end_date=None, category=None, after=None, limit=100):
+    """Fetch up to ``limit`` expenses ordered by (expense_date, id), starting after the ``after`` key.
+
+    ``after`` is the (expense_date, id) of the last row of the previous page. Seeking
+    on that key instead of using OFFSET keeps every page O(limit), however deep.
+    """
+    logger.info("Fetching expenses page after %s (limit %s)", after, limit, extra=SAMPLED)
+    try:
+        with metrics.observe_query("fetch_expenses_page") as timer:
+            rows = get_store().fetch_expenses_page(start_date, end_date, category, after, limit)
+            timer.rows = len(rows)
+            return rows
+    except Exception as e:
+        logger.error("Error fetching expenses page: %s", e)
+        raise
+
 def fetch_expenses_for_date(expense_date):
     """Fetch expenses for a specific date."""
-    logger.info(f"Fetching expenses for {expense_date}")
-    query = "SELECT * FROM expenses WHERE expense_date = %s"
+    logger.info("Fetching expenses for %s", expense_date, extra=SAMPLED)
     try:
-        with get_db_cursor() as cursor:
-            cursor.execute(query, (expense_date,))
-            return cursor.fetchall()
+        with metrics.observe_query("fetch_expenses_for_date") as timer:
+            rows = get_store().fetch_expenses_for_date(expense_date)
+            timer.rows = len(rows)
+            return rows
     except Exception as e:
-        logger.error(f"Error fetching expenses for date {expense_date}: {e}")
+        logger.error("Error fetching expenses for date %s: %s", expense_date, e)
         return []
 
 def insert_expense(expense_date, amount, category, notes):
     """Insert a new expense."""
-    logger.info(f"Inserting expense: {expense_date}, {amount}, {category}, {notes}")
-    query = """
-        INSERT INTO expenses (expense_date, amount, category, notes)
-        VALUES (%s, %s, %s, %s)
-    """
+    logger.info("Inserting expense: %s, %s, %s", expense_date, amount, category)
     try:
-        with get_db_cursor(commit=True) as cursor:
-            cursor.execute(query, (expense_date, amount, category, notes))
+        with metrics.observe_query("insert_expense") as timer:
+            get_store().insert_expense(expense_date, amount, category, notes)
+            timer.rows = 1
     except Exception as e:
-        logger.error(f"Error inserting expense: {e}")
+        logger.error("Error inserting expense: %s", e)
 
 def delete_expenses_for_date(expense_date):
     """Delete all expenses for a specific date."""
-    logger.info(f"Deleting expenses for {expense_date}")
-    query = "DELETE FROM expenses WHERE expense_date = %s"
+    logger.info("Deleting expenses for %s", expense_date)
     try:
-        with get_db_cursor(commit=True) as cursor:
-            cursor.execute(query, (expense_date,))
+        with metrics.observe_query("delete_expenses_for_date"):
+            get_store().delete_expenses_for_date(expense_date)
     except Exception as e:
-        logger.error(f"Error deleting expenses for date {expense_date}: {e}")
+        logger.error("Error deleting expenses for date %s: %s", expense_date, e)
+
+def replace_expenses_for_date(expense_date, expenses):
+    """Replace all expenses for a date in one transaction on one connection.
+
+    ``expenses`` is a list of (amount, category, notes) tuples. The existing rows
+    are locked and compared first; if they already match, nothing is written and
+    False is returned. Errors are raised so the caller never sees a half-written day.
+    """
+    logger.info("Replacing expenses for %s with %s rows", expense_date, len(expenses))
+    with metrics.observe_query("replace_expenses_for_date") as timer:
+        changed = get_store().replace_expenses_for_date(expense_date, expenses)
+        timer.rows = len(expenses) if changed else 0
+    if not changed:
+        logger.info("Expenses for %s unchanged, skipping write", expense_date)
+    return changed
+
+def replace_expenses_for_dates(submissions):
+    """Replace the expenses of many dates in one transaction.
+
+    ``submissions`` maps each date to its (amount, category, notes) tuples. Dates
+    whose rows already match are left alone; the dates that changed are returned.
+    Errors are raised and nothing is written.
+    """
+    logger.info("Replacing expenses for %s dates", len(submissions))
+    with metrics.observe_query("replace_expenses_for_dates") as timer:
+        changed = get_store().replace_expenses_for_dates(submissions)
+        timer.rows = sum(len(submissions[d]) for d in changed)
+    return changed
+
+def bulk_insert_expenses(expenses):
+    """Append many expenses, possibly across many dates, in one transaction.
+
+    ``expenses`` is a list of (expense_date, amount, category, notes) tuples. The
+    rows go in as one multi-row INSERT and the rollup is adjusted with one upsert
+    per (date, category). Errors are raised and the whole batch is rolled back.
+    """
+    logger.info("Bulk inserting %s expenses", len(expenses))
+    with metrics.observe_query("bulk_insert_expenses") as timer:
+        timer.rows = get_store().bulk_insert_expenses(expenses)
+    return timer.rows
 
 def fetch_expense_summary(start_date, end_date):
-    """Fetch summary of expenses between two dates."""
-    logger.info(f"Fetching expense summary for {start_date} to {end_date}")
-    query = """
-        SELECT category, SUM(amount) as total
-        FROM expenses
-        WHERE expense_date BETWEEN %s AND %s
-        GROUP BY category
+    """Fetch summary of expenses between two dates from the daily rollup."""
+    logger.info("Fetching expense summary for %s to %s", start_date, end_date, extra=SAMPLED)
+    try:
+        with metrics.observe_query("fetch_expense_summary") as timer:
+            rows = get_store().fetch_expense_summary(start_date, end_date)
+            timer.rows = len(rows)
+            return rows
+    except Exception as e:
+        logger.error("Error fetching expense summary: %s", e)
+        return []
+
+def fetch_expense_summaries(ranges):
+    """Fetch the category summary of many (start_date, end_date) ranges with one scan of the rollup.
+
+    Errors are raised: an empty list for a range always means it has no expenses.
     """
+    logger.info("Fetching expense summaries for %s ranges", len(ranges), extra=SAMPLED)
+    if not ranges:
+        return []
+    with metrics.observe_query("fetch_expense_summaries") as timer:
+        summaries = get_store().fetch_expense_summaries(ranges)
+        timer.rows = sum(len(summary) for summary in summaries)
+    return summaries
+
+def fetch_monthly_summary(start_date, end_date, by_category=False):
+    """Fetch expense totals per (year, month), optionally split by category, between two dates."""
+    logger.info("Fetching monthly summary for %s to %s (by_category=%s)", start_date, end_date, by_category, extra=SAMPLED)
     try:
-        with get_db_cursor() as cursor:
-            cursor.execute(query, (start_date, end_date))
-            return cursor.fetchall()
+        with metrics.observe_query("fetch_monthly_summary") as timer:
+            rows = get_store().fetch_monthly_summary(start_date, end_date, by_category)
+            timer.rows = len(rows)
+            return rows
     except Exception as e:
-        logger.error(f"Error fetching expense summary: {e}")
+        logger.error("Error fetching monthly summary: %s", e)
         return []
 
 
@@ -0,0 +1,211 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import mysql.connector
+from logging_setup import setup_logger
+
+logger = setup_logger("db_pool")
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes available within the acquire timeout."""
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of MySQL connections.
+
+    Connections are created lazily up to ``max_size``. On checkout a connection
+    is recycled once it is older than ``recycle_seconds`` and pinged when it has
+    been idle for longer than ``ping_interval`` seconds, so callers never get a
+    connection the server has already dropped. ``on_acquire``, if given, is called
+    with the seconds each successful checkout waited.
+    """
+
+    def __init__(self, connect_args, max_size=5, acquire_timeout=10.0,
+                 recycle_seconds=1800, ping_interval=30.0, connect=None, on_acquire=None):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self._connect_args = connect_args
+        self._connect = connect or mysql.connector.connect
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.recycle_seconds = recycle_seconds
+        self.ping_interval = ping_interval
+        self._on_acquire = on_acquire
+
+        self._cond = threading.Condition()
+        # Idle entries are (connection, created_at, last_used_at); LIFO keeps hot connections warm.
+        self._idle = deque()
+        self._created_at = {}
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+
+        self._acquired_total = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._timeouts = 0
+        self._created_total = 0
+        self._recycled_total = 0
+        self._discarded_total = 0
+
+    def acquire(self):
+        """Check out a healthy connection, waiting up to ``acquire_timeout`` seconds."""
+        started = time.monotonic()
+        deadline = started + self.acquire_timeout
+        while True:
+            entry = None
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f"Timed out after {self.acquire_timeout}s waiting for a database connection"
+                        )
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                if self._idle:
+                    entry = self._idle.pop()
+                else:
+                    # Reserve the slot before connecting so other threads see the pool as full.
+                    self._size += 1
+                self._in_use += 1
+
+            try:
+                connection = self._checkout(entry)
+            except Exception:
+                with self._cond:
+                    self._in_use -= 1
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            if connection is None:
+                # The idle connection failed its health check; try again.
+                with self._cond:
+                    self._in_use -= 1
+                    self._size -= 1
+                    self._cond.notify()
+                continue
+
+            waited = time.monotonic() - started
+            with self._cond:
+                self._acquired_total += 1
+                self._wait_time_total += waited
+                self._wait_time_max = max(self._wait_time_max, waited)
+            if self._on_acquire is not None:
+                self._on_acquire(waited)
+            return connection
+
+    def _checkout(self, entry):
+        if entry is None:
+            return self._new_connection()
+        connection, created_at, last_used_at = entry
+        now = time.monotonic()
+        if self.recycle_seconds and now - created_at >= self.recycle_seconds:
+            self._close(connection)
+            with self._cond:
+                self._recycled_total += 1
+            return None
+        if self.ping_interval is not None and now - last_used_at >= self.ping_interval:
+            try:
+                connection.ping(reconnect=False)
+            except Exception as err:
+                logger.warning("Discarding connection that failed health check: %s", err)
+                self._close(connection)
+                with self._cond:
+                    self._discarded_total += 1
+                return None
+        return connection
+
+    def _new_connection(self):
+        connection = self._connect(**self._connect_args)
+        with self._cond:
+            self._created_at[id(connection)] = time.monotonic()
+            self._created_total += 1
+        return connection
+
+    def release(self, connection, discard=False):
+        """Return a connection to the pool, or close it when ``discard`` is set."""
+        if not discard:
+            try:
+                # Never hand out a connection with an open transaction: its snapshot would be stale.
+                if connection.in_transaction:
+                    connection.rollback()
+            except Exception as err:
+                logger.warning("Discarding connection that failed to reset: %s", err)
+                discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            if discard:
+                self._created_at.pop(id(connection), None)
+                self._size -= 1
+                self._discarded_total += 1
+            else:
+                created_at = self._created_at.get(id(connection), time.monotonic())
+                self._idle.append((connection, created_at, time.monotonic()))
+            self._cond.notify()
+        if discard:
+            self._close(connection)
+
+    @contextmanager
+    def connection(self):
+        """Context manager that checks a connection out and always returns it."""
+        connection = self.acquire()
+        discard = False
+        try:
+            yield connection
+        except mysql.connector.Error:
+            discard = not self._is_alive(connection)
+            raise
+        finally:
+            self.release(connection, discard=discard)
+
+    def _is_alive(self, connection):
+        try:
+            return connection.is_connected()
+        except Exception:
+            return False
+
+    def _close(self, connection):
+        with self._cond:
+            self._created_at.pop(id(connection), None)
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """Close every idle connection; connections still in use return to the pool as usual."""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for connection, _, _ in idle:
+            self._close(connection)
+
+    def stats(self):
+        """Snapshot of pool usage, suitable for sizing the pool under load."""
+        with self._cond:
+            acquired = self._acquired_total
+            return {
+                "max_size": self.max_size,
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "acquired_total": acquired,
+                "wait_time_total_ms": round(self._wait_time_total * 1000, 3),
+                "wait_time_avg_ms": round(self._wait_time_total * 1000 / acquired, 3) if acquired else 0.0,
+                "wait_time_max_ms": round(self._wait_time_max * 1000, 3),
+                "timeouts": self._timeouts,
+                "created_total": self._created_total,
+                "recycled_total": self._recycled_total,
+                "discarded_total": self._discarded_total,
+            }
@@ -0,0 +1,121 @@
+import codecs
+import csv
+import io
+import json
+from datetime import date
+from decimal import Decimal
+
+EXPORT_COLUMNS = ["id", "expense_date", "amount", "category", "notes"]
+
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def ndjson_chunks(batches):
+    """Encode batches of expense rows as newline-delimited JSON, one chunk per batch."""
+    for rows in batches:
+        yield "".join(
+            json.dumps({column: row[column] for column in EXPORT_COLUMNS}, default=_json_default) + "\n"
+            for row in rows
+        )
+
+
+def csv_chunks(batches):
+    """Encode batches of expense rows as CSV with a header line, one chunk per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([row[column] for column in EXPORT_COLUMNS] for row in rows)
+        yield buffer.getvalue()
+
+
+class ImportParser:
+    """Incrementally split an uploaded CSV or NDJSON body into records.
+
+    ``feed`` takes raw byte chunks as they arrive and returns the records that
+    are complete so far as (line_number, record, error) tuples; exactly one of
+    ``record`` and ``error`` is set. CSV input needs a header line and may
+    contain quoted fields that span lines.
+    """
+
+    def __init__(self, format):
+        if format not in ("csv", "ndjson"):
+            raise ValueError(f"Unsupported import format: {format}")
+        self.format = format
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._pending = ""
+        self._line_number = 0
+        self._header = None
+        self._csv_lines = []
+        self._csv_quotes = 0
+
+    def feed(self, chunk):
+        self._pending += self._decoder.decode(chunk)
+        lines = self._pending.split("\n")
+        self._pending = lines.pop()
+        return self._parse_lines(lines)
+
+    def close(self):
+        """Parse whatever is left after the last chunk."""
+        self._pending += self._decoder.decode(b"", final=True)
+        lines = [self._pending] if self._pending else []
+        self._pending = ""
+        records = self._parse_lines(lines)
+        if self._csv_lines:
+            records.append((self._line_number - len(self._csv_lines) + 1, None, "Unterminated quoted field"))
+            self._csv_lines = []
+        return records
+
+    def _parse_lines(self, lines):
+        records = []
+        for line in lines:
+            self._line_number += 1
+            line = line.rstrip("\r")
+            if self.format == "ndjson":
+                record = self._parse_ndjson(line)
+            else:
+                record = self._parse_csv(line)
+            if record is not None:
+                records.append(record)
+        return records
+
+    def _parse_ndjson(self, line):
+        if not line.strip():
+            return None
+        try:
+            value = json.loads(line)
+        except ValueError as e:
+            return (self._line_number, None, f"Invalid JSON: {e}")
+        if not isinstance(value, dict):
+            return (self._line_number, None, "Expected a JSON object")
+        return (self._line_number, value, None)
+
+    def _parse_csv(self, line):
+        self._csv_lines.append(line)
+        self._csv_quotes += line.count('"')
+        if self._csv_quotes % 2:
+            # Inside a quoted field that continues on the next line.
+            return None
+        first_line = self._line_number - len(self._csv_lines) + 1
+        text = "\n".join(self._csv_lines)
+        self._csv_lines = []
+        self._csv_quotes = 0
+        if not text.strip():
+            return None
+        values = next(csv.reader([text]))
+        if self._header is None:
+            self._header = [name.strip() for name in values]
+            return None
+        if len(values) != len(self._header):
+            return (first_line, None, f"Expected {len(self._header)} columns, got {len(values)}")
+        return (first_line, dict(zip(self._header, values)), None)
+
@@ -0,0 +1,35 @@
+import json
+from decimal import Decimal
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; without it responses are encoded with the json module
+    orjson = None
+
+
+def _default(value):
+    # MySQL DECIMAL columns come back as Decimal; the API has always sent them as numbers.
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content):
+    """Encode ``content`` as compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response for content already in its response shape.
+
+    Returning it from an endpoint skips the response_model validation and
+    jsonable_encoder pass, so build the content from trusted rows only.
+    """
+
+    def render(self, content):
+        return dumps(content)
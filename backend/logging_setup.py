@@ -1,14 +1,151 @@
+import atexit
+import contextvars
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import uuid
 
-def setup_logger(name, log_file="server.log", level=logging.DEBUG):
+# Correlation ID of the request being handled; "-" outside of a request.
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+# Pass as ``extra=SAMPLED`` on hot-path info logs so only LOG_SAMPLE_RATE of them are kept.
+SAMPLED = {"sampled": True}
+
+_handlers = {}
+_listeners = []
+_lock = threading.Lock()
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp each record with the current request's correlation ID."""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only ``rate`` of the records logged with ``extra=SAMPLED`` at INFO or below."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.INFO or not getattr(record, "sampled", False):
+            return True
+        return self.rate >= 1 or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record):
+        payload = {
+            "time": self.formatTime(record),
+            "logger": record.name,
+            "level": record.levelname,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload)
+
+
+def _build_file_handler(log_file):
+    # LOG_ROTATE_WHEN (e.g. "midnight") switches from size-based to time-based rotation.
+    # delay=True leaves the file closed until the first record, so importing a module costs no I/O.
+    backup_count = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+    rotate_when = os.getenv("LOG_ROTATE_WHEN")
+    if rotate_when:
+        handler = logging.handlers.TimedRotatingFileHandler(
+            log_file, when=rotate_when, backupCount=backup_count, delay=True
+        )
+    else:
+        max_bytes = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+        handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=max_bytes, backupCount=backup_count, delay=True
+        )
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(
+            "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+        ))
+    return handler
+
+
+def _get_queue_handler(log_file):
+    """Return the QueueHandler feeding ``log_file``, starting its background writer on first use."""
+    with _lock:
+        handler = _handlers.get(log_file)
+        if handler is None:
+            log_queue = queue.Queue(-1)
+            listener = logging.handlers.QueueListener(log_queue, _build_file_handler(log_file))
+            listener.start()
+            _listeners.append(listener)
+            handler = logging.handlers.QueueHandler(log_queue)
+            # Filters on the QueueHandler run in the logging thread, where the request context is visible.
+            handler.addFilter(RequestIdFilter())
+            handler.addFilter(SamplingFilter(float(os.getenv("LOG_SAMPLE_RATE", "0.1"))))
+            _handlers[log_file] = handler
+        return handler
+
+
+def flush_logs():
+    """Block until every queued record has been written."""
+    for handler in list(_handlers.values()):
+        handler.queue.join()
+
+
+def _stop_listeners():
+    for listener in _listeners:
+        listener.stop()
+
+
+atexit.register(_stop_listeners)
+
+
+def setup_logger(name, log_file="server.log", level=None):
     #creating custom logger
     logger = logging.getLogger(name)
-    
-    #config
-    logger.setLevel(level)
-    file_handler = logging.FileHandler(log_file)
-    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    
-    return logger
\ No newline at end of file
+
+    #config: records go onto a queue and a background thread writes them to disk
+    logger.setLevel(level or os.getenv("LOG_LEVEL", "INFO").upper())
+    handler = _get_queue_handler(log_file)
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
+
+    return logger
+
+
+class RequestIdMiddleware:
+    """ASGI middleware that sets a correlation ID per request and echoes it as X-Request-ID."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        incoming = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")[:128]
+        request_id = incoming or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
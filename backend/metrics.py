@@ -0,0 +1,258 @@
+"""Request, query and connection-pool metrics in the Prometheus text format.
+
+The server exposes everything recorded here at ``/metrics``. Set SLOW_QUERY_MS to
+also log every db_helper query that takes longer than that many milliseconds.
+"""
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from logging_setup import setup_logger
+
+slow_query_logger = setup_logger("slow_query", log_file=os.getenv("SLOW_QUERY_LOG", "server.log"))
+
+# Seconds; from a sub-millisecond cache hit to a request stuck behind the pool timeout.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label set."""
+
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label set."""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, *labels):
+        with self._lock:
+            entry = self._values.get(labels)
+            return entry[2] if entry else 0
+
+    def samples(self):
+        with self._lock:
+            values = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._values.items()}
+        for labels, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield (self.name + "_bucket",
+                       _format_labels(self.labelnames, labels, [("le", _format_value(float(bound)))]), cumulative)
+            yield self.name + "_bucket", _format_labels(self.labelnames, labels, [("le", "+Inf")]), count
+            yield self.name + "_sum", _format_labels(self.labelnames, labels), total
+            yield self.name + "_count", _format_labels(self.labelnames, labels), count
+
+
+class Registry:
+    """Metrics rendered together, plus gauge callbacks read at scrape time."""
+
+    def __init__(self):
+        self._metrics = []
+        self._gauges = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_gauges(self, prefix, documentation, collect):
+        """Expose every numeric value of the dict returned by ``collect()`` as ``<prefix>_<key>``."""
+        with self._lock:
+            self._gauges.append((prefix, documentation, collect))
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics, gauges = list(self._metrics), list(self._gauges)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        for prefix, documentation, collect in gauges:
+            try:
+                values = collect()
+            except Exception as e:
+                # A broken collector (e.g. the database is down) must not take /metrics down with it.
+                slow_query_logger.warning("Could not collect %s metrics: %s", prefix, e)
+                continue
+            for key, value in sorted(values.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{key}"
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.register(Histogram(
+    "http_request_duration_seconds", "Time spent serving HTTP requests.", ["method", "route", "status"]))
+REQUEST_ERRORS = registry.register(Counter(
+    "http_request_errors_total", "HTTP requests that ended in a 5xx or an unhandled exception.", ["method", "route"]))
+QUERY_LATENCY = registry.register(Histogram(
+    "db_query_duration_seconds", "Time spent running database queries, by db_helper function.", ["query"]))
+QUERY_ROWS = registry.register(Histogram(
+    "db_query_rows", "Rows returned or written per database query.", ["query"], buckets=ROW_BUCKETS))
+QUERY_ERRORS = registry.register(Counter(
+    "db_query_errors_total", "Database queries that raised.", ["query"]))
+SLOW_QUERIES = registry.register(Counter(
+    "db_slow_queries_total", "Database queries slower than SLOW_QUERY_MS.", ["query"]))
+POOL_ACQUIRE_LATENCY = registry.register(Histogram(
+    "db_pool_acquire_duration_seconds", "Time spent waiting for a pooled database connection.", ["pool"]))
+
+
+def slow_query_threshold():
+    """SLOW_QUERY_MS in seconds, or None when the slow-query log is off."""
+    value = os.getenv("SLOW_QUERY_MS")
+    return float(value) / 1000 if value else None
+
+
+class QueryTimer:
+    """Set ``rows`` inside an ``observe_query`` block to record the result size."""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = None
+        self.started = time.perf_counter()
+
+    def finish(self, failed):
+        elapsed = time.perf_counter() - self.started
+        QUERY_LATENCY.observe(elapsed, self.name)
+        if failed:
+            QUERY_ERRORS.inc(self.name)
+        elif self.rows is not None:
+            QUERY_ROWS.observe(self.rows, self.name)
+        threshold = slow_query_threshold()
+        if threshold is not None and elapsed >= threshold:
+            SLOW_QUERIES.inc(self.name)
+            slow_query_logger.warning("Slow query %s took %.1f ms (rows=%s)", self.name, elapsed * 1000, self.rows)
+
+
+@contextmanager
+def observe_query(name):
+    """Time the block as one run of query ``name`` and count it as an error if it raises."""
+    timer = QueryTimer(name)
+    try:
+        yield timer
+    except BaseException:
+        timer.finish(failed=True)
+        raise
+    timer.finish(failed=False)
+
+
+@asynccontextmanager
+async def observe_query_async(name):
+    """Async counterpart of ``observe_query``."""
+    timer = QueryTimer(name)
+    try:
+        yield timer
+    except BaseException:
+        timer.finish(failed=True)
+        raise
+    timer.finish(failed=False)
+
+
+def render():
+    return registry.render()
+
+
+class MetricsMiddleware:
+    """ASGI middleware that records latency and 5xx/exception counts per route template.
+
+    Requests are labelled with the matched route's path (``/expenses/{expense_date}``),
+    not the raw URL, so the number of label sets stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        except BaseException:
+            status = 500
+            raise
+        finally:
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            REQUEST_LATENCY.observe(time.perf_counter() - started, method, route_path, str(status))
+            if status >= 500:
+                REQUEST_ERRORS.inc(method, route_path)
@@ -0,0 +1,155 @@
+"""Versioned schema migrations for the expenses database.
+
+    python migrate.py status
+    python migrate.py apply [--target VERSION]
+    python migrate.py rollback [--steps N]
+
+Migrations are the ``NNNN_name.sql`` files in ``migrations/``. Each file has a
+``-- migrate:up`` section and a ``-- migrate:down`` section of ``;``-terminated
+statements. Applied versions are recorded in the ``schema_migrations`` table.
+MySQL commits DDL implicitly, so a version is recorded only after all of its
+statements succeeded. MySQL only: the embedded engines (STORAGE_ENGINE=sqlite or
+duckdb) create their schema themselves; see storage.py.
+"""
+import argparse
+import os
+import re
+import sys
+from collections import namedtuple
+import db_helper
+from logging_setup import setup_logger
+
+logger = setup_logger("migrate")
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+FILENAME_PATTERN = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+Migration = namedtuple("Migration", ["version", "name", "up", "down"])
+
+
+def _split_statements(sql):
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [statement.strip() for statement in "\n".join(lines).split(";") if statement.strip()]
+
+
+def parse_migration(version, name, text):
+    sections = {"up": [], "down": []}
+    current = None
+    for line in text.splitlines():
+        marker = line.strip().lower()
+        if marker == "-- migrate:up":
+            current = "up"
+        elif marker == "-- migrate:down":
+            current = "down"
+        elif current:
+            sections[current].append(line)
+    if not sections["up"]:
+        raise ValueError(f"Migration {version:04d}_{name} has no '-- migrate:up' section")
+    return Migration(
+        version, name,
+        _split_statements("\n".join(sections["up"])),
+        _split_statements("\n".join(sections["down"])),
+    )
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    """Return every migration in ``directory`` ordered by version."""
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = FILENAME_PATTERN.match(filename)
+        if not match:
+            continue
+        with open(os.path.join(directory, filename)) as f:
+            migrations.append(parse_migration(int(match.group(1)), match.group(2), f.read()))
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError("Duplicate migration versions in " + directory)
+    return migrations
+
+
+def ensure_migrations_table():
+    with db_helper.get_db_cursor(commit=True) as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INT NOT NULL PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+
+def applied_versions():
+    ensure_migrations_table()
+    with db_helper.get_db_cursor() as cursor:
+        cursor.execute("SELECT version FROM schema_migrations ORDER BY version")
+        return [row["version"] for row in cursor.fetchall()]
+
+
+def status(migrations=None):
+    """Return (migration, applied) pairs for every known migration."""
+    migrations = migrations if migrations is not None else load_migrations()
+    applied = set(applied_versions())
+    return [(migration, migration.version in applied) for migration in migrations]
+
+
+def apply(target=None, migrations=None):
+    """Apply pending migrations up to and including ``target``; returns the versions applied."""
+    migrations = migrations if migrations is not None else load_migrations()
+    applied = set(applied_versions())
+    done = []
+    for migration in migrations:
+        if migration.version in applied or (target is not None and migration.version > target):
+            continue
+        logger.info("Applying migration %04d_%s", migration.version, migration.name)
+        with db_helper.get_db_cursor(commit=True) as cursor:
+            for statement in migration.up:
+                cursor.execute(statement)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                (migration.version, migration.name),
+            )
+        done.append(migration.version)
+    return done
+
+
+def rollback(steps=1, migrations=None):
+    """Revert the ``steps`` most recently applied migrations; returns the versions reverted."""
+    migrations = {m.version: m for m in (migrations if migrations is not None else load_migrations())}
+    done = []
+    for version in sorted(applied_versions(), reverse=True)[:steps]:
+        migration = migrations.get(version)
+        if migration is None:
+            raise ValueError(f"Applied migration {version} has no file in {MIGRATIONS_DIR}")
+        logger.info("Rolling back migration %04d_%s", migration.version, migration.name)
+        with db_helper.get_db_cursor(commit=True) as cursor:
+            for statement in migration.down:
+                cursor.execute(statement)
+            cursor.execute("DELETE FROM schema_migrations WHERE version = %s", (version,))
+        done.append(version)
+    return done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply, roll back and inspect schema migrations.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status", help="list migrations and whether they are applied")
+    apply_parser = subparsers.add_parser("apply", help="apply pending migrations")
+    apply_parser.add_argument("--target", type=int, help="stop after this version")
+    rollback_parser = subparsers.add_parser("rollback", help="revert applied migrations")
+    rollback_parser.add_argument("--steps", type=int, default=1, help="number of migrations to revert")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        for migration, is_applied in status():
+            print(f"[{'x' if is_applied else ' '}] {migration.version:04d}_{migration.name}")
+    elif args.command == "apply":
+        versions = apply(args.target)
+        print(f"Applied {len(versions)} migration(s): {versions}" if versions else "Nothing to apply")
+    else:
+        versions = rollback(args.steps)
+        print(f"Rolled back {len(versions)} migration(s): {versions}" if versions else "Nothing to roll back")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
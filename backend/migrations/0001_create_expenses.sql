@@ -0,0 +1,25 @@
+-- The expenses table db_helper reads and writes, with the indexes behind its
+-- hot queries: every per-date read/delete seeks on (expense_date), and
+-- (expense_date, category, amount) covers the per-date rollup refresh and the
+-- rollup consistency check without touching the table rows.
+-- Databases created before migrations already have the expenses table, so up
+-- adopts it if present (converting a FLOAT amount to DECIMAL) and down removes
+-- only the indexes: rolling back must never drop a table, and its data, that
+-- this migration may not have created.
+
+-- migrate:up
+CREATE TABLE IF NOT EXISTS expenses (
+    id INT NOT NULL AUTO_INCREMENT,
+    expense_date DATE NOT NULL,
+    amount DECIMAL(10,2) NOT NULL,
+    category VARCHAR(255) NOT NULL,
+    notes TEXT,
+    PRIMARY KEY (id)
+);
+ALTER TABLE expenses MODIFY amount DECIMAL(10,2) NOT NULL;
+CREATE INDEX idx_expenses_date ON expenses (expense_date);
+CREATE INDEX idx_expenses_date_category_amount ON expenses (expense_date, category, amount);
+
+-- migrate:down
+DROP INDEX idx_expenses_date_category_amount ON expenses;
+DROP INDEX idx_expenses_date ON expenses;
@@ -0,0 +1,13 @@
+-- Per-day, per-category totals kept up to date by db_helper on every write.
+-- Backfill an existing database with: python rollup.py rebuild
+
+-- migrate:up
+CREATE TABLE IF NOT EXISTS daily_category_totals (
+    expense_date DATE NOT NULL,
+    category VARCHAR(255) NOT NULL,
+    total DECIMAL(10,2) NOT NULL,
+    PRIMARY KEY (expense_date, category)
+);
+
+-- migrate:down
+DROP TABLE daily_category_totals;
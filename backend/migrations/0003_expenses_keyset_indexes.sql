@@ -0,0 +1,10 @@
+-- Composite index backing keyset pagination on GET /expenses filtered by
+-- category. Unfiltered pages walk idx_expenses_date from 0001: InnoDB appends
+-- the primary key to every secondary index, so it already orders by
+-- (expense_date, id) and a separate index on those columns would be redundant.
+
+-- migrate:up
+CREATE INDEX idx_expenses_category_date_id ON expenses (category, expense_date, id);
+
+-- migrate:down
+DROP INDEX idx_expenses_category_date_id ON expenses;
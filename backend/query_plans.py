@@ -0,0 +1,84 @@
+"""EXPLAIN-based guard against db_helper queries falling back to full table scans.
+
+    python query_plans.py
+
+Refreshes the table statistics, runs EXPLAIN on every indexed-path query
+db_helper issues and exits non-zero if any table access is a full scan (type
+ALL). Run it after ``python migrate.py apply`` against a database with the
+current schema and representative data: on a near-empty table the optimiser
+prefers a scan even where an index exists. MySQL only, like migrate.py.
+fetch_all_records and unbounded exports read the whole table by design and are
+not checked.
+"""
+import sys
+from datetime import date
+import db_helper
+
+SAMPLE_DATE = date(2024, 8, 15)
+SAMPLE_END = date(2024, 8, 31)
+
+
+def plan_cases():
+    """Return (name, query, params) for every query that must be served from an index."""
+    page_query, page_params = db_helper.build_expenses_page_query(
+        SAMPLE_DATE, SAMPLE_END, None, (SAMPLE_DATE, 1), 100
+    )
+    category_page_query, category_page_params = db_helper.build_expenses_page_query(
+        None, None, "Food", (SAMPLE_DATE, 1), 100
+    )
+    batch_ranges = [(SAMPLE_DATE, SAMPLE_END), (date(2024, 8, 1), SAMPLE_DATE)]
+    return [
+        ("fetch_expenses_for_date", db_helper.FETCH_FOR_DATE_QUERY, (SAMPLE_DATE,)),
+        ("delete_expenses_for_date", db_helper.DELETE_FOR_DATE_QUERY, (SAMPLE_DATE,)),
+        ("replace_expenses_for_date lock", db_helper.LOCK_FOR_DATE_QUERY, (SAMPLE_DATE,)),
+        ("refresh_rollup_for_date", db_helper.ROLLUP_REFRESH_QUERY, (SAMPLE_DATE,)),
+        ("refresh_rollup_for_date delete", db_helper.ROLLUP_DELETE_QUERY, (SAMPLE_DATE,)),
+        ("fetch_expense_summary", db_helper.SUMMARY_QUERY, (SAMPLE_DATE, SAMPLE_END)),
+        ("fetch_monthly_summary", db_helper.build_monthly_summary_query(True), (SAMPLE_DATE, SAMPLE_END)),
+        ("fetch_expense_summaries",
+         db_helper.build_range_totals_query(len(batch_ranges), "daily_category_totals", "total"),
+         db_helper.range_totals_params(batch_ranges)),
+        ("fetch_expenses_page", page_query, page_params),
+        ("fetch_expenses_page by category", category_page_query, category_page_params),
+    ]
+
+
+def analyze_tables():
+    with db_helper.get_db_cursor() as cursor:
+        cursor.execute("ANALYZE TABLE expenses, daily_category_totals")
+        cursor.fetchall()
+
+
+def explain(query, params):
+    with db_helper.get_db_cursor() as cursor:
+        cursor.execute("EXPLAIN " + query.strip(), params)
+        return cursor.fetchall()
+
+
+def is_full_scan(row):
+    return row.get("type") == "ALL"
+
+
+def find_full_scans():
+    """Return (name, table) for every checked query that would scan a whole table."""
+    analyze_tables()
+    failures = []
+    for name, query, params in plan_cases():
+        for row in explain(query, params):
+            if is_full_scan(row):
+                failures.append((name, row.get("table")))
+    return failures
+
+
+def main():
+    failures = find_full_scans()
+    for name, table in failures:
+        print(f"FULL SCAN: {name} reads every row of {table}")
+    if failures:
+        return 1
+    print(f"All {len(plan_cases())} checked queries use an index")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
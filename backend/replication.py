@@ -0,0 +1,210 @@
+import itertools
+import math
+import threading
+import time
+from contextvars import ContextVar
+from datetime import date
+from http.cookies import SimpleCookie
+from starlette.datastructures import Headers, MutableHeaders
+from logging_setup import setup_logger
+from storage import ExpenseStore
+from versions import VersionStore
+
+logger = setup_logger("replication")
+
+# Set for requests that must see their own earlier writes; ReplicatedStore then reads from the primary.
+read_from_primary = ContextVar("read_from_primary", default=False)
+
+STICKY_COOKIE = "read_primary_until"
+
+
+def _as_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+
+class ReplicatedStore(ExpenseStore):
+    """Send writes to ``primary`` and spread the heavy reads over ``replicas``.
+
+    fetch_expenses_for_date, fetch_expense_summary(ies), fetch_monthly_summary and
+    fetch_all_records go to the next healthy replica, round robin. A replica is
+    healthy while its ``replication_lag()``, checked at most every
+    ``lag_check_interval`` seconds, is at most ``max_lag`` seconds. A read goes to
+    the primary instead when no replica is healthy, when a replica read fails,
+    when ``read_from_primary`` is set for the request (read-your-writes after a
+    POST), or when it covers a date written in the last ``max_lag`` seconds.
+
+    Recent writes are looked up in ``versions``. Pass the server's VersionStore,
+    which every worker bumps after its writes, so that a worker never reads a
+    date another worker just wrote from a replica and caches the old rows under
+    the new ETag. Without one the store keeps a VersionStore of its own and bumps
+    it on its writes, which covers this process only.
+
+    Only the sync backend uses this store. BACKEND_MODE=async reads through
+    async_db_helper, which always queries the primary.
+    """
+
+    engine = "replicated"
+
+    def __init__(self, primary, replicas, max_lag=5.0, lag_check_interval=1.0, versions=None):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+        # A shared VersionStore is bumped by its owner after every write; a private one only by this store.
+        self._owns_versions = versions is None
+        self.versions = VersionStore() if versions is None else versions
+        self._lock = threading.Lock()
+        self._healthy = list(self.replicas)
+        self._checked_at = None
+        self._next = itertools.count()
+        self._stats = {"primary_reads": 0, "replica_reads": 0, "replica_errors": 0}
+
+    def _check_replicas(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.lag_check_interval:
+                return self._healthy
+            self._checked_at = now
+        healthy = []
+        for replica in self.replicas:
+            try:
+                lag = replica.replication_lag()
+            except Exception as e:
+                logger.warning("Replica lag check failed: %s", e)
+                continue
+            if lag is not None and lag <= self.max_lag:
+                healthy.append(replica)
+        with self._lock:
+            if len(healthy) != len(self._healthy):
+                logger.info("%s of %s replicas within %ss of the primary", len(healthy), len(self.replicas), self.max_lag)
+            self._healthy = healthy
+            return healthy
+
+    def _written_recently(self, start_date, end_date):
+        return self.versions.written_within(start_date, end_date, self.max_lag)
+
+    def _record_writes(self, dates):
+        if self._owns_versions and dates:
+            self.versions.bump(*dates)
+
+    def _read(self, method, *args, start_date, end_date):
+        """Call ``method`` on a replica, or on the primary when the rows of [start_date, end_date] may be stale there."""
+        if not read_from_primary.get() and not self._written_recently(_as_date(start_date), _as_date(end_date)):
+            healthy = self._check_replicas()
+            if healthy:
+                replica = healthy[next(self._next) % len(healthy)]
+                try:
+                    rows = getattr(replica, method)(*args)
+                    with self._lock:
+                        self._stats["replica_reads"] += 1
+                    return rows
+                except Exception as e:
+                    logger.warning("Replica read %s failed, using the primary: %s", method, e)
+                    with self._lock:
+                        self._stats["replica_errors"] += 1
+                        # Re-check on the next read instead of waiting out the interval.
+                        self._checked_at = None
+        with self._lock:
+            self._stats["primary_reads"] += 1
+        return getattr(self.primary, method)(*args)
+
+    def fetch_all_records(self):
+        return self._read("fetch_all_records", start_date=date.min, end_date=date.max)
+
+    def stream_expense_records(self, start_date, end_date, batch_size):
+        return self.primary.stream_expense_records(start_date, end_date, batch_size)
+
+    def fetch_expenses_page(self, start_date, end_date, category, after, limit):
+        return self.primary.fetch_expenses_page(start_date, end_date, category, after, limit)
+
+    def fetch_expenses_for_date(self, expense_date):
+        return self._read("fetch_expenses_for_date", expense_date, start_date=expense_date, end_date=expense_date)
+
+    def insert_expense(self, expense_date, amount, category, notes):
+        self.primary.insert_expense(expense_date, amount, category, notes)
+        self._record_writes([expense_date])
+
+    def delete_expenses_for_date(self, expense_date):
+        self.primary.delete_expenses_for_date(expense_date)
+        self._record_writes([expense_date])
+
+    def replace_expenses_for_date(self, expense_date, expenses):
+        changed = self.primary.replace_expenses_for_date(expense_date, expenses)
+        if changed:
+            self._record_writes([expense_date])
+        return changed
+
+    def replace_expenses_for_dates(self, submissions):
+        changed = self.primary.replace_expenses_for_dates(submissions)
+        self._record_writes(changed)
+        return changed
+
+    def bulk_insert_expenses(self, expenses):
+        count = self.primary.bulk_insert_expenses(expenses)
+        self._record_writes({row[0] for row in expenses})
+        return count
+
+    def fetch_expense_summary(self, start_date, end_date):
+        return self._read("fetch_expense_summary", start_date, end_date, start_date=start_date, end_date=end_date)
+
+    def fetch_expense_summaries(self, ranges):
+        if not ranges:
+            return []
+        start_date = min(_as_date(r[0]) for r in ranges)
+        end_date = max(_as_date(r[1]) for r in ranges)
+        return self._read("fetch_expense_summaries", ranges, start_date=start_date, end_date=end_date)
+
+    def fetch_monthly_summary(self, start_date, end_date, by_category):
+        return self._read(
+            "fetch_monthly_summary", start_date, end_date, by_category, start_date=start_date, end_date=end_date
+        )
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._stats, healthy_replicas=len(self._healthy), replicas=len(self.replicas))
+        return {**self.primary.stats(), **counts, "engine": self.engine}
+
+    def close(self):
+        for store in [self.primary, *self.replicas]:
+            store.close()
+
+
+class ReadYourWritesMiddleware:
+    """Route a client's reads to the primary for ``sticky_seconds`` after its last write.
+
+    Successful writes (non-GET requests under ``write_prefixes``) set a cookie holding
+    the time until which the client is sticky; requests carrying an unexpired cookie
+    run with ``read_from_primary`` set.
+    """
+
+    def __init__(self, app, sticky_seconds=10.0, write_prefixes=("/expenses",)):
+        self.app = app
+        self.sticky_seconds = sticky_seconds
+        self.write_prefixes = tuple(write_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        cookie = SimpleCookie(Headers(scope=scope).get("cookie", ""))
+        try:
+            sticky = STICKY_COOKIE in cookie and float(cookie[STICKY_COOKIE].value) > time.time()
+        except ValueError:
+            sticky = False
+        is_write = scope["method"] in ("POST", "PUT", "PATCH", "DELETE") and scope["path"].startswith(self.write_prefixes)
+
+        async def send_wrapper(message):
+            if is_write and message["type"] == "http.response.start" and message["status"] < 400:
+                headers = MutableHeaders(scope=message)
+                max_age = math.ceil(self.sticky_seconds)
+                headers.append(
+                    "Set-Cookie",
+                    f"{STICKY_COOKIE}={time.time() + max_age:.0f}; Max-Age={max_age}; Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        token = read_from_primary.set(sticky)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            read_from_primary.reset(token)
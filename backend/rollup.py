@@ -0,0 +1,160 @@
+"""Backfill and verify the daily_category_totals rollup.
+
+    python rollup.py rebuild [--start 2024-01-01] [--end 2024-12-31]
+    python rollup.py check   [--start 2024-01-01] [--end 2024-12-31] [--fix]
+
+Both commands walk the range in windows of ``--window-days`` so that each
+transaction stays short even on a multi-year history. MySQL only: the SQLite
+store refreshes its rollup inside every write transaction, and DuckDB has none.
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+import db_helper
+from logging_setup import setup_logger
+
+logger = setup_logger("rollup")
+
+CREATE_TABLE_QUERY = """
+    CREATE TABLE IF NOT EXISTS daily_category_totals (
+        expense_date DATE NOT NULL,
+        category VARCHAR(255) NOT NULL,
+        total DECIMAL(10,2) NOT NULL,
+        PRIMARY KEY (expense_date, category)
+    )
+"""
+
+def ensure_table():
+    with db_helper.get_db_cursor(commit=True) as cursor:
+        cursor.execute(CREATE_TABLE_QUERY)
+
+
+def expense_date_bounds():
+    """Return the (min, max) expense_date in the expenses table, or (None, None) when empty."""
+    with db_helper.get_db_cursor() as cursor:
+        cursor.execute("SELECT MIN(expense_date) AS first, MAX(expense_date) AS last FROM expenses")
+        row = cursor.fetchone()
+    return _as_date(row["first"]), _as_date(row["last"])
+
+
+def _as_date(value):
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value))
+
+
+def _windows(start_date, end_date, window_days):
+    current = start_date
+    while current <= end_date:
+        window_end = min(current + timedelta(days=window_days - 1), end_date)
+        yield current, window_end
+        current = window_end + timedelta(days=1)
+
+
+def _resolve_range(start_date, end_date):
+    first, last = expense_date_bounds()
+    return _as_date(start_date) or first, _as_date(end_date) or last
+
+
+def rebuild(start_date=None, end_date=None, window_days=31):
+    """Recompute the rollup from the expenses table; returns the number of rollup rows written."""
+    ensure_table()
+    start_date, end_date = _resolve_range(start_date, end_date)
+    if start_date is None or end_date is None:
+        logger.info("No expenses to roll up")
+        return 0
+    written = 0
+    for window_start, window_end in _windows(start_date, end_date, window_days):
+        with db_helper.get_db_cursor(commit=True) as cursor:
+            cursor.execute(
+                "DELETE FROM daily_category_totals WHERE expense_date BETWEEN %s AND %s",
+                (window_start, window_end),
+            )
+            cursor.execute(
+                """
+                INSERT INTO daily_category_totals (expense_date, category, total)
+                SELECT expense_date, category, SUM(amount)
+                FROM expenses
+                WHERE expense_date BETWEEN %s AND %s
+                GROUP BY expense_date, category
+                """,
+                (window_start, window_end),
+            )
+            written += cursor.rowcount
+        logger.info("Rebuilt rollup for %s to %s", window_start, window_end)
+    return written
+
+
+def check(start_date=None, end_date=None, window_days=31):
+    """Compare the rollup against the raw expenses and return the mismatching (date, category) cells."""
+    start_date, end_date = _resolve_range(start_date, end_date)
+    if start_date is None or end_date is None:
+        return []
+    mismatches = []
+    for window_start, window_end in _windows(start_date, end_date, window_days):
+        with db_helper.get_db_cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT expense_date, category, SUM(amount) AS total
+                FROM expenses
+                WHERE expense_date BETWEEN %s AND %s
+                GROUP BY expense_date, category
+                """,
+                (window_start, window_end),
+            )
+            expected = {(_as_date(r["expense_date"]), r["category"]): r["total"] for r in cursor.fetchall()}
+            cursor.execute(
+                """
+                SELECT expense_date, category, total
+                FROM daily_category_totals
+                WHERE expense_date BETWEEN %s AND %s
+                """,
+                (window_start, window_end),
+            )
+            actual = {(_as_date(r["expense_date"]), r["category"]): r["total"] for r in cursor.fetchall()}
+        for key in sorted(expected.keys() | actual.keys()):
+            want, got = expected.get(key), actual.get(key)
+            # Amounts and totals are DECIMAL(10,2), so a consistent rollup matches exactly.
+            if want is None or got is None or want != got:
+                mismatches.append({"expense_date": key[0], "category": key[1], "expected": want, "actual": got})
+    return mismatches
+
+
+def fix(mismatches):
+    """Refresh the rollup for every date that has a mismatching cell."""
+    dates = sorted({m["expense_date"] for m in mismatches})
+    for expense_date in dates:
+        with db_helper.get_db_cursor(commit=True) as cursor:
+            db_helper.refresh_rollup_for_date(cursor, expense_date)
+    return dates
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill and verify the daily_category_totals rollup.")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--start", type=date.fromisoformat, help="first date (default: earliest expense)")
+    parser.add_argument("--end", type=date.fromisoformat, help="last date (default: latest expense)")
+    parser.add_argument("--window-days", type=int, default=31, help="days per transaction")
+    parser.add_argument("--fix", action="store_true", help="with check: refresh dates that do not match")
+    args = parser.parse_args(argv)
+
+    if args.command == "rebuild":
+        written = rebuild(args.start, args.end, args.window_days)
+        print(f"Rebuilt rollup: {written} rows written")
+        return 0
+
+    mismatches = check(args.start, args.end, args.window_days)
+    for m in mismatches:
+        print(f"{m['expense_date']} {m['category']}: expected {m['expected']}, rollup has {m['actual']}")
+    if not mismatches:
+        print("Rollup is consistent")
+        return 0
+    if args.fix:
+        dates = fix(mismatches)
+        print(f"Refreshed {len(dates)} dates")
+        return 0
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""Production entrypoint: run the API in several uvicorn worker processes.
+
+    python serve.py [--workers N] [--host HOST] [--port PORT]
+
+Defaults come from the environment: WEB_CONCURRENCY (workers, default 1), HOST, PORT, KEEP_ALIVE and GRACEFUL_TIMEOUT (seconds), BACKLOG,
+LIMIT_CONCURRENCY (per worker; beyond it requests get 503 instead of queueing) and
+FORWARDED_ALLOW_IPS (proxies trusted for X-Forwarded-For). Every worker has its own connection pool, so the
+database sees up to workers * DB_POOL_SIZE connections.
+
+State that must be shared between workers has to live outside them: with more
+than one worker, set ANALYTICS_CACHE_URL (Redis) so cached analytics, ETag
+versions and recent-write times agree across workers. VERSION_STORE_URL alone is
+not enough, because a per-process analytics cache would keep serving totals that
+another worker's write changed. Write-behind ingestion and DuckDB keep a file
+only one process may own, so they need a single worker.
+
+BACKEND_MODE=async reads every request from the primary: async_db_helper has its
+own pool and does not go through ReplicatedStore, so DB_REPLICAS is ignored.
+"""
+import argparse
+import os
+import sys
+import uvicorn
+
+
+def check_settings(workers, environ=os.environ):
+    """Problems that make ``workers`` worker processes unsafe with these settings."""
+    if workers <= 1:
+        return []
+    problems = []
+    if not environ.get("ANALYTICS_CACHE_URL"):
+        problems.append("The analytics cache is per process and would go stale; set ANALYTICS_CACHE_URL")
+    if environ.get("INGEST_MODE", "direct").lower() == "writebehind":
+        problems.append("INGEST_MODE=writebehind keeps one journal per process; run a single worker")
+    if environ.get("STORAGE_ENGINE", "mysql").lower() == "duckdb":
+        problems.append("DuckDB allows one process per database file; run a single worker")
+    return problems
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")))
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    problems = check_settings(args.workers)
+    if problems:
+        sys.exit("Cannot run %s workers:\n  %s" % (args.workers, "\n  ".join(problems)))
+    limit_concurrency = os.getenv("LIMIT_CONCURRENCY")
+    uvicorn.run(
+        "server:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        backlog=int(os.getenv("BACKLOG", "2048")),
+        # Longer than a typical load balancer's idle timeout, so the balancer closes first.
+        timeout_keep_alive=int(os.getenv("KEEP_ALIVE", "75")),
+        limit_concurrency=int(limit_concurrency) if limit_concurrency else None,
+        timeout_graceful_shutdown=int(os.getenv("GRACEFUL_TIMEOUT", "30")),
+        proxy_headers=True,
+        forwarded_allow_ips=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        # Request counts and latencies are exported on /metrics instead.
+        access_log=False,
+        log_level=os.getenv("LOG_LEVEL", "info").lower(),
+    )
+
+
+if __name__ == "__main__":
+    main()
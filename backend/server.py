@@ -1,19 +1,81 @@
-from fastapi import FastAPI, HTTPException, Depends
-from datetime import date
-from typing import List
-from pydantic import BaseModel
-from logging_setup import setup_logger
+import base64
+import itertools
+import json
+import os
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field, ValidationError
+from logging_setup import SAMPLED, RequestIdMiddleware, setup_logger
 import db_helper
+import async_db_helper
+import metrics
+from analytics_cache import create_cache_from_env
+from day_cache import create_day_cache_from_env
+from compression import CompressionMiddleware, strip_encoding
+from expense_io import ImportParser, csv_chunks, ndjson_chunks
+from fast_json import FastJSONResponse
+from versions import create_version_store_from_env
+import write_behind
 
 logger = setup_logger("FastAPI")
 
+# "sync" serves requests from the threadpool through db_helper,
+# "async" serves them on the event loop through async_db_helper, which always reads
+# the primary: DB_REPLICAS only takes effect in sync mode.
+backend_mode = os.getenv("BACKEND_MODE", "sync").lower()
+if backend_mode not in ("sync", "async"):
+    raise ValueError(f"BACKEND_MODE must be 'sync' or 'async', got {backend_mode!r}")
+if backend_mode == "async" and db_helper.storage_engine != "mysql":
+    raise ValueError("BACKEND_MODE=async needs STORAGE_ENGINE=mysql; the embedded engines run in sync mode")
+
 app = FastAPI()
+# Responses of at least COMPRESSION_MIN_SIZE bytes are sent brotli- or gzip-encoded.
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1000")))
+app.add_middleware(RequestIdMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+if db_helper.replica_addresses:
+    from replication import ReadYourWritesMiddleware
+
+    # After a write a client reads from the primary until replicas have caught up.
+    app.add_middleware(ReadYourWritesMiddleware, sticky_seconds=float(os.getenv("READ_YOUR_WRITES_SECONDS", "10")))
+analytics_cache = create_cache_from_env()
+expense_versions = create_version_store_from_env()
+# Replica reads of dates any worker wrote in the last DB_REPLICA_MAX_LAG seconds go to the primary.
+db_helper.version_store = expense_versions
+# Rows of recent dates for GET /expenses/{date}, checked against the date's ETag.
+day_cache = create_day_cache_from_env()
+
+def expenses_written(dates):
+    expense_versions.bump(*dates)
+    for expense_date in dates:
+        analytics_cache.invalidate_date(expense_date)
+        day_cache.invalidate(expense_date)
+
+# INGEST_MODE=writebehind: POST /expenses/{date} journals the rows, answers 202 with a
+# ticket, and a background worker writes them in batches; see write_behind.py.
+ingest_queue = write_behind.create_queue_from_env(db_helper.replace_expenses_for_dates, on_flushed=expenses_written)
+metrics.registry.register_gauges("analytics_cache", "Analytics cache counter.", analytics_cache.stats)
+metrics.registry.register_gauges("day_cache", "Per-date expense cache counter.", day_cache.stats)
+if backend_mode == "async":
+    metrics.registry.register_gauges("db_pool", "Async connection pool counter.", async_db_helper.peek_pool_stats)
+else:
+    metrics.registry.register_gauges("db_pool", "Connection pool counter.", db_helper.get_pool_stats)
+if ingest_queue is not None:
+    metrics.registry.register_gauges("ingest", "Write-behind ingestion counter.", ingest_queue.stats)
+sync_router = APIRouter()
+async_router = APIRouter()
 
 class Expense(BaseModel):
     amount: float
     category: str
     notes: str
 
+class ExpenseRecord(Expense):
+    expense_date: date
+
 class DateRange(BaseModel):
     start_date: date
     end_date: date
@@ -23,48 +85,569 @@ class ExpenseAnalytics(BaseModel):
     total: float
     percentage: float
 
+class MonthlyExpenseTotal(BaseModel):
+    year: int
+    month: int
+    category: Optional[str] = None
+    total: float
+
+class ExpenseListItem(ExpenseRecord):
+    id: int
+
+class ExpensePage(BaseModel):
+    items: List[ExpenseListItem]
+    next: Optional[str] = None
+
+# Upper bound on the ranges of one /analytics/batch request; each adds a column to the scan.
+MAX_BATCH_RANGES = 50
+
+class AnalyticsBatchRequest(BaseModel):
+    ranges: List[DateRange] = Field(min_length=1, max_length=MAX_BATCH_RANGES)
+
+class RangeAnalytics(DateRange):
+    breakdown: List[ExpenseAnalytics]
+
+# Longest range a time-series endpoint accepts; the daily series holds one value per day.
+MAX_TIMESERIES_DAYS = 3660
+# Rolling averages also read this many days before the range, so its first days have a full window.
+ROLLING_WINDOWS = (7, 30)
+
+class DailySeries(BaseModel):
+    dates: List[date]
+    totals: List[float]
+    rolling_7: List[Optional[float]]
+    rolling_30: List[Optional[float]]
+
+class WeeklySeries(BaseModel):
+    week_starts: List[date]
+    totals: List[float]
+
+class CategoryPercentiles(BaseModel):
+    category: str
+    count: int
+    percentiles: Dict[str, float]
+
+class BurnRate(BaseModel):
+    budget: float
+    spent: float
+    remaining: float
+    days_elapsed: int
+    days_total: int
+    daily_average: float
+    projected_total: float
+    projected_ratio: Optional[float] = None
+    exhausted_on: Optional[date] = None
+
+class IngestTicket(BaseModel):
+    ticket: str
+    expense_date: date
+    status: str
+    error: Optional[str] = None
+
+class ImportBatchReport(BaseModel):
+    batch: int
+    first_line: int
+    last_line: int
+    received: int
+    inserted: int
+    rejected: int
+    errors: List[str]
+    error: Optional[str] = None
+
+class ImportReport(BaseModel):
+    received: int
+    inserted: int
+    rejected: int
+    batches: List[ImportBatchReport]
+
+# Only the first few validation errors of each import batch are reported back.
+MAX_REPORTED_ERRORS = 20
+
 @app.on_event("startup")
 def startup_event():
-    logger.info("FastAPI server is starting...")
+    logger.info("FastAPI server is starting in %s mode...", backend_mode)
+    if ingest_queue is not None:
+        ingest_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if ingest_queue is not None:
+        await run_in_threadpool(ingest_queue.stop)
+    await async_db_helper.close_pool()
+
+def expense_rows(expenses):
+    return [(expense.amount, expense.category, expense.notes) for expense in expenses]
+
+# The list endpoints below build their rows in the response shape from trusted database
+# rows and return them as FastJSONResponse, skipping response_model validation; the
+# response_model declarations only document the shape.
+
+def expense_items(rows):
+    """Expense response rows from database rows (or cached ones)."""
+    return [{"amount": float(row["amount"]), "category": row["category"], "notes": row["notes"]} for row in rows]
+
+def build_breakdown(data):
+    """ExpenseAnalytics rows from {category, total} summary rows."""
+    totals = [(row["category"], float(row["total"])) for row in data]
+    total = sum(amount for _, amount in totals)
+    return [
+        {"category": category, "total": amount, "percentage": (amount / total) * 100 if total != 0 else 0.0}
+        for category, amount in totals
+    ]
+
+def queue_expenses(expense_date, expenses):
+    try:
+        ticket = ingest_queue.submit(expense_date, expense_rows(expenses))
+    except OSError as e:
+        logger.error("Error journaling expenses: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error updating expenses: {str(e)}")
+    return JSONResponse(
+        status_code=202,
+        content={"message": "Expenses queued", "ticket": ticket},
+        headers={"Location": f"/ingest/tickets/{ticket}"},
+    )
+
+def pending_expenses(expense_date):
+    """Rows queued for a date by write-behind ingestion but not yet written, or None."""
+    rows = ingest_queue.pending_rows(expense_date) if ingest_queue is not None else None
+    if rows is None:
+        return None
+    if not rows:
+        raise HTTPException(status_code=404, detail="No expenses found for this date")
+    return [{"amount": amount, "category": category, "notes": notes} for amount, category, notes in rows]
+
+def matching_etag(request, etag):
+    """The If-None-Match tag that matches ``etag`` in any content encoding, or None."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    for tag in header.split(","):
+        tag = tag.strip().removeprefix("W/")
+        if tag == "*" or strip_encoding(tag) == etag:
+            return etag if tag == "*" else tag
+    return None
+
+def etag_matches(request, etag):
+    return matching_etag(request, etag) is not None
+
+def not_modified(request, etag):
+    # Echo the tag the client holds, so a 304 for a compressed copy keeps its encoding suffix.
+    return Response(status_code=304, headers={"ETag": matching_etag(request, etag), "Cache-Control": "no-cache"})
+
+def set_validators(response, etag):
+    response.headers["ETag"] = etag
+    # Clients may keep the body but must revalidate before reusing it.
+    response.headers["Cache-Control"] = "no-cache"
+
+@app.get("/stats/cache")
+def get_cache_stats():
+    return analytics_cache.stats()
+
+@app.get("/stats/day-cache")
+def get_day_cache_stats():
+    return day_cache.stats()
+
+@app.get("/ingest/tickets/{ticket}", response_model=IngestTicket)
+def get_ingest_ticket(ticket: str):
+    status = ingest_queue.status(ticket) if ingest_queue is not None else None
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown ticket")
+    return status
+
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.post("/analytics/batch", response_model=List[RangeAnalytics])
+def get_batch_analytics(batch: AnalyticsBatchRequest):
+    """Category breakdowns for many date ranges, e.g. this week, last week, MTD and YTD.
+
+    Ranges already in the analytics cache are answered from it; the rest are summed
+    together in one scan of the rollup. Ranges without expenses get an empty breakdown.
+    """
+    ranges = [(r.start_date, r.end_date) for r in batch.ranges]
+    logger.info("Fetching batch analytics for %s ranges", len(ranges), extra=SAMPLED)
+    breakdowns = {r: analytics_cache.get(*r) for r in dict.fromkeys(ranges)}
+    missing = [r for r, breakdown in breakdowns.items() if breakdown is None]
+    if missing:
+        generation = analytics_cache.generation
+        try:
+            summaries = db_helper.fetch_expense_summaries(missing)
+        except Exception as e:
+            logger.error("Database error: %s", e)
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        for r, data in zip(missing, summaries):
+            breakdowns[r] = build_breakdown(data)
+            if breakdowns[r]:
+                analytics_cache.set(*r, breakdowns[r], generation)
+    return FastJSONResponse([
+        {"start_date": start, "end_date": end, "breakdown": breakdowns[(start, end)]} for start, end in ranges
+    ])
+
+def check_timeseries_range(date_range):
+    if date_range.end_date < date_range.start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    if (date_range.end_date - date_range.start_date).days >= MAX_TIMESERIES_DAYS:
+        raise HTTPException(status_code=400, detail=f"Ranges are limited to {MAX_TIMESERIES_DAYS} days")
+
+def load_expense_columns(start_date, end_date, category=None):
+    """Expenses of [start_date, end_date] as NumPy columns, optionally of one category."""
+    # numpy is only loaded once a time-series endpoint is used, not at server start.
+    import timeseries
 
-@app.get("/expenses/{expense_date}", response_model=List[Expense])
-def get_expenses(expense_date: date):
     try:
-        expenses = db_helper.fetch_expenses_for_date(expense_date)
-        if not expenses:
-            raise HTTPException(status_code=404, detail="No expenses found for this date")
-        return expenses
+        columns = timeseries.ExpenseColumns.from_batches(
+            db_helper.stream_expense_records(start_date, end_date, batch_size=10000)
+        )
     except Exception as e:
-        logger.error(f"Database error: {str(e)}")
+        logger.error("Database error: %s", e)
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    return timeseries, columns.for_category(category) if category else columns
+
+@app.get("/analytics/timeseries/daily", response_model=DailySeries)
+def get_daily_series(request: Request, response: Response, date_range: DateRange = Depends(), category: Optional[str] = None):
+    """Daily totals of the range with trailing 7- and 30-day averages."""
+    check_timeseries_range(date_range)
+    load_start = date_range.start_date - timedelta(days=max(ROLLING_WINDOWS) - 1)
+    etag = expense_versions.etag_for_range(load_start, date_range.end_date)
+    if etag_matches(request, etag):
+        return not_modified(request, etag)
+    timeseries, columns = load_expense_columns(load_start, date_range.end_date, category)
+    daily = timeseries.daily_totals(columns, load_start, date_range.end_date)
+    skip = max(ROLLING_WINDOWS) - 1
+    set_validators(response, etag)
+    return {
+        "dates": [date_range.start_date + timedelta(days=i) for i in range(len(daily) - skip)],
+        "totals": daily[skip:].tolist(),
+        "rolling_7": timeseries.to_json_floats(timeseries.rolling_mean(daily, 7)[skip:]),
+        "rolling_30": timeseries.to_json_floats(timeseries.rolling_mean(daily, 30)[skip:]),
+    }
+
+@app.get("/analytics/timeseries/weekly", response_model=WeeklySeries)
+def get_weekly_series(request: Request, response: Response, date_range: DateRange = Depends(), category: Optional[str] = None):
+    """Totals per Monday-based week; the first and last weeks are clipped to the range."""
+    check_timeseries_range(date_range)
+    etag = expense_versions.etag_for_range(date_range.start_date, date_range.end_date)
+    if etag_matches(request, etag):
+        return not_modified(request, etag)
+    timeseries, columns = load_expense_columns(date_range.start_date, date_range.end_date, category)
+    daily = timeseries.daily_totals(columns, date_range.start_date, date_range.end_date)
+    week_starts, totals = timeseries.weekly_totals(daily, date_range.start_date)
+    set_validators(response, etag)
+    return {"week_starts": week_starts, "totals": totals.tolist()}
+
+@app.get("/analytics/timeseries/percentiles", response_model=List[CategoryPercentiles])
+def get_category_percentiles(
+    request: Request,
+    response: Response,
+    date_range: DateRange = Depends(),
+    q: List[float] = Query([50.0, 90.0, 99.0]),
+):
+    """Percentiles of individual expense amounts per category, keyed "p50", "p90", ..."""
+    check_timeseries_range(date_range)
+    if any(not 0 <= value <= 100 for value in q):
+        raise HTTPException(status_code=400, detail="Percentiles must be between 0 and 100")
+    etag = expense_versions.etag_for_range(date_range.start_date, date_range.end_date)
+    if etag_matches(request, etag):
+        return not_modified(request, etag)
+    timeseries, columns = load_expense_columns(date_range.start_date, date_range.end_date)
+    set_validators(response, etag)
+    return [
+        {"category": name, "count": count, "percentiles": {f"p{p:g}": float(v) for p, v in zip(q, values)}}
+        for name, count, values in timeseries.category_percentiles(columns, q)
+    ]
+
+@app.get("/analytics/timeseries/burn-rate", response_model=BurnRate)
+def get_burn_rate(
+    date_range: DateRange = Depends(),
+    budget: float = Query(..., gt=0),
+    as_of: Optional[date] = None,
+    category: Optional[str] = None,
+):
+    """Spending pace against ``budget`` for the period [start_date, end_date] as of ``as_of`` (default today)."""
+    check_timeseries_range(date_range)
+    timeseries, columns = load_expense_columns(date_range.start_date, date_range.end_date, category)
+    daily = timeseries.daily_totals(columns, date_range.start_date, date_range.end_date)
+    return timeseries.burn_rate(daily, date_range.start_date, as_of or date.today(), budget)
+
+@app.get("/expenses/export")
+def export_expenses(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+):
+    logger.info("Exporting expenses as %s for range: %s - %s", format, start, end)
+    batches = db_helper.stream_expense_records(start, end)
+    # The stream is lazy: read the first batch here, so a database error becomes a 500
+    # instead of a truncated body after the 200 headers have been sent.
+    try:
+        first = next(batches, None)
+    except Exception as e:
+        logger.error("Database error: %s", e)
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    if first is not None:
+        batches = itertools.chain([first], batches)
+    if format == "csv":
+        return StreamingResponse(
+            csv_chunks(batches),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="expenses.csv"'},
+        )
+    return StreamingResponse(ndjson_chunks(batches), media_type="application/x-ndjson")
+
+def encode_page_token(row):
+    """Opaque continuation token for the (expense_date, id) key of the last row on a page."""
+    key = json.dumps([str(row["expense_date"]), row["id"]])
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+def decode_page_token(token):
+    try:
+        expense_date, expense_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return date.fromisoformat(expense_date), int(expense_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid page token")
+
+@app.get("/expenses", response_model=ExpensePage)
+def list_expenses(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    category: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+):
+    after_key = decode_page_token(after) if after else None
+    try:
+        rows = db_helper.fetch_expenses_page(start, end, category, after_key, limit + 1)
+    except Exception as e:
+        logger.error("Database error: %s", e)
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    items = [
+        {
+            "id": row["id"], "expense_date": row["expense_date"], "amount": float(row["amount"]),
+            "category": row["category"], "notes": row["notes"],
+        }
+        for row in rows[:limit]
+    ]
+    next_token = encode_page_token(items[-1]) if len(rows) > limit else None
+    return FastJSONResponse({"items": items, "next": next_token})
+
+def load_import_batch(number, records):
+    """Validate one batch of parsed import records and insert the valid rows."""
+    rows, errors = [], []
+    for line_number, record, error in records:
+        if error is None:
+            try:
+                expense = ExpenseRecord.model_validate(record)
+                rows.append((expense.expense_date, expense.amount, expense.category, expense.notes))
+                continue
+            except ValidationError as e:
+                first = e.errors()[0]
+                error = f"{'.'.join(str(part) for part in first['loc'])}: {first['msg']}"
+        errors.append(f"line {line_number}: {error}")
+
+    report = {
+        "batch": number,
+        "first_line": records[0][0],
+        "last_line": records[-1][0],
+        "received": len(records),
+        "inserted": 0,
+        "rejected": len(errors),
+        "errors": errors[:MAX_REPORTED_ERRORS],
+    }
+    try:
+        report["inserted"] = db_helper.bulk_insert_expenses(rows)
+    except Exception as e:
+        logger.error("Error importing batch %s: %s", number, e)
+        report["rejected"] = len(records)
+        report["error"] = f"Database error: {str(e)}"
+        rows = []
+    return report, sorted({row[0] for row in rows})
 
-@app.post("/expenses/{expense_date}")
+@app.post("/expenses/import", response_model=ImportReport)
+async def import_expenses(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    batch_size: int = Query(5000, ge=1, le=50000),
+):
+    """Load a streamed CSV/NDJSON upload covering any number of dates, batch by batch."""
+    parser = ImportParser(format)
+    reports, pending = [], []
+
+    async def flush(records):
+        report, dates = await run_in_threadpool(load_import_batch, len(reports) + 1, records)
+        reports.append(report)
+        # Each batch commits on its own, so its dates go stale now, even if a later batch
+        # or the upload itself fails.
+        if dates:
+            expense_versions.bump(*dates)
+            analytics_cache.invalidate_range(dates[0], dates[-1])
+
+    async for chunk in request.stream():
+        pending.extend(parser.feed(chunk))
+        while len(pending) >= batch_size:
+            await flush(pending[:batch_size])
+            pending = pending[batch_size:]
+    pending.extend(parser.close())
+    if pending:
+        await flush(pending)
+
+    logger.info("Imported %s expenses in %s batches", sum(r["inserted"] for r in reports), len(reports))
+    return {
+        "received": sum(r["received"] for r in reports),
+        "inserted": sum(r["inserted"] for r in reports),
+        "rejected": sum(r["rejected"] for r in reports),
+        "batches": reports,
+    }
+
+@app.post("/analytics/monthly/", response_model=List[MonthlyExpenseTotal])
+def get_monthly_analytics(date_range: DateRange, by_category: bool = False):
+    logger.info("Fetching monthly analytics for range: %s - %s", date_range.start_date, date_range.end_date, extra=SAMPLED)
+    try:
+        data = db_helper.fetch_monthly_summary(date_range.start_date, date_range.end_date, by_category)
+    except Exception as e:
+        logger.error("Database error: %s", e)
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    if not data:
+        raise HTTPException(status_code=404, detail="No data available for the given date range")
+    return data
+
+@sync_router.get("/stats/pool")
+def get_pool_stats():
+    return db_helper.get_pool_stats()
+
+@sync_router.get("/expenses/{expense_date}", response_model=List[Expense])
+def get_expenses(expense_date: date, request: Request):
+    # Queued rows are newer than anything in the database and have no version yet.
+    pending = pending_expenses(expense_date)
+    if pending is not None:
+        return FastJSONResponse(pending)
+    # The version is read before the rows, so a concurrent write can only make the ETag stale, never wrong.
+    etag = expense_versions.etag_for_date(expense_date)
+    if etag_matches(request, etag):
+        return not_modified(request, etag)
+    expenses = day_cache.get(expense_date, etag)
+    if expenses is None:
+        try:
+            expenses = db_helper.fetch_expenses_for_date(expense_date)
+        except Exception as e:
+            logger.error("Database error: %s", e)
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        day_cache.set(expense_date, etag, expenses)
+    if not expenses:
+        raise HTTPException(status_code=404, detail="No expenses found for this date")
+    response = FastJSONResponse(expense_items(expenses))
+    set_validators(response, etag)
+    return response
+
+@sync_router.post("/expenses/{expense_date}")
 def add_or_update_expense(expense_date: date, expenses: List[Expense]):
+    if ingest_queue is not None:
+        return queue_expenses(expense_date, expenses)
     try:
-        db_helper.delete_expenses_for_date(expense_date)
-        for expense in expenses:
-            db_helper.insert_expense(expense_date, expense.amount, expense.category, expense.notes)
+        if db_helper.replace_expenses_for_date(expense_date, expense_rows(expenses)):
+            expenses_written([expense_date])
         return {"message": "Expenses updated successfully"}
     except Exception as e:
-        logger.error(f"Error updating expenses: {str(e)}")
+        logger.error("Error updating expenses: %s", e)
         raise HTTPException(status_code=500, detail=f"Error updating expenses: {str(e)}")
 
-@app.post("/analytics/", response_model=List[ExpenseAnalytics])
+@sync_router.post("/analytics/", response_model=List[ExpenseAnalytics])
 def get_analytics(date_range: DateRange):
-    logger.info(f"Fetching analytics for range: {date_range.start_date} - {date_range.end_date}")
+    logger.info("Fetching analytics for range: %s - %s", date_range.start_date, date_range.end_date, extra=SAMPLED)
+    breakdown = analytics_cache.get(date_range.start_date, date_range.end_date)
+    if breakdown is None:
+        generation = analytics_cache.generation
+        try:
+            data = db_helper.fetch_expense_summary(date_range.start_date, date_range.end_date)
+        except Exception as e:
+            logger.error("Database error: %s", e)
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        breakdown = build_breakdown(data)
+        # Empty results are not cached: db_helper also returns [] when the query fails.
+        if breakdown:
+            analytics_cache.set(date_range.start_date, date_range.end_date, breakdown, generation)
+    if not breakdown:
+        raise HTTPException(status_code=404, detail="No data available for the given date range")
+    return FastJSONResponse(breakdown)
+
+@sync_router.get("/analytics/", response_model=List[ExpenseAnalytics])
+def get_analytics_conditional(request: Request, date_range: DateRange = Depends()):
+    """POST /analytics/ as a conditional GET on ?start_date=...&end_date=..."""
+    etag = expense_versions.etag_for_range(date_range.start_date, date_range.end_date)
+    if etag_matches(request, etag):
+        return not_modified(request, etag)
+    response = get_analytics(date_range)
+    set_validators(response, etag)
+    return response
+
+@async_router.get("/stats/pool")
+async def get_pool_stats_async():
+    return await async_db_helper.get_pool_stats()
+
+@async_router.get("/expenses/{expense_date}", response_model=List[Expense])
+async def get_expenses_async(expense_date: date, request: Request):
+    # Queued rows are newer than anything in the database and have no version yet.
+    pending = pending_expenses(expense_date)
+    if pending is not None:
+        return FastJSONResponse(pending)
+    # The version is read before the rows, so a concurrent write can only make the ETag stale, never wrong.
+    etag = expense_versions.etag_for_date(expense_date)
+    if etag_matches(request, etag):
+        return not_modified(request, etag)
+    expenses = day_cache.get(expense_date, etag)
+    if expenses is None:
+        try:
+            expenses = await async_db_helper.fetch_expenses_for_date(expense_date)
+        except Exception as e:
+            logger.error("Database error: %s", e)
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        day_cache.set(expense_date, etag, expenses)
+    if not expenses:
+        raise HTTPException(status_code=404, detail="No expenses found for this date")
+    response = FastJSONResponse(expense_items(expenses))
+    set_validators(response, etag)
+    return response
+
+@async_router.post("/expenses/{expense_date}")
+async def add_or_update_expense_async(expense_date: date, expenses: List[Expense]):
+    if ingest_queue is not None:
+        # Journaling waits on fsync, so it stays off the event loop.
+        return await run_in_threadpool(queue_expenses, expense_date, expenses)
     try:
-        data = db_helper.fetch_expense_summary(date_range.start_date, date_range.end_date)
-        if not data:
-            raise HTTPException(status_code=404, detail="No data available for the given date range")
-        total = sum(row["total"] for row in data)
-        breakdown = [
-            ExpenseAnalytics(
-                category=row["category"],
-                total=row["total"],
-                percentage=(row["total"] / total) * 100 if total != 0 else 0
-            ) for row in data
-        ]
-        return breakdown
+        if await async_db_helper.replace_expenses_for_date(expense_date, expense_rows(expenses)):
+            expenses_written([expense_date])
+        return {"message": "Expenses updated successfully"}
     except Exception as e:
-        logger.error(f"Database error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        logger.error("Error updating expenses: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error updating expenses: {str(e)}")
+
+@async_router.post("/analytics/", response_model=List[ExpenseAnalytics])
+async def get_analytics_async(date_range: DateRange):
+    logger.info("Fetching analytics for range: %s - %s", date_range.start_date, date_range.end_date, extra=SAMPLED)
+    breakdown = analytics_cache.get(date_range.start_date, date_range.end_date)
+    if breakdown is None:
+        generation = analytics_cache.generation
+        try:
+            data = await async_db_helper.fetch_expense_summary(date_range.start_date, date_range.end_date)
+        except Exception as e:
+            logger.error("Database error: %s", e)
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        breakdown = build_breakdown(data)
+        # Empty results are not cached: db_helper also returns [] when the query fails.
+        if breakdown:
+            analytics_cache.set(date_range.start_date, date_range.end_date, breakdown, generation)
+    if not breakdown:
+        raise HTTPException(status_code=404, detail="No data available for the given date range")
+    return FastJSONResponse(breakdown)
+
+@async_router.get("/analytics/", response_model=List[ExpenseAnalytics])
+async def get_analytics_conditional_async(request: Request, date_range: DateRange = Depends()):
+    """POST /analytics/ as a conditional GET on ?start_date=...&end_date=..."""
+    etag = expense_versions.etag_for_range(date_range.start_date, date_range.end_date)
+    if etag_matches(request, etag):
+        return not_modified(request, etag)
+    response = await get_analytics_async(date_range)
+    set_validators(response, etag)
+    return response
+
+app.include_router(async_router if backend_mode == "async" else sync_router)
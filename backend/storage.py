@@ -0,0 +1,453 @@
+"""Storage engines behind db_helper.
+
+db_helper sends every operation to one ``ExpenseStore``, chosen with STORAGE_ENGINE:
+
+    mysql   the MySQL server configured by DB_HOST, DB_PORT, ... (default)
+    sqlite  a local SQLite file in WAL mode at STORAGE_PATH
+    duckdb  a local DuckDB file at STORAGE_PATH (requires the ``duckdb`` package)
+
+The embedded engines create their own schema and need no server, which suits
+tests, local runs and single-node deployments. DuckDB stores columns, so range
+aggregations scan only the columns they use and it answers analytics straight
+from the expenses table; SQLite keeps the daily_category_totals rollup like MySQL.
+"""
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import date
+
+
+def _normalise_rows(rows):
+    return sorted((round(float(amount), 2), category, notes or "") for amount, category, notes in rows)
+
+
+def expense_rows_match(stored, incoming):
+    """Return True when two lists of (amount, category, notes) rows hold the same expenses, in any order."""
+    return _normalise_rows(stored) == _normalise_rows(incoming)
+
+
+def build_expenses_page_query(start_date, end_date, category, after, limit, placeholder="%s"):
+    """Return the (query, params) of one keyset page, ordered by (expense_date, id)."""
+    query = "SELECT id, expense_date, amount, category, notes FROM expenses"
+    conditions, params = [], []
+    if start_date is not None:
+        conditions.append(f"expense_date >= {placeholder}")
+        params.append(start_date)
+    if end_date is not None:
+        conditions.append(f"expense_date <= {placeholder}")
+        params.append(end_date)
+    if category is not None:
+        conditions.append(f"category = {placeholder}")
+        params.append(category)
+    if after is not None:
+        conditions.append(f"(expense_date > {placeholder} OR (expense_date = {placeholder} AND id > {placeholder}))")
+        params.extend([after[0], after[0], after[1]])
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY expense_date, id LIMIT {placeholder}"
+    params.append(limit)
+    return query, params
+
+
+def build_range_totals_query(range_count, table, amount_column, placeholder="%s"):
+    """Return a query that totals ``amount_column`` per category for many date ranges in one scan.
+
+    Column ``r<i>`` holds range i's total, NULL when the category has no rows in it.
+    Parameters come from ``range_totals_params``.
+    """
+    columns = ", ".join(
+        f"SUM(CASE WHEN expense_date BETWEEN {placeholder} AND {placeholder} THEN {amount_column} END) AS r{i}"
+        for i in range(range_count)
+    )
+    return f"""
+        SELECT category, {columns}
+        FROM {table}
+        WHERE expense_date BETWEEN {placeholder} AND {placeholder}
+        GROUP BY category
+    """
+
+
+def range_totals_params(ranges):
+    params = [value for start_date, end_date in ranges for value in (start_date, end_date)]
+    return params + [min(start for start, _ in ranges), max(end for _, end in ranges)]
+
+
+def split_range_totals(rows, range_count):
+    """Turn the rows of a range-totals query into one [{category, total}] list per range."""
+    return [
+        [{"category": row["category"], "total": row[f"r{i}"]} for row in rows if row[f"r{i}"] is not None]
+        for i in range(range_count)
+    ]
+
+
+class ExpenseStore(ABC):
+    """Operations db_helper needs from a storage engine.
+
+    Rows are dicts keyed by column name. Methods raise on database errors;
+    db_helper decides which ones to log and swallow.
+    """
+
+    engine = None
+
+    @abstractmethod
+    def fetch_all_records(self):
+        """Return every expense row."""
+
+    @abstractmethod
+    def stream_expense_records(self, start_date, end_date, batch_size):
+        """Yield expense rows in (expense_date, id) order, ``batch_size`` rows at a time."""
+
+    @abstractmethod
+    def fetch_expenses_page(self, start_date, end_date, category, after, limit):
+        """Return up to ``limit`` rows after the (expense_date, id) key ``after``."""
+
+    @abstractmethod
+    def fetch_expenses_for_date(self, expense_date):
+        """Return the expense rows of one date."""
+
+    @abstractmethod
+    def insert_expense(self, expense_date, amount, category, notes):
+        """Add one expense."""
+
+    @abstractmethod
+    def delete_expenses_for_date(self, expense_date):
+        """Remove every expense of one date."""
+
+    @abstractmethod
+    def replace_expenses_for_date(self, expense_date, expenses):
+        """Atomically replace a date's (amount, category, notes) rows; False when they already match."""
+
+    @abstractmethod
+    def replace_expenses_for_dates(self, submissions):
+        """Replace the rows of every date in the {expense_date: rows} mapping in one
+        transaction; returns the dates whose rows changed."""
+
+    @abstractmethod
+    def bulk_insert_expenses(self, expenses):
+        """Append (expense_date, amount, category, notes) rows in one transaction; returns the count."""
+
+    @abstractmethod
+    def fetch_expense_summary(self, start_date, end_date):
+        """Return {category, total} rows for a date range."""
+
+    @abstractmethod
+    def fetch_expense_summaries(self, ranges):
+        """Return one {category, total} list per (start_date, end_date) in ``ranges``, from a single scan."""
+
+    @abstractmethod
+    def fetch_monthly_summary(self, start_date, end_date, by_category):
+        """Return {year, month[, category], total} rows for a date range."""
+
+    def replication_lag(self):
+        """Seconds this store trails its primary; 0.0 for a store that is not a replica."""
+        return 0.0
+
+    def stats(self):
+        return {"engine": self.engine}
+
+    def close(self):
+        pass
+
+
+class EmbeddedStore(ExpenseStore):
+    """SQL shared by the embedded engines. Each thread gets its own connection."""
+
+    schema = ()
+    begin_statement = "BEGIN"
+    year_column = month_column = None
+    # Whether writes keep daily_category_totals up to date and summaries read from it.
+    uses_rollup = True
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        with self._transaction() as connection:
+            for statement in self.schema:
+                connection.execute(statement)
+
+    @abstractmethod
+    def _connect(self):
+        """Open a new connection to the database at ``self.path``."""
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    @staticmethod
+    def _dicts(result, rows):
+        columns = [column[0] for column in result.description]
+        return [dict(zip(columns, row)) for row in rows]
+
+    def _query(self, query, params=()):
+        result = self._connection().execute(query, params)
+        return self._dicts(result, result.fetchall())
+
+    @contextmanager
+    def _transaction(self):
+        connection = self._connection()
+        connection.execute(self.begin_statement)
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def _refresh_rollup(self, connection, expense_date):
+        if not self.uses_rollup:
+            return
+        connection.execute("DELETE FROM daily_category_totals WHERE expense_date = ?", (expense_date,))
+        connection.execute("""
+            INSERT INTO daily_category_totals (expense_date, category, total)
+            SELECT expense_date, category, SUM(amount)
+            FROM expenses
+            WHERE expense_date = ?
+            GROUP BY expense_date, category
+        """, (expense_date,))
+
+    def fetch_all_records(self):
+        return self._query("SELECT * FROM expenses")
+
+    def stream_expense_records(self, start_date, end_date, batch_size):
+        query = "SELECT id, expense_date, amount, category, notes FROM expenses"
+        conditions, params = [], []
+        if start_date is not None:
+            conditions.append("expense_date >= ?")
+            params.append(start_date)
+        if end_date is not None:
+            conditions.append("expense_date <= ?")
+            params.append(end_date)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY expense_date, id"
+        # The consumer may resume the generator on another thread, so it gets a connection of its own.
+        connection = self._connect()
+        try:
+            result = connection.execute(query, params)
+            while True:
+                rows = result.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield self._dicts(result, rows)
+        finally:
+            connection.close()
+
+    def fetch_expenses_page(self, start_date, end_date, category, after, limit):
+        return self._query(*build_expenses_page_query(start_date, end_date, category, after, limit, "?"))
+
+    def fetch_expenses_for_date(self, expense_date):
+        return self._query("SELECT * FROM expenses WHERE expense_date = ?", (expense_date,))
+
+    def insert_expense(self, expense_date, amount, category, notes):
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT INTO expenses (expense_date, amount, category, notes) VALUES (?, ?, ?, ?)",
+                (expense_date, amount, category, notes),
+            )
+            self._refresh_rollup(connection, expense_date)
+
+    def delete_expenses_for_date(self, expense_date):
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM expenses WHERE expense_date = ?", (expense_date,))
+            self._refresh_rollup(connection, expense_date)
+
+    def _replace_date(self, connection, expense_date, expenses):
+        result = connection.execute(
+            "SELECT amount, category, notes FROM expenses WHERE expense_date = ?", (expense_date,)
+        )
+        if expense_rows_match(result.fetchall(), expenses):
+            return False
+        connection.execute("DELETE FROM expenses WHERE expense_date = ?", (expense_date,))
+        if expenses:
+            connection.executemany(
+                "INSERT INTO expenses (expense_date, amount, category, notes) VALUES (?, ?, ?, ?)",
+                [(expense_date, amount, category, notes) for amount, category, notes in expenses],
+            )
+        self._refresh_rollup(connection, expense_date)
+        return True
+
+    def replace_expenses_for_date(self, expense_date, expenses):
+        with self._transaction() as connection:
+            return self._replace_date(connection, expense_date, expenses)
+
+    def replace_expenses_for_dates(self, submissions):
+        with self._transaction() as connection:
+            return [d for d in sorted(submissions) if self._replace_date(connection, d, submissions[d])]
+
+    def bulk_insert_expenses(self, expenses):
+        if not expenses:
+            return 0
+        with self._transaction() as connection:
+            connection.executemany(
+                "INSERT INTO expenses (expense_date, amount, category, notes) VALUES (?, ?, ?, ?)",
+                list(expenses),
+            )
+            if self.uses_rollup:
+                totals = {}
+                for expense_date, amount, category, notes in expenses:
+                    totals[(expense_date, category)] = totals.get((expense_date, category), 0.0) + float(amount)
+                connection.executemany("""
+                    INSERT INTO daily_category_totals (expense_date, category, total)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT (expense_date, category) DO UPDATE SET total = total + excluded.total
+                """, [(expense_date, category, total) for (expense_date, category), total in totals.items()])
+        return len(expenses)
+
+    def fetch_expense_summary(self, start_date, end_date):
+        if self.uses_rollup:
+            query = """
+                SELECT category, SUM(total) AS total
+                FROM daily_category_totals
+                WHERE expense_date BETWEEN ? AND ?
+                GROUP BY category
+            """
+        else:
+            query = """
+                SELECT category, SUM(amount) AS total
+                FROM expenses
+                WHERE expense_date BETWEEN ? AND ?
+                GROUP BY category
+            """
+        return self._query(query, (start_date, end_date))
+
+    def fetch_expense_summaries(self, ranges):
+        table, total = ("daily_category_totals", "total") if self.uses_rollup else ("expenses", "amount")
+        query = build_range_totals_query(len(ranges), table, total, "?")
+        return split_range_totals(self._query(query, range_totals_params(ranges)), len(ranges))
+
+    def fetch_monthly_summary(self, start_date, end_date, by_category):
+        group_columns = "year, month, category" if by_category else "year, month"
+        category_column = "category, " if by_category else ""
+        table, total = ("daily_category_totals", "total") if self.uses_rollup else ("expenses", "amount")
+        return self._query(f"""
+            SELECT {self.year_column} AS year, {self.month_column} AS month, {category_column}SUM({total}) AS total
+            FROM {table}
+            WHERE expense_date BETWEEN ? AND ?
+            GROUP BY {group_columns}
+            ORDER BY {group_columns}
+        """, (start_date, end_date))
+
+    def stats(self):
+        with self._lock:
+            return {"engine": self.engine, "path": self.path, "connections": len(self._connections)}
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+
+def _iso_dates(parameters):
+    return [value.isoformat() if isinstance(value, date) else value for value in parameters]
+
+
+class _SQLiteConnection(sqlite3.Connection):
+    """Binds dates as ISO strings, so the store needs no process-wide sqlite3 adapters."""
+
+    def execute(self, sql, parameters=()):
+        return super().execute(sql, _iso_dates(parameters))
+
+    def executemany(self, sql, seq_of_parameters):
+        return super().executemany(sql, (_iso_dates(parameters) for parameters in seq_of_parameters))
+
+
+class SQLiteStore(EmbeddedStore):
+    """SQLite file in WAL mode: readers never block the single writer, and commits skip a full fsync."""
+
+    engine = "sqlite"
+    # Take the write lock up front so the compare-then-replace in replace_expenses_for_date cannot interleave.
+    begin_statement = "BEGIN IMMEDIATE"
+    year_column = "CAST(strftime('%Y', expense_date) AS INTEGER)"
+    month_column = "CAST(strftime('%m', expense_date) AS INTEGER)"
+    schema = (
+        """
+        CREATE TABLE IF NOT EXISTS expenses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            expense_date DATE NOT NULL,
+            amount REAL NOT NULL,
+            category VARCHAR(255) NOT NULL,
+            notes TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses (expense_date, id)",
+        "CREATE INDEX IF NOT EXISTS idx_expenses_category_date_id ON expenses (category, expense_date, id)",
+        """
+        CREATE TABLE IF NOT EXISTS daily_category_totals (
+            expense_date DATE NOT NULL,
+            category VARCHAR(255) NOT NULL,
+            total REAL NOT NULL,
+            PRIMARY KEY (expense_date, category)
+        )
+        """,
+    )
+
+    def __init__(self, path, busy_timeout=5.0):
+        self.busy_timeout = busy_timeout
+        super().__init__(path)
+
+    def _connect(self):
+        # isolation_level=None leaves transactions to the explicit BEGIN/COMMIT in _transaction.
+        connection = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            isolation_level=None,
+            check_same_thread=False,
+            factory=_SQLiteConnection,
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    @staticmethod
+    def _dicts(result, rows):
+        # expense_date is stored as an ISO string; hand it back as a date, as MySQL does.
+        rows = EmbeddedStore._dicts(result, rows)
+        for row in rows:
+            if isinstance(row.get("expense_date"), str):
+                row["expense_date"] = date.fromisoformat(row["expense_date"])
+        return rows
+
+
+class DuckDBStore(EmbeddedStore):
+    """DuckDB file; one process may open it for writing at a time."""
+
+    engine = "duckdb"
+    begin_statement = "BEGIN TRANSACTION"
+    year_column = "year(expense_date)"
+    month_column = "month(expense_date)"
+    uses_rollup = False
+    schema = (
+        "CREATE SEQUENCE IF NOT EXISTS expenses_id_seq",
+        """
+        CREATE TABLE IF NOT EXISTS expenses (
+            id BIGINT DEFAULT nextval('expenses_id_seq'),
+            expense_date DATE NOT NULL,
+            amount DOUBLE NOT NULL,
+            category VARCHAR NOT NULL,
+            notes VARCHAR
+        )
+        """,
+    )
+
+    def __init__(self, path):
+        import duckdb
+
+        self._database = duckdb.connect(path)
+        super().__init__(path)
+
+    def _connect(self):
+        # cursor() opens another connection to the same database for this thread.
+        return self._database.cursor()
+
+    def close(self):
+        super().close()
+        self._database.close()
@@ -1,6 +1,11 @@
 import pytest
+from datetime import date
 from fastapi.testclient import TestClient
+import compression
+import db_helper
+import server
 from server import app
+from write_behind import Journal, WriteBehindQueue
 
 test_client = TestClient(app)
 
@@ -23,6 +28,7 @@ def test_post_expenses():
     response = test_client.post("/expenses/2024-08-16", json=test_data)
     assert response.status_code == 200
     assert response.json()["message"] == "Expenses updated successfully"
+    test_client.post("/expenses/2024-08-16", json=[])
 
 def test_post_expenses_invalid_data():
     invalid_data = [{"amount": "NaN", "category": 123, "notes": None}]
@@ -39,3 +45,205 @@ def test_analytics():
 def test_analytics_invalid_date():
     response = test_client.post("/analytics/", json={"start_date": "invalid", "end_date": "invalid"})
     assert response.status_code == 422  
+
+def test_monthly_analytics():
+    response = test_client.post("/analytics/monthly/", json={"start_date": "2024-01-01", "end_date": "2024-12-31"})
+    assert response.status_code in [200, 404]
+    if response.status_code == 200:
+        data = response.json()
+        assert all({"year", "month", "total"} <= set(row) for row in data)
+
+def test_export_expenses_csv():
+    response = test_client.get("/expenses/export?format=csv&start=2024-08-01&end=2024-08-31")
+    assert response.status_code == 200
+    assert response.text.splitlines()[0] == "id,expense_date,amount,category,notes"
+
+def test_export_expenses_database_error(monkeypatch):
+    def failing_stream(start_date=None, end_date=None, batch_size=1000):
+        raise RuntimeError("connection refused")
+        yield
+    monkeypatch.setattr(db_helper, "stream_expense_records", failing_stream)
+    response = test_client.get("/expenses/export?format=ndjson")
+    assert response.status_code == 500
+    assert "connection refused" in response.json()["detail"]
+
+def test_export_expenses_invalid_format():
+    response = test_client.get("/expenses/export?format=xml")
+    assert response.status_code == 422
+
+def test_import_expenses_reports_invalid_rows():
+    body = "expense_date,amount,category,notes\n2024-08-20,12.5,Food,Lunch\n2024-08-20,abc,Food,Dinner\n"
+    response = test_client.post("/expenses/import?format=csv", content=body)
+    assert response.status_code == 200
+    report = response.json()
+    assert report["inserted"] == 1
+    assert report["rejected"] == 1
+    assert report["batches"][0]["errors"][0].startswith("line 3:")
+    test_client.post("/expenses/2024-08-20", json=[])
+
+def test_import_invalidates_analytics_of_committed_batches(monkeypatch):
+    august = {"start_date": "2024-08-01", "end_date": "2024-08-31"}
+    test_client.post("/expenses/2024-08-28", json=[{"amount": 2.0, "category": "Food", "notes": "Tea"}])
+    assert test_client.post("/analytics/", json=august).status_code == 200
+    assert server.analytics_cache.get(date(2024, 8, 1), date(2024, 8, 31)) is not None
+    def failing_close(self):
+        raise RuntimeError("upload cut off")
+    monkeypatch.setattr(server.ImportParser, "close", failing_close)
+    body = "expense_date,amount,category,notes\n2024-08-28,9.5,Food,Lunch\n"
+    with pytest.raises(RuntimeError):
+        test_client.post("/expenses/import?format=csv&batch_size=1", content=body)
+    assert server.analytics_cache.get(date(2024, 8, 1), date(2024, 8, 31)) is None
+    monkeypatch.undo()
+    test_client.post("/expenses/2024-08-28", json=[])
+
+def test_list_expenses_pages_with_token():
+    test_client.post("/expenses/2024-08-21", json=[
+        {"amount": 1.0, "category": "Food", "notes": "a"},
+        {"amount": 2.0, "category": "Food", "notes": "b"},
+        {"amount": 3.0, "category": "Food", "notes": "c"},
+    ])
+    seen, token = [], None
+    while True:
+        params = {"start": "2024-08-21", "end": "2024-08-21", "limit": 2}
+        if token:
+            params["after"] = token
+        response = test_client.get("/expenses", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        seen.extend(item["notes"] for item in page["items"])
+        token = page["next"]
+        if not token:
+            break
+    assert sorted(seen) == ["a", "b", "c"]
+    test_client.post("/expenses/2024-08-21", json=[])
+
+def test_list_expenses_invalid_token():
+    response = test_client.get("/expenses", params={"after": "not-a-token"})
+    assert response.status_code == 400
+
+def test_metrics_endpoint():
+    test_client.get("/expenses/invalid-date")
+    response = test_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_count{method="GET",route="/expenses/{expense_date}",status="422"}' in response.text
+
+def test_get_expenses_conditional_request():
+    test_client.post("/expenses/2024-08-22", json=[{"amount": 4.0, "category": "Food", "notes": "Tea"}])
+    response = test_client.get("/expenses/2024-08-22")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    cached = test_client.get("/expenses/2024-08-22", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    test_client.post("/expenses/2024-08-22", json=[{"amount": 5.0, "category": "Food", "notes": "Tea"}])
+    changed = test_client.get("/expenses/2024-08-22", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    test_client.post("/expenses/2024-08-22", json=[])
+
+def test_analytics_conditional_get():
+    params = {"start_date": "2024-08-01", "end_date": "2024-08-31"}
+    test_client.post("/expenses/2024-08-23", json=[{"amount": 6.0, "category": "Food", "notes": "Cake"}])
+    response = test_client.get("/analytics/", params=params)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert test_client.get("/analytics/", params=params, headers={"If-None-Match": etag}).status_code == 304
+    test_client.post("/expenses/2024-08-23", json=[])
+    assert test_client.get("/analytics/", params=params, headers={"If-None-Match": etag}).status_code != 304
+
+def test_large_responses_are_compressed():
+    # brotli is optional; without it br is never offered.
+    for encoding in ("gzip", "br") if compression.brotli is not None else ("gzip",):
+        response = test_client.get("/metrics", headers={"Accept-Encoding": encoding})
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == encoding
+        assert "http_request_duration_seconds" in response.text
+
+def test_compressed_responses_revalidate_with_their_own_etag():
+    test_client.post("/expenses/2024-08-24", json=[{"amount": 3.0, "category": "Food", "notes": "Bun"}])
+    params = {"start_date": "2024-01-01", "end_date": "2024-12-31"}
+    plain = test_client.get("/analytics/timeseries/daily", params=params, headers={"Accept-Encoding": "identity"})
+    compressed = test_client.get("/analytics/timeseries/daily", params=params, headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["etag"] == plain.headers["etag"][:-1] + '-gzip"'
+    cached = test_client.get(
+        "/analytics/timeseries/daily", params=params,
+        headers={"Accept-Encoding": "gzip", "If-None-Match": compressed.headers["etag"]},
+    )
+    assert cached.status_code == 304 and cached.headers["etag"] == compressed.headers["etag"]
+    test_client.post("/expenses/2024-08-24", json=[])
+
+def test_batch_analytics_matches_single_ranges():
+    test_client.post("/expenses/2024-08-26", json=[{"amount": 8.0, "category": "Food", "notes": "Dinner"}])
+    ranges = [
+        {"start_date": "2024-08-26", "end_date": "2024-08-26"},
+        {"start_date": "2024-08-01", "end_date": "2024-08-31"},
+        {"start_date": "1999-01-01", "end_date": "1999-01-31"},
+    ]
+    response = test_client.post("/analytics/batch", json={"ranges": ranges})
+    assert response.status_code == 200
+    results = response.json()
+    assert [r["start_date"] for r in results] == [r["start_date"] for r in ranges]
+    assert results[0]["breakdown"] == [{"category": "Food", "total": 8.0, "percentage": 100.0}]
+    assert results[1]["breakdown"] == test_client.post("/analytics/", json=ranges[1]).json()
+    assert results[2]["breakdown"] == []
+    test_client.post("/expenses/2024-08-26", json=[])
+
+def test_batch_analytics_rejects_empty_batch():
+    assert test_client.post("/analytics/batch", json={"ranges": []}).status_code == 422
+
+def test_timeseries_endpoints():
+    test_client.post("/expenses/2024-08-26", json=[{"amount": 8.0, "category": "Food", "notes": "Dinner"}])
+    params = {"start_date": "2024-08-25", "end_date": "2024-08-27"}
+    daily = test_client.get("/analytics/timeseries/daily", params=params)
+    assert daily.status_code == 200
+    assert daily.json()["dates"] == ["2024-08-25", "2024-08-26", "2024-08-27"]
+    assert daily.json()["totals"][1] >= 8.0
+    assert test_client.get(
+        "/analytics/timeseries/daily", params=params, headers={"If-None-Match": daily.headers["etag"]}
+    ).status_code == 304
+    weekly = test_client.get("/analytics/timeseries/weekly", params=params).json()
+    assert weekly["week_starts"] == ["2024-08-19", "2024-08-26"]
+    percentiles = test_client.get("/analytics/timeseries/percentiles", params={**params, "q": [50]}).json()
+    assert any(row["category"] == "Food" and "p50" in row["percentiles"] for row in percentiles)
+    burn = test_client.get("/analytics/timeseries/burn-rate", params={**params, "budget": 100, "as_of": "2024-08-26"})
+    assert burn.status_code == 200 and burn.json()["days_elapsed"] == 2
+    assert test_client.get(
+        "/analytics/timeseries/weekly", params={"start_date": "2024-08-27", "end_date": "2024-08-25"}
+    ).status_code == 400
+    test_client.post("/expenses/2024-08-26", json=[])
+
+def test_write_behind_ingestion(tmp_path, monkeypatch):
+    queue = WriteBehindQueue(
+        Journal(tmp_path / "ingest.journal"), db_helper.replace_expenses_for_dates,
+        on_flushed=server.expenses_written, flush_interval=0.5,
+    )
+    monkeypatch.setattr(server, "ingest_queue", queue)
+    queue.start()
+    try:
+        response = test_client.post("/expenses/2024-08-27", json=[{"amount": 3.0, "category": "Food", "notes": "Tea"}])
+        assert response.status_code == 202
+        ticket = response.json()["ticket"]
+        assert response.headers["location"] == f"/ingest/tickets/{ticket}"
+        # Queued rows are visible before they reach the database.
+        assert test_client.get("/expenses/2024-08-27").json()[0]["notes"] == "Tea"
+        assert queue.drain(timeout=5)
+        assert test_client.get(f"/ingest/tickets/{ticket}").json()["status"] == "written"
+        assert db_helper.fetch_expenses_for_date("2024-08-27")[0]["notes"] == "Tea"
+        assert test_client.post("/expenses/2024-08-27", json=[]).status_code == 202
+        assert queue.drain(timeout=5)
+    finally:
+        queue.stop()
+    assert test_client.get("/ingest/tickets/unknown").status_code == 404
+
+def test_recent_dates_are_served_from_day_cache():
+    today = date.today().isoformat()
+    test_client.post(f"/expenses/{today}", json=[{"amount": 4.0, "category": "Food", "notes": "Snack"}])
+    hits = test_client.get("/stats/day-cache").json()["hits"]
+    assert test_client.get(f"/expenses/{today}").json()[0]["notes"] == "Snack"
+    assert test_client.get(f"/expenses/{today}").json()[0]["notes"] == "Snack"
+    assert test_client.get("/stats/day-cache").json()["hits"] == hits + 1
+    test_client.post(f"/expenses/{today}", json=[{"amount": 4.0, "category": "Food", "notes": "Coffee"}])
+    assert test_client.get(f"/expenses/{today}").json()[0]["notes"] == "Coffee"
+    test_client.post(f"/expenses/{today}", json=[])
@@ -0,0 +1,131 @@
+"""Vectorised time-series statistics over expense columns.
+
+Expenses are loaded once into parallel NumPy arrays (day number as int32 days
+since 1970-01-01, category as an int16 code into a sorted name list, amount as
+float64) and every statistic is computed with array operations on those.
+"""
+import math
+from datetime import date, timedelta
+import numpy as np
+
+EPOCH = date(1970, 1, 1)
+# 1970-01-01 was a Thursday; adding this to a day number makes Monday weekday 0.
+_MONDAY_OFFSET = 3
+
+
+def day_number(value):
+    """int32 day number of a date or ISO date string."""
+    return int(np.datetime64(value, "D").astype(np.int32))
+
+
+def day_date(number):
+    return EPOCH + timedelta(days=int(number))
+
+
+class ExpenseColumns:
+    """Expenses as parallel arrays: ``days``, ``codes`` (into ``categories``) and ``amounts``."""
+
+    def __init__(self, days, codes, categories, amounts):
+        self.days = days
+        self.codes = codes
+        self.categories = categories
+        self.amounts = amounts
+
+    @classmethod
+    def from_batches(cls, batches):
+        """Build the columns from batches of expense rows, as yielded by db_helper.stream_expense_records."""
+        dates, categories, amounts = [], [], []
+        for rows in batches:
+            dates.extend(row["expense_date"] for row in rows)
+            categories.extend(row["category"] for row in rows)
+            amounts.extend(row["amount"] for row in rows)
+        days = np.array(dates, dtype="datetime64[D]").astype(np.int32)
+        names, codes = np.unique(np.array(categories, dtype=object), return_inverse=True)
+        code_type = np.int16 if len(names) < np.iinfo(np.int16).max else np.int32
+        return cls(days, codes.astype(code_type), [str(name) for name in names], np.array(amounts, dtype=np.float64))
+
+    def __len__(self):
+        return len(self.days)
+
+    def for_category(self, category):
+        """Columns restricted to one category (empty when it never occurs)."""
+        if category not in self.categories:
+            return ExpenseColumns(self.days[:0], self.codes[:0], [], self.amounts[:0])
+        mask = self.codes == self.categories.index(category)
+        return ExpenseColumns(self.days[mask], self.codes[mask], self.categories, self.amounts[mask])
+
+
+def daily_totals(columns, start_date, end_date):
+    """Total per day for every day of [start_date, end_date], zero on days without expenses."""
+    start, end = day_number(start_date), day_number(end_date)
+    mask = (columns.days >= start) & (columns.days <= end)
+    return np.bincount(columns.days[mask] - start, weights=columns.amounts[mask], minlength=end - start + 1)
+
+
+def rolling_mean(values, window):
+    """Trailing mean over ``window`` values; NaN until a full window is available."""
+    result = np.full(len(values), np.nan)
+    if len(values) >= window:
+        sums = np.cumsum(np.concatenate(([0.0], values)))
+        result[window - 1:] = (sums[window:] - sums[:-window]) / window
+    return result
+
+
+def weekly_totals(daily, start_date):
+    """Sum a daily series into Monday-based weeks; returns (week start dates, totals).
+
+    The first and last weeks only cover the days of the series that fall in them.
+    """
+    start = day_number(start_date)
+    first_weekday = (start + _MONDAY_OFFSET) % 7
+    weeks = (np.arange(len(daily)) + first_weekday) // 7
+    totals = np.bincount(weeks, weights=daily) if len(daily) else np.zeros(0)
+    week_starts = [day_date(start - first_weekday + 7 * week) for week in range(len(totals))]
+    return week_starts, totals
+
+
+def category_percentiles(columns, percentiles):
+    """Per-category expense count and amount percentiles, categories in name order."""
+    order = np.lexsort((columns.amounts, columns.codes))
+    codes, amounts = columns.codes[order], columns.amounts[order]
+    bounds = np.searchsorted(codes, np.arange(len(columns.categories) + 1))
+    result = []
+    for code, name in enumerate(columns.categories):
+        values = amounts[bounds[code]:bounds[code + 1]]
+        if len(values):
+            result.append((name, len(values), np.percentile(values, percentiles)))
+    return result
+
+
+def burn_rate(daily, start_date, as_of, budget):
+    """Spending pace of a budget period whose daily series starts at ``start_date``.
+
+    Returns spent-to-date, the daily average so far, the total projected for the
+    whole period at that pace, and the date the budget runs out at that pace
+    (None when it lasts the period or nothing has been spent).
+    """
+    days_total = len(daily)
+    days_elapsed = min(max(day_number(as_of) - day_number(start_date) + 1, 0), days_total)
+    spent = float(daily[:days_elapsed].sum())
+    daily_average = spent / days_elapsed if days_elapsed else 0.0
+    projected_total = daily_average * days_total
+    exhausted_on = None
+    if daily_average > 0 and projected_total > budget:
+        days_to_exhaust = max(math.ceil(budget / daily_average), 1)
+        exhausted_on = day_date(day_number(start_date) + days_to_exhaust - 1)
+    return {
+        "budget": budget,
+        "spent": spent,
+        "remaining": budget - spent,
+        "days_elapsed": days_elapsed,
+        "days_total": days_total,
+        "daily_average": daily_average,
+        "projected_total": projected_total,
+        "projected_ratio": projected_total / budget if budget else None,
+        "exhausted_on": exhausted_on,
+    }
+
+
+def to_json_floats(values):
+    """Plain floats for a response, with NaN as None."""
+    return [None if math.isnan(value) else float(value) for value in values.tolist()]
@@ -0,0 +1,160 @@
+import calendar
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date, timedelta
+
+
+def _as_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+
+def _month(expense_date):
+    return expense_date.strftime("%Y-%m")
+
+
+def _range_keys(start_date, end_date):
+    """Split a range into the months it covers completely and the dates of its partial months.
+
+    A range's version is the highest of those months' maxima and those dates' versions,
+    so a lookup touches at most a few dozen keys however long the history is.
+    """
+    months, dates = [], []
+    current = start_date.replace(day=1)
+    while current <= end_date:
+        last = current.replace(day=calendar.monthrange(current.year, current.month)[1])
+        if start_date <= current and last <= end_date:
+            months.append(_month(current))
+        else:
+            day = max(current, start_date)
+            while day <= min(last, end_date):
+                dates.append(day)
+                day += timedelta(days=1)
+        current = last + timedelta(days=1)
+    return months, dates
+
+
+class LocalVersionBackend:
+    """Versions kept in this process; only correct when one process serves every write."""
+
+    def __init__(self):
+        # A fresh epoch per process, so ETags handed out before a restart never match again.
+        self.epoch = uuid.uuid4().hex[:8]
+        self._counter = 0
+        self._versions = {}
+        self._month_versions = {}
+        # expense_date -> time of its last write, least recently written first.
+        self._written_at = OrderedDict()
+        self._lock = threading.Lock()
+
+    def bump(self, dates):
+        now = time.time()
+        with self._lock:
+            self._counter += 1
+            for expense_date in dates:
+                self._versions[expense_date] = self._counter
+                self._month_versions[_month(expense_date)] = self._counter
+                self._written_at[expense_date] = now
+                self._written_at.move_to_end(expense_date)
+
+    def dates_written_since(self, since):
+        with self._lock:
+            recent = []
+            for expense_date in reversed(self._written_at):
+                if self._written_at[expense_date] < since:
+                    break
+                recent.append(expense_date)
+            return recent
+
+    def get(self, expense_date):
+        with self._lock:
+            return self._versions.get(expense_date, 0)
+
+    def max_in_range(self, start_date, end_date):
+        months, dates = _range_keys(start_date, end_date)
+        with self._lock:
+            return max(
+                [self._month_versions.get(m, 0) for m in months] + [self._versions.get(d, 0) for d in dates],
+                default=0,
+            )
+
+
+class RedisVersionBackend:
+    """Versions shared by several workers, kept in Redis 6.2 or later. Requires the ``redis`` package."""
+
+    def __init__(self, url, prefix="versions:"):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+        self._client.set(prefix + "epoch", uuid.uuid4().hex[:8], nx=True)
+        self.epoch = self._client.get(prefix + "epoch").decode()
+
+    def bump(self, dates):
+        if not dates:
+            return
+        version = self._client.incr(self._prefix + "counter")
+        # Sorted sets scored by version; GT keeps the highest when workers bump the same date concurrently.
+        pipeline = self._client.pipeline(transaction=False)
+        pipeline.zadd(self._prefix + "date-versions", {d.isoformat(): version for d in dates}, gt=True)
+        pipeline.zadd(self._prefix + "month-versions", {_month(d): version for d in dates}, gt=True)
+        pipeline.zadd(self._prefix + "write-times", {d.isoformat(): time.time() for d in dates}, gt=True)
+        pipeline.execute()
+
+    def dates_written_since(self, since):
+        members = self._client.zrangebyscore(self._prefix + "write-times", since, "+inf")
+        return [date.fromisoformat(member.decode()) for member in members]
+
+    def get(self, expense_date):
+        score = self._client.zscore(self._prefix + "date-versions", expense_date.isoformat())
+        return int(score) if score is not None else 0
+
+    def max_in_range(self, start_date, end_date):
+        months, dates = _range_keys(start_date, end_date)
+        pipeline = self._client.pipeline(transaction=False)
+        if months:
+            pipeline.zmscore(self._prefix + "month-versions", months)
+        if dates:
+            pipeline.zmscore(self._prefix + "date-versions", [d.isoformat() for d in dates])
+        scores = [score for result in pipeline.execute() for score in result if score is not None]
+        return int(max(scores, default=0))
+
+
+class VersionStore:
+    """Write version per expense date, used to answer conditional GETs without the database.
+
+    Every write through the server bumps the versions of the dates it touched to a
+    new, higher number, so the ETag of a date is its version and the ETag of a range
+    is the highest version inside it. Writes that bypass the server (migrations, the
+    rollup CLI, manual SQL) are not seen; restart the server after those. The time
+    of each date's last write is kept too, so ReplicatedStore can tell which reads
+    a lagging replica might answer with rows older than the current version.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or LocalVersionBackend()
+
+    def bump(self, *dates):
+        """Record a write to each of ``dates``; call it after the write has committed."""
+        self.backend.bump({_as_date(expense_date) for expense_date in dates})
+
+    def written_within(self, start_date, end_date, seconds):
+        """True when a date in [start_date, end_date] was written in the last ``seconds`` seconds."""
+        start_date, end_date = _as_date(start_date), _as_date(end_date)
+        recent = self.backend.dates_written_since(time.time() - seconds)
+        return any(start_date <= expense_date <= end_date for expense_date in recent)
+
+    def etag_for_date(self, expense_date):
+        return f'"{self.backend.epoch}-{self.backend.get(_as_date(expense_date))}"'
+
+    def etag_for_range(self, start_date, end_date):
+        version = self.backend.max_in_range(_as_date(start_date), _as_date(end_date))
+        return f'"{self.backend.epoch}-{version}"'
+
+
+def create_version_store_from_env():
+    """Share versions through VERSION_STORE_URL (or ANALYTICS_CACHE_URL) when set, else keep them in-process."""
+    url = os.getenv("VERSION_STORE_URL") or os.getenv("ANALYTICS_CACHE_URL")
+    return VersionStore(RedisVersionBackend(url) if url else None)
@@ -0,0 +1,398 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date
+from logging_setup import setup_logger
+
+logger = setup_logger("write_behind")
+
+
+class Journal:
+    """Append-only file of JSON lines, one per accepted submission or completed flush.
+
+    ``append`` returns once the record is on disk. Concurrent appends share fsyncs:
+    while one thread syncs, the others queue up behind it and usually find their
+    record already covered when their turn comes (group commit). ``compact``
+    rewrites the file with only the records still needed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        _drop_torn_tail(path)
+        self._file = open(path, "ab")
+        # Bytes in the file, so the queue can tell when compacting is worth it.
+        self.size = self._file.tell()
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._written = 0
+        self._synced = 0
+        self.syncs = 0
+
+    def append(self, record, sync=True):
+        line = json.dumps(record, separators=(",", ":")).encode() + b"\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self.size += len(line)
+            self._written += 1
+            position = self._written
+        if sync:
+            self._sync(position)
+
+    def _sync(self, position):
+        with self._sync_lock:
+            if self._synced >= position:
+                return
+            with self._lock:
+                target = self._written
+            os.fsync(self._file.fileno())
+            self._synced = target
+            self.syncs += 1
+
+    def read(self):
+        """Every readable record in the file."""
+        records = []
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    logger.warning("Skipping unreadable journal line in %s", self.path)
+        return records
+
+    def compact(self, keep):
+        """Replace the file with the records ``keep`` accepts, via an fsynced copy and an atomic rename.
+
+        Appends wait until it is done, so ``keep`` sees every record written so far.
+        """
+        with self._sync_lock, self._lock:
+            records = [record for record in self.read() if keep(record)]
+            temporary = f"{self.path}.compact"
+            with open(temporary, "wb") as f:
+                for record in records:
+                    f.write(json.dumps(record, separators=(",", ":")).encode() + b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._file.close()
+            os.replace(temporary, self.path)
+            _fsync_directory(self.path)
+            self._file = open(self.path, "ab")
+            self.size = self._file.tell()
+            self._synced = self._written
+        return len(records)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _drop_torn_tail(path):
+    """Cut a partial last line left by a crash, so the next record starts on a line of its own."""
+    try:
+        f = open(path, "r+b")
+    except FileNotFoundError:
+        return
+    with f:
+        end = position = f.seek(0, os.SEEK_END)
+        keep = 0
+        while position > 0:
+            step = min(4096, position)
+            f.seek(position - step)
+            newline = f.read(step).rfind(b"\n")
+            if newline != -1:
+                keep = position - step + newline + 1
+                break
+            position -= step
+        if keep < end:
+            logger.warning("Dropping %s bytes of a torn record at the end of %s", end - keep, path)
+            f.truncate(keep)
+            os.fsync(f.fileno())
+
+
+def _fsync_directory(path):
+    # Makes the rename itself durable; not every platform can open a directory.
+    try:
+        descriptor = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+class WriteBehindQueue:
+    """Accept POST /expenses/{date} submissions now and write them to the database later.
+
+    ``submit`` journals the rows and returns a ticket. A worker thread then takes
+    every date with pending rows, at most every ``flush_interval`` seconds, and hands
+    them to ``flush`` ({expense_date: rows} -> changed dates) as one transaction.
+    A submission replaces the whole date, so when one date is submitted several
+    times before a flush only the latest rows are written and the earlier tickets
+    are reported as superseded.
+
+    When a batch fails, its dates are flushed one by one. If some of them go in,
+    the database is up and the dates that still fail hold rows it rejects (a value
+    out of range, an over-long category), so their tickets end as "failed" with the
+    error instead of blocking every other date. If none go in, the rows stay queued
+    and the batch is retried after ``retry_interval`` seconds.
+
+    ``on_flushed`` receives the changed dates after each successful flush. On
+    ``start`` the journal is replayed, so submissions accepted before a crash are
+    still written; "done" records mark the tickets that need no replay. Once the
+    journal is larger than ``compact_bytes`` and twice its size after the last
+    compaction, it is rewritten to the submissions not yet finished.
+    """
+
+    def __init__(self, journal, flush, on_flushed=None, flush_interval=0.05, retry_interval=1.0,
+                 max_batch_dates=500, max_tickets=10000, compact_bytes=1024 * 1024):
+        self.journal = journal
+        self.flush = flush
+        self.on_flushed = on_flushed
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.max_batch_dates = max_batch_dates
+        self.max_tickets = max_tickets
+        self.compact_bytes = compact_bytes
+        self._compacted_size = 0
+        self._condition = threading.Condition()
+        # expense_date -> (sequence number, rows, tickets waiting on those rows)
+        self._pending = {}
+        # expense_date -> sequence number of the last rows written, so a submission
+        # that lost the race to the journal never overwrites newer rows.
+        self._applied = {}
+        self._tickets = OrderedDict()
+        # Tickets neither written nor superseded; their journal records survive compaction.
+        self._unfinished = set()
+        self._sequence = 0
+        # The dates being written right now, still answered by pending_rows until committed.
+        self._batch = {}
+        self._stopping = False
+        self._thread = None
+        self._stats = {"submitted": 0, "written": 0, "superseded": 0, "failed": 0, "flushes": 0, "flush_errors": 0}
+
+    def start(self):
+        self._replay()
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Write everything still pending, then stop the worker and close the journal."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        self.journal.close()
+
+    def submit(self, expense_date, rows):
+        """Journal ``rows`` (amount, category, notes) for ``expense_date`` and return a ticket."""
+        ticket = uuid.uuid4().hex
+        with self._condition:
+            self._sequence += 1
+            sequence = self._sequence
+            self._unfinished.add(ticket)
+        try:
+            self.journal.append({
+                "ticket": ticket, "seq": sequence, "date": expense_date.isoformat(), "rows": [list(r) for r in rows],
+            })
+        except BaseException:
+            with self._condition:
+                self._unfinished.discard(ticket)
+            raise
+        with self._condition:
+            self._enqueue(ticket, sequence, expense_date, [tuple(r) for r in rows])
+            self._stats["submitted"] += 1
+            self._condition.notify_all()
+        return ticket
+
+    def _enqueue(self, ticket, sequence, expense_date, rows):
+        self._track(ticket, {"ticket": ticket, "expense_date": expense_date, "status": "queued", "error": None})
+        in_flight = self._batch.get(expense_date)
+        if sequence <= max(self._applied.get(expense_date, 0), in_flight[0] if in_flight else 0):
+            self._finish([ticket], "superseded")
+            return
+        current = self._pending.get(expense_date)
+        if current is None:
+            self._pending[expense_date] = (sequence, rows, [ticket])
+        elif sequence > current[0]:
+            self._finish(current[2], "superseded")
+            self._pending[expense_date] = (sequence, rows, [ticket])
+        else:
+            self._finish([ticket], "superseded")
+
+    def _track(self, ticket, status):
+        self._tickets[ticket] = status
+        while len(self._tickets) > self.max_tickets:
+            self._tickets.popitem(last=False)
+
+    def _finish(self, tickets, status, error=None):
+        for ticket in tickets:
+            self._unfinished.discard(ticket)
+            entry = self._tickets.get(ticket)
+            if entry is not None:
+                entry["status"] = status
+                entry["error"] = error
+        if status in ("superseded", "failed"):
+            self._stats[status] += len(tickets)
+
+    def pending_rows(self, expense_date):
+        """Rows accepted for ``expense_date`` but not yet committed, or None."""
+        with self._condition:
+            entry = self._pending.get(expense_date) or self._batch.get(expense_date)
+            return None if entry is None else entry[1]
+
+    def status(self, ticket):
+        with self._condition:
+            entry = self._tickets.get(ticket)
+            return None if entry is None else dict(entry)
+
+    def stats(self):
+        with self._condition:
+            return {**self._stats, "pending_dates": len(self._pending), "journal_syncs": self.journal.syncs}
+
+    def drain(self, timeout=None):
+        """Wait until nothing is pending; True when drained within ``timeout`` seconds."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._pending or self._batch:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def _replay(self):
+        records = self.journal.read()
+        done = {ticket for record in records for ticket in record.get("done", ())}
+        replayed = 0
+        with self._condition:
+            for record in records:
+                if "ticket" in record and record["ticket"] not in done:
+                    self._unfinished.add(record["ticket"])
+                    self._sequence = max(self._sequence, record["seq"])
+                    rows = [tuple(r) for r in record["rows"]]
+                    self._enqueue(record["ticket"], record["seq"], date.fromisoformat(record["date"]), rows)
+                    replayed += 1
+        if replayed:
+            logger.info("Replaying %s journaled submissions for %s dates", replayed, len(self._pending))
+
+    def _still_needed(self, record):
+        with self._condition:
+            return record.get("ticket") in self._unfinished
+
+    def _take_batch(self):
+        dates = sorted(self._pending)[:self.max_batch_dates]
+        self._batch = {d: self._pending.pop(d) for d in dates}
+        return self._batch
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopping:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                stopping = self._stopping
+            if not stopping:
+                # Let submissions for the same dates pile up so they are coalesced.
+                time.sleep(self.flush_interval)
+            with self._condition:
+                batch = self._take_batch()
+            try:
+                changed, failed = self.flush({d: entry[1] for d, entry in batch.items()}), {}
+            except Exception as e:
+                logger.error("Write-behind flush of %s dates failed: %s", len(batch), e)
+                with self._condition:
+                    self._stats["flush_errors"] += 1
+                changed, failed = self._flush_each(batch, e)
+                if len(failed) == len(batch):
+                    if self._requeue(batch, failed):
+                        logger.error("Stopping with %s dates unwritten; they stay in the journal", len(self._pending))
+                        return
+                    time.sleep(self.retry_interval)
+                    continue
+            self._complete(batch, changed, failed)
+            self._compact_if_grown()
+
+    def _flush_each(self, batch, error):
+        """Flush the dates of a failed batch one at a time; returns (changed dates, {date: error})."""
+        if len(batch) == 1:
+            return [], {expense_date: str(error) for expense_date in batch}
+        changed, failed = [], {}
+        for expense_date, entry in batch.items():
+            try:
+                changed.extend(self.flush({expense_date: entry[1]}))
+            except Exception as e:
+                failed[expense_date] = str(e)
+                with self._condition:
+                    self._stats["flush_errors"] += 1
+        return changed, failed
+
+    def _requeue(self, batch, failed):
+        """Put a batch that did not go in back in the queue; returns True when the queue is stopping."""
+        with self._condition:
+            for expense_date, entry in batch.items():
+                if expense_date in self._pending:
+                    self._finish(entry[2], "superseded")
+                    continue
+                self._pending[expense_date] = entry
+                for ticket in entry[2]:
+                    if ticket in self._tickets:
+                        self._tickets[ticket]["error"] = failed[expense_date]
+            self._batch = {}
+            self._condition.notify_all()
+            return self._stopping
+
+    def _complete(self, batch, changed, failed):
+        if self.on_flushed is not None and changed:
+            try:
+                self.on_flushed(changed)
+            except Exception as e:
+                logger.error("Write-behind on_flushed callback failed: %s", e)
+        written = [ticket for d, entry in batch.items() if d not in failed for ticket in entry[2]]
+        rejected = [ticket for d in failed for ticket in batch[d][2]]
+        self.journal.append({"done": written + rejected}, sync=False)
+        with self._condition:
+            for expense_date, entry in batch.items():
+                if expense_date not in failed:
+                    self._applied[expense_date] = max(self._applied.get(expense_date, 0), entry[0])
+            self._finish(written, "written")
+            for expense_date, error in failed.items():
+                logger.error("Write-behind gave up on %s: %s", expense_date, error)
+                self._finish(batch[expense_date][2], "failed", error)
+            self._stats["written"] += len(written)
+            self._stats["flushes"] += 1
+            self._batch = {}
+            self._condition.notify_all()
+
+    def _compact_if_grown(self):
+        # Compacting blocks submissions while it runs, so it waits until the journal has doubled.
+        if self.journal.size <= max(self.compact_bytes, 2 * self._compacted_size):
+            return
+        try:
+            self.journal.compact(self._still_needed)
+        except OSError as e:
+            # The done records still mark finished tickets; compaction is retried after the next flush.
+            logger.error("Write-behind journal compaction failed: %s", e)
+            return
+        self._compacted_size = self.journal.size
+
+
+def create_queue_from_env(flush, on_flushed=None):
+    """A WriteBehindQueue when INGEST_MODE=writebehind, else None (writes go straight to the database)."""
+    mode = os.getenv("INGEST_MODE", "direct").lower()
+    if mode not in ("direct", "writebehind"):
+        raise ValueError(f"INGEST_MODE must be 'direct' or 'writebehind', got {mode!r}")
+    if mode == "direct":
+        return None
+    return WriteBehindQueue(
+        Journal(os.getenv("INGEST_JOURNAL", "ingest.journal")),
+        flush,
+        on_flushed=on_flushed,
+        flush_interval=float(os.getenv("INGEST_FLUSH_INTERVAL", "0.05")),
+        compact_bytes=int(os.getenv("INGEST_JOURNAL_COMPACT_BYTES", str(1024 * 1024))),
+    )
@@ -0,0 +1,297 @@
+"""Reproducible latency/throughput benchmark for the backend.
+
+Seeds the store configured in the environment (STORAGE_ENGINE, or DB_HOST,
+DB_PORT, ... for MySQL) with synthetic expenses, drives the main endpoints at a fixed concurrency and writes
+p50/p95/p99 latency and throughput per endpoint as JSON.
+
+    python benchmarks/backend_bench.py seed --rows 1m --reset
+    python benchmarks/backend_bench.py run --concurrency 32 --requests 2000 --output base.json
+    python benchmarks/backend_bench.py compare base.json new.json --threshold 0.10
+
+Any local MySQL-compatible server works (MySQL, MariaDB, Percona); apply the
+schema with ``python backend/migrate.py apply`` first. The embedded engines
+create their schema on first use. ``seed`` is deterministic
+for a given ``--seed``, so two runs against the same row count are comparable.
+POST requests write to dates after the seeded range so they never replace the
+data the reads are measured against.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+import httpx
+from load_async_vs_sync import BACKEND_DIR, start_server, wait_until_ready
+
+CATEGORIES = ["Rent", "Food", "Shopping", "Entertainment", "Other"]
+SCENARIOS = ["get_expenses", "post_expenses", "analytics"]
+SIZE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+# Number of dates after the seeded range that POST requests rotate through.
+POST_DATES = 100
+# Dates cleared per transaction by ``seed --reset``.
+RESET_WINDOW_DAYS = 31
+
+
+def parse_size(value):
+    """Parse a row count such as ``10000``, ``10k`` or ``10m``."""
+    value = value.strip().lower()
+    if value and value[-1] in SIZE_SUFFIXES:
+        return int(float(value[:-1]) * SIZE_SUFFIXES[value[-1]])
+    return int(value)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarise(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p95_ms": ms(percentile(latencies, 0.95)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "max_ms": ms(latencies[-1]) if latencies else None,
+    }
+
+
+def synthetic_rows(rows, start_date, days, seed):
+    """Yield (expense_date, amount, category, notes) rows spread evenly over ``days`` dates."""
+    rng = random.Random(seed)
+    for i in range(rows):
+        expense_date = start_date + timedelta(days=i % days)
+        category = rng.choice(CATEGORIES)
+        yield expense_date, round(rng.uniform(1, 500), 2), category, f"{category} #{i}"
+
+
+def reset_dates(db_helper, start_date, days):
+    """Delete every expense on the ``days`` dates from ``start_date``, a window of dates per transaction."""
+    for first in range(0, days, RESET_WINDOW_DAYS):
+        window = range(first, min(first + RESET_WINDOW_DAYS, days))
+        db_helper.replace_expenses_for_dates({start_date + timedelta(days=day): [] for day in window})
+
+
+def seed(args):
+    sys.path.insert(0, BACKEND_DIR)
+    import db_helper
+
+    rows = parse_size(args.rows)
+    if args.reset:
+        reset_dates(db_helper, args.start_date, args.days + POST_DATES)
+    started = time.perf_counter()
+    batch, inserted = [], 0
+    for row in synthetic_rows(rows, args.start_date, args.days, args.seed):
+        batch.append(row)
+        if len(batch) >= args.batch_size:
+            inserted += db_helper.bulk_insert_expenses(batch)
+            batch = []
+            print(f"\rseeded {inserted}/{rows}", end="", file=sys.stderr)
+    if batch:
+        inserted += db_helper.bulk_insert_expenses(batch)
+    elapsed = time.perf_counter() - started
+    print(f"\rseeded {inserted} rows over {args.days} days in {elapsed:.1f}s", file=sys.stderr)
+    return 0
+
+
+def make_request(scenario, args, rng):
+    """Return (method, path, json body) for one request of ``scenario``."""
+    if scenario == "get_expenses":
+        expense_date = args.start_date + timedelta(days=rng.randrange(args.days))
+        return "GET", f"/expenses/{expense_date}", None
+    if scenario == "post_expenses":
+        expense_date = args.start_date + timedelta(days=args.days + rng.randrange(POST_DATES))
+        # A fresh amount on every request, so the write is never skipped as unchanged.
+        body = [
+            {"amount": round(rng.uniform(1, 500), 2), "category": rng.choice(CATEGORIES), "notes": "bench"}
+            for _ in range(args.post_rows)
+        ]
+        return "POST", f"/expenses/{expense_date}", body
+    span = rng.randint(1, args.analytics_days)
+    first = args.start_date + timedelta(days=rng.randrange(max(1, args.days - span)))
+    body = {"start_date": str(first), "end_date": str(first + timedelta(days=span - 1))}
+    return "POST", "/analytics/", body
+
+
+async def run_scenario(client, scenario, args):
+    rng = random.Random(f"{args.seed}:{scenario}")
+    requests = [make_request(scenario, args, rng) for _ in range(args.warmup + args.requests)]
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for i, request in enumerate(requests):
+        queue.put_nowait((i >= args.warmup, request))
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            measured, (method, path, body) = queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                failed = response.status_code >= 500
+            except httpx.HTTPError:
+                failed = True
+            elapsed = time.perf_counter() - started
+            if measured:
+                latencies.append(elapsed)
+                errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    # Warm-up requests run first, so they are only a small part of the wall time.
+    return summarise(latencies, errors, time.perf_counter() - started)
+
+
+async def run_all(base_url, args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        results = {}
+        for scenario in args.scenarios.split(","):
+            results[scenario] = await run_scenario(client, scenario, args)
+            print(f"{scenario:>14}: {results[scenario]['throughput_rps']} req/s, "
+                  f"p50 {results[scenario]['p50_ms']} ms, p99 {results[scenario]['p99_ms']} ms", file=sys.stderr)
+        return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=BACKEND_DIR
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    unknown = set(args.scenarios.split(",")) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    server = None
+    base_url = args.url
+    if base_url is None:
+        base_url = f"http://127.0.0.1:{args.port}"
+        server = start_server(args.mode, args.port)
+    try:
+        asyncio.run(wait_until_ready(base_url))
+        results = asyncio.run(run_all(base_url, args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    report = {
+        "config": {
+            "mode": args.mode if args.url is None else None,
+            "url": args.url,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "start_date": str(args.start_date),
+            "days": args.days,
+            "seed": args.seed,
+            "revision": git_revision(),
+            "python": platform.python_version(),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    return 0 if not any(r["errors"] for r in results.values()) else 1
+
+
+def compare_reports(baseline, current, threshold):
+    """Return (scenario, metric, before, after, change) for every regression beyond ``threshold``.
+
+    Latency percentiles regress when they grow, throughput when it drops.
+    """
+    regressions = []
+    for scenario, before in baseline["results"].items():
+        after = current["results"].get(scenario)
+        if after is None:
+            continue
+        for metric, higher_is_worse in (("p50_ms", True), ("p95_ms", True), ("p99_ms", True), ("throughput_rps", False)):
+            old, new = before.get(metric), after.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (change > threshold) if higher_is_worse else (change < -threshold):
+                regressions.append((scenario, metric, old, new, change))
+        if after.get("errors", 0) > before.get("errors", 0):
+            regressions.append((scenario, "errors", before.get("errors", 0), after["errors"], None))
+    return regressions
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    regressions = compare_reports(baseline, current, args.threshold)
+    for scenario, metric, old, new, change in regressions:
+        suffix = f" ({change:+.1%})" if change is not None else ""
+        print(f"REGRESSION {scenario} {metric}: {old} -> {new}{suffix}")
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_data_args(sub):
+        sub.add_argument("--start-date", type=date.fromisoformat, default=date(2022, 1, 1))
+        sub.add_argument("--days", type=int, default=3 * 365, help="number of dates the rows are spread over")
+        sub.add_argument("--seed", type=int, default=42)
+
+    seed_parser = subparsers.add_parser("seed", help="fill the database with synthetic expenses")
+    seed_parser.add_argument("--rows", default="10k", help="row count, e.g. 10k, 1m, 10m")
+    seed_parser.add_argument("--batch-size", type=int, default=10_000)
+    seed_parser.add_argument("--reset", action="store_true", help="delete the seeded and POST dates first")
+    add_data_args(seed_parser)
+
+    run_parser = subparsers.add_parser("run", help="drive the endpoints and report latency")
+    run_parser.add_argument("--url", help="benchmark an already running server instead of starting one")
+    run_parser.add_argument("--mode", default=os.getenv("BACKEND_MODE", "sync"), help="BACKEND_MODE of the started server")
+    run_parser.add_argument("--port", type=int, default=8766)
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument("--requests", type=int, default=1000, help="measured requests per scenario")
+    run_parser.add_argument("--warmup", type=int, default=50, help="unmeasured requests per scenario")
+    run_parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    run_parser.add_argument("--post-rows", type=int, default=3, help="expenses per POST body")
+    run_parser.add_argument("--analytics-days", type=int, default=90, help="longest analytics range")
+    run_parser.add_argument("--output", help="also write the JSON report to this file")
+    add_data_args(run_parser)
+
+    compare_parser = subparsers.add_parser("compare", help="flag regressions between two reports")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative change")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    return {"seed": seed, "run": run, "compare": compare}[args.command](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Compare throughput of the sync and async backend modes under concurrent load.
+
+Starts the FastAPI server once per BACKEND_MODE against the database configured
+in the environment (DB_HOST, DB_PORT, ...), drives it with a few hundred
+concurrent clients and prints requests/second for each mode.
+
+    python benchmarks/load_async_vs_sync.py --clients 300 --requests 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import httpx
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=300, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=20, help="requests per client")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--date", default="2024-08-15", help="date used for GET /expenses/{date}")
+    parser.add_argument("--modes", default="sync,async", help="comma-separated backend modes to run")
+    return parser.parse_args()
+
+
+def start_server(mode, port):
+    env = dict(os.environ, BACKEND_MODE=mode)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+
+
+async def wait_until_ready(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(f"{base_url}/stats/pool")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not start within {timeout}s")
+
+
+async def client_loop(client, base_url, args, latencies, errors):
+    payload = {"start_date": "2024-08-01", "end_date": "2024-08-31"}
+    for i in range(args.requests):
+        started = time.perf_counter()
+        try:
+            if i % 2:
+                response = await client.post(f"{base_url}/analytics/", json=payload)
+            else:
+                response = await client.get(f"{base_url}/expenses/{args.date}")
+            if response.status_code >= 500:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        latencies.append(time.perf_counter() - started)
+
+
+async def run_load(base_url, args):
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, base_url, args, latencies, errors) for _ in range(args.clients)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+def main():
+    args = parse_args()
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = {}
+    for mode in args.modes.split(","):
+        server = start_server(mode, args.port)
+        try:
+            asyncio.run(wait_until_ready(base_url))
+            results[mode] = asyncio.run(run_load(base_url, args))
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{mode:>5}: {results[mode]['throughput_rps']} req/s, p99 {results[mode]['p99_ms']} ms")
+    if "sync" in results and "async" in results:
+        ratio = results["async"]["throughput_rps"] / results["sync"]["throughput_rps"]
+        print(f"async/sync throughput ratio: {ratio:.2f}x")
+    print(json.dumps({"clients": args.clients, "requests_per_client": args.requests, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
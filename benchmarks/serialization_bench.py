@@ -0,0 +1,123 @@
+"""Microbenchmark of response serialization for the list endpoints.
+
+Serves the same rows through the validating path the endpoints used before
+(return dicts, let FastAPI validate them against response_model and encode them)
+and through the current fast path (build response-shaped rows, encode them with
+FastJSONResponse), in-process with no database, and prints the median time per
+request for each row count.
+
+    python benchmarks/serialization_bench.py --rows 10,1k,100k --output serialization.json
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from datetime import date
+from decimal import Decimal
+from typing import List
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend_bench import parse_size
+from load_async_vs_sync import BACKEND_DIR
+
+sys.path.insert(0, BACKEND_DIR)
+
+from fast_json import FastJSONResponse, orjson  # noqa: E402
+from server import Expense, ExpenseAnalytics, build_breakdown, expense_items  # noqa: E402
+
+# Enough repetitions for a stable median without making 100k rows take minutes.
+TARGET_ROWS_PER_SIZE = 2_000_000
+MAX_REPEATS = 500
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", default="10,1k,100k", help="comma-separated row counts")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    return parser.parse_args(argv)
+
+
+def expense_rows(count):
+    """Rows as a dictionary cursor returns them for one date."""
+    return [
+        {"id": i, "expense_date": date(2024, 8, 15), "amount": Decimal("12.50"), "category": "Food", "notes": f"n{i}"}
+        for i in range(count)
+    ]
+
+
+def summary_rows(count):
+    return [{"category": f"Category {i}", "total": Decimal("100.25")} for i in range(count)]
+
+
+def validated_breakdown(data):
+    """build_breakdown as it was before the fast path: one pydantic model per row."""
+    total = sum(row["total"] for row in data)
+    return [
+        ExpenseAnalytics(
+            category=row["category"], total=row["total"], percentage=(row["total"] / total) * 100 if total else 0
+        ).model_dump()
+        for row in data
+    ]
+
+
+def build_app(rows, summaries):
+    app = FastAPI()
+
+    @app.get("/validated/expenses", response_model=List[Expense])
+    def validated_expenses():
+        return rows
+
+    @app.get("/fast/expenses", response_model=List[Expense])
+    def fast_expenses():
+        return FastJSONResponse(expense_items(rows))
+
+    @app.get("/validated/analytics", response_model=List[ExpenseAnalytics])
+    def validated_analytics():
+        return validated_breakdown(summaries)
+
+    @app.get("/fast/analytics", response_model=List[ExpenseAnalytics])
+    def fast_analytics():
+        return FastJSONResponse(build_breakdown(summaries))
+
+    return app
+
+
+def time_path(client, path, repeats):
+    expected = client.get(path).json()
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        response = client.get(path)
+        timings.append(time.perf_counter() - started)
+        assert response.status_code == 200
+    return expected, statistics.median(timings) * 1000
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print(f"encoder: {'orjson ' + orjson.__version__ if orjson else 'json (orjson not installed)'}")
+    results = []
+    for count in [parse_size(size) for size in args.rows.split(",")]:
+        client = TestClient(build_app(expense_rows(count), summary_rows(count)))
+        repeats = max(3, min(MAX_REPEATS, TARGET_ROWS_PER_SIZE // count))
+        for endpoint in ("expenses", "analytics"):
+            validated_body, validated_ms = time_path(client, f"/validated/{endpoint}", repeats)
+            fast_body, fast_ms = time_path(client, f"/fast/{endpoint}", repeats)
+            if validated_body != fast_body:
+                raise SystemExit(f"{endpoint}: fast path returned a different body for {count} rows")
+            results.append({
+                "endpoint": endpoint, "rows": count, "repeats": repeats,
+                "validated_ms": round(validated_ms, 3), "fast_ms": round(fast_ms, 3),
+                "speedup": round(validated_ms / fast_ms, 2),
+            })
+            print(f"{endpoint:>9} {count:>7} rows  validated {validated_ms:9.3f} ms  "
+                  f"fast {fast_ms:9.3f} ms  x{validated_ms / fast_ms:.2f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
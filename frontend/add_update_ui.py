@@ -1,22 +1,22 @@
 import streamlit as st
 from datetime import datetime
 import requests
-
-API_URL = "http://localhost:8000"
+from api_client import client
 
 def fetch_expenses(selected_date):
-    """Fetch expenses for the given date with caching."""
-    @st.cache_data(ttl=60)
-    def get_data(date):
-        response = requests.get(f"{API_URL}/expenses/{date}")
-        if response.status_code == 200:
-            return response.json()
-        elif response.status_code == 404:
-            return []
-        else:
-            st.error(f"Error {response.status_code}: {response.text}")
-            return None
-    return get_data(selected_date)
+    """Fetch expenses for the given date through the shared API client cache."""
+    try:
+        response = client.get(f"/expenses/{selected_date}")
+    except requests.RequestException as e:
+        st.error(f"Could not reach the server: {e}")
+        return None
+    if response.status_code == 200:
+        return response.data
+    elif response.status_code == 404:
+        return []
+    else:
+        st.error(f"Error {response.status_code}: {response.text}")
+        return None
 
 def add_update_tab():
     selected_date = st.date_input("Enter Date", datetime(2024, 8, 1), label_visibility="collapsed")
@@ -62,9 +62,17 @@ def add_update_tab():
         submit_button = st.form_submit_button("Submit")
         if submit_button:
             filtered_expenses = [expense for expense in new_expenses if expense["amount"] > 0]
-            response = requests.post(f"{API_URL}/expenses/{selected_date}", json=filtered_expenses)
+            try:
+                response = client.post(f"/expenses/{selected_date}", filtered_expenses)
+            except requests.RequestException as e:
+                st.error(f"Failed to update expenses: {e}")
+                return
             if response.status_code == 200:
                 st.success("Expenses updated successfully!")
+            elif response.status_code == 202:
+                # Write-behind ingestion (INGEST_MODE=writebehind): accepted now, written shortly.
+                ticket = (response.data or {}).get("ticket")
+                st.info(f"Expenses queued and will be saved shortly. Ticket: {ticket}")
             else:
                 st.error(f"Failed to update expenses. Error {response.status_code}: {response.text}")
 
@@ -1,25 +1,24 @@
 import streamlit as st
 from datetime import datetime
 import requests
-import pandas as pd
-import matplotlib.pyplot as plt
-
-API_URL = "http://localhost:8000"
+from api_client import client
 
 def fetch_analytics(start_date, end_date):
-    """Fetch analytics data with caching."""
-    @st.cache_data(ttl=60)
-    def get_data(start, end):
-        payload = {"start_date": start.strftime("%Y-%m-%d"), "end_date": end.strftime("%Y-%m-%d")}
-        response = requests.post(f"{API_URL}/analytics/", json=payload)
-        if response.status_code == 200:
-            return response.json()
-        elif response.status_code == 404:
-            return []
-        else:
-            st.error(f"Error {response.status_code}: {response.text}")
-            return None
-    return get_data(start_date, end_date)
+    """Fetch analytics data through the shared API client cache."""
+    payload = {"start_date": start_date.strftime("%Y-%m-%d"), "end_date": end_date.strftime("%Y-%m-%d")}
+    try:
+        # The GET form of /analytics/ carries an ETag, so a repeat of an unchanged range costs a 304.
+        response = client.get("/analytics/", params=payload)
+    except requests.RequestException as e:
+        st.error(f"Could not reach the server: {e}")
+        return None
+    if response.status_code == 200:
+        return response.data
+    elif response.status_code == 404:
+        return []
+    else:
+        st.error(f"Error {response.status_code}: {response.text}")
+        return None
 
 def analyze_by_category_tab():
     col1, col2 = st.columns(2)
@@ -37,6 +36,10 @@ def analyze_by_category_tab():
             st.warning("No expenses found for the selected date range.")
             return
         
+        # pandas and matplotlib take most of a cold start; load them only once there is something to plot.
+        import pandas as pd
+        import matplotlib.pyplot as plt
+
         data = {
             "Category": [item["category"] for item in response_data],
             "Total": [item["total"] for item in response_data],
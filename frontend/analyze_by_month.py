@@ -1,25 +1,23 @@
 import streamlit as st
 from datetime import datetime
 import requests
-import pandas as pd
-import matplotlib.pyplot as plt
-
-API_URL = "http://localhost:8000"
+from api_client import client
 
 def fetch_monthly_analytics(start_date, end_date):
-    """Fetch monthly analytics data with caching."""
-    @st.cache_data(ttl=60)
-    def get_data(start, end):
-        payload = {"start_date": start.strftime("%Y-%m-%d"), "end_date": end.strftime("%Y-%m-%d")}
-        response = requests.post(f"{API_URL}/analytics/", json=payload)
-        if response.status_code == 200:
-            return response.json()
-        elif response.status_code == 404:
-            return []
-        else:
-            st.error(f"Error {response.status_code}: {response.text}")
-            return None
-    return get_data(start_date, end_date)
+    """Fetch monthly analytics data through the shared API client cache."""
+    payload = {"start_date": start_date.strftime("%Y-%m-%d"), "end_date": end_date.strftime("%Y-%m-%d")}
+    try:
+        response = client.query("/analytics/monthly/", payload)
+    except requests.RequestException as e:
+        st.error(f"Could not reach the server: {e}")
+        return None
+    if response.status_code == 200:
+        return response.data
+    elif response.status_code == 404:
+        return []
+    else:
+        st.error(f"Error {response.status_code}: {response.text}")
+        return None
 
 def analyze_by_month_tab():
     st.title("Monthly Expense Analysis")
@@ -38,21 +36,25 @@ def analyze_by_month_tab():
             st.warning("No expenses found for the selected date range.")
             return
         
-        data = {
-            "Category": [item["category"] for item in response_data],
-            "Total": [item["total"] for item in response_data]
-        }
+        # pandas and matplotlib take most of a cold start; load them only once there is something to plot.
+        import pandas as pd
+        import matplotlib.pyplot as plt
 
-        df = pd.DataFrame(data)
-        df_sorted = df.sort_values(by="Total", ascending=False)
+        totals = {f"{item['year']}-{item['month']:02d}": item["total"] for item in response_data}
+        # Months without expenses are not returned by the API; show them as zero.
+        months = pd.period_range(start_date, end_date, freq="M").strftime("%Y-%m")
+        df = pd.DataFrame({
+            "Month": months,
+            "Total": [totals.get(month, 0.0) for month in months]
+        })
 
-        st.subheader("Expense Distribution by Category")
+        st.subheader("Expense Distribution by Month")
         fig, ax = plt.subplots()
-        ax.bar(df_sorted["Category"], df_sorted["Total"], color="skyblue")
-        ax.set_xlabel("Category")
+        ax.bar(df["Month"], df["Total"], color="skyblue")
+        ax.set_xlabel("Month")
         ax.set_ylabel("Total Expenses")
-        ax.set_title("Expenses by Category")
+        ax.set_title("Expenses by Month")
         plt.xticks(rotation=45)
         st.pyplot(fig)
         
-        st.table(df_sorted)
+        st.table(df)
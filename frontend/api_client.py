@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+API_URL = os.getenv("API_URL", "http://localhost:8000")
+
+# ``data`` is the decoded JSON body (None when the body is not JSON).
+ApiResult = namedtuple("ApiResult", ["status_code", "data", "text"])
+
+
+class ApiClient:
+    """Keep-alive session to the backend with timeouts, retries and a shared response cache.
+
+    Reads are cached per (method, path, params/body) for ``ttl`` seconds. After that a
+    GET is revalidated with If-None-Match, so an unchanged resource costs a 304 with
+    no body. Any write through ``post`` expires every cached read, because a write to
+    one date also changes the analytics of every range that contains it. At most
+    ``max_entries`` reads are kept; the least recently used one is dropped first.
+    """
+
+    def __init__(self, base_url=API_URL, timeout=(3.05, 15), retries=3, backoff=0.3, ttl=60, pool_size=10,
+                 max_entries=256):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # Every call this client makes is idempotent (reads, and writes that replace a whole
+        # date), so POSTs may be retried too.
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(["GET", "POST"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cache_key(method, path, params):
+        return method, path, repr(sorted(params.items())) if isinstance(params, dict) else repr(params)
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+            return entry
+
+    def _remember(self, key, result, etag):
+        # Only answers that describe the resource are cached, not server errors.
+        if result.status_code in (200, 404):
+            with self._lock:
+                self._cache[key] = (result, etag, time.monotonic() + self.ttl)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return result
+
+    @staticmethod
+    def _result(response):
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+        return ApiResult(response.status_code, data, response.text)
+
+    def get(self, path, params=None):
+        """GET ``path``, answered from the cache while fresh and revalidated with its ETag after."""
+        key = self._cache_key("GET", path, params)
+        entry = self._lookup(key)
+        headers = {}
+        if entry is not None:
+            result, etag, expires_at = entry
+            if time.monotonic() < expires_at:
+                return result
+            if etag:
+                headers["If-None-Match"] = etag
+        response = self.session.get(self.base_url + path, params=params, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and entry is not None:
+            return self._remember(key, entry[0], entry[1])
+        return self._remember(key, self._result(response), response.headers.get("ETag"))
+
+    def query(self, path, payload):
+        """POST a read-only query (e.g. analytics), cached on its body like a GET."""
+        key = self._cache_key("POST", path, payload)
+        entry = self._lookup(key)
+        if entry is not None and time.monotonic() < entry[2]:
+            return entry[0]
+        response = self.session.post(self.base_url + path, json=payload, timeout=self.timeout)
+        return self._remember(key, self._result(response), None)
+
+    def post(self, path, payload):
+        """POST a write and expire every cached read."""
+        try:
+            response = self.session.post(self.base_url + path, json=payload, timeout=self.timeout)
+        finally:
+            self.invalidate()
+        return self._result(response)
+
+    def invalidate(self):
+        """Expire cached reads; their ETags are kept so unchanged resources still revalidate cheaply."""
+        with self._lock:
+            self._cache = OrderedDict((key, (result, etag, 0.0)) for key, (result, etag, _) in self._cache.items())
+
+
+# Shared by every Streamlit session served by this process.
+client = ApiClient()
@@ -0,0 +1,53 @@
+from datetime import date
+from backend.analytics_cache import AnalyticsCache, LocalCacheBackend
+
+AUGUST = (date(2024, 8, 1), date(2024, 8, 31))
+SEPTEMBER = (date(2024, 9, 1), date(2024, 9, 30))
+BREAKDOWN = [{"category": "Food", "total": 30.0, "percentage": 100.0}]
+
+def test_hit_and_miss_counters():
+    cache = AnalyticsCache()
+    assert cache.get(*AUGUST) is None
+    cache.set(*AUGUST, BREAKDOWN)
+    assert cache.get(*AUGUST) == BREAKDOWN
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+
+def test_invalidate_date_only_drops_covering_ranges():
+    cache = AnalyticsCache()
+    cache.set(*AUGUST, BREAKDOWN)
+    cache.set(*SEPTEMBER, BREAKDOWN)
+    assert cache.invalidate_date(date(2024, 8, 16)) == 1
+    assert cache.get(*AUGUST) is None
+    assert cache.get(*SEPTEMBER) == BREAKDOWN
+
+def test_set_is_skipped_after_concurrent_invalidation():
+    cache = AnalyticsCache()
+    generation = cache.generation
+    cache.invalidate_date(date(2024, 8, 16))
+    assert cache.set(*AUGUST, BREAKDOWN, generation) is False
+    assert cache.get(*AUGUST) is None
+
+def test_invalidation_is_seen_by_caches_sharing_a_backend():
+    # Two workers sharing one backend, as they do through Redis.
+    backend = LocalCacheBackend()
+    reader, writer = AnalyticsCache(backend), AnalyticsCache(backend)
+    generation = reader.generation
+    writer.invalidate_date(date(2024, 8, 16))
+    assert reader.set(*AUGUST, BREAKDOWN, generation) is False
+    assert writer.get(*AUGUST) is None
+
+def test_entries_expire_after_ttl():
+    cache = AnalyticsCache(ttl=0)
+    cache.set(*AUGUST, BREAKDOWN)
+    assert cache.get(*AUGUST) is None
+
+def test_local_backend_evicts_least_recently_used():
+    backend = LocalCacheBackend(max_entries=2)
+    backend.set("a", 1, 60)
+    backend.set("b", 2, 60)
+    backend.get("a")
+    backend.set("c", 3, 60)
+    assert backend.keys() == ["a", "c"]
@@ -0,0 +1,47 @@
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+from backend.compression import CompressionMiddleware, brotli, encoded_etag, strip_encoding
+
+BODY = "expense," * 200
+
+def make_client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/large")
+    def large():
+        return PlainTextResponse(BODY, headers={"ETag": '"e-1"'})
+
+    @app.get("/small")
+    def small():
+        return PlainTextResponse("tiny", headers={"ETag": '"e-1"'})
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([BODY.encode()] * 3), media_type="text/csv")
+
+    return TestClient(app)
+
+def test_each_encoding_gets_its_own_etag():
+    client = make_client()
+    for encoding in ("gzip", "br") if brotli is not None else ("gzip",):
+        response = client.get("/large", headers={"Accept-Encoding": encoding})
+        assert response.headers["content-encoding"] == encoding
+        assert response.headers["etag"] == f'"e-1-{encoding}"'
+        assert response.text == BODY
+    identity = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers and identity.headers["etag"] == '"e-1"'
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers and small.headers["etag"] == '"e-1"'
+
+def test_streams_are_compressed_chunk_by_chunk():
+    response = make_client().get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text == BODY * 3
+
+def test_encoded_etags_round_trip():
+    assert strip_encoding(encoded_etag('"e-1"', "br")) == '"e-1"'
+    assert strip_encoding('"e-1"') == '"e-1"'
+    assert encoded_etag('W/"e-1"', "gzip") == 'W/"e-1"'
@@ -0,0 +1,46 @@
+import time
+from datetime import date, timedelta
+from backend.day_cache import DayCache
+
+TODAY = date.today()
+ROWS = [{"id": 1, "expense_date": TODAY, "amount": 12.5, "category": "Food", "notes": "Lunch"}]
+
+def test_hits_need_the_same_etag():
+    cache = DayCache()
+    assert cache.get(TODAY, '"a-1"') is None
+    cache.set(TODAY, '"a-1"', ROWS)
+    assert cache.get(TODAY, '"a-1"') == [{"amount": 12.5, "category": "Food", "notes": "Lunch"}]
+    assert cache.get(TODAY, '"a-2"') is None
+    cache.invalidate(TODAY)
+    assert cache.get(TODAY, '"a-1"') is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"], stats["bytes"]) == (1, 3, 0.25, 0)
+
+def test_only_recent_dates_are_cached():
+    cache = DayCache(window_days=60)
+    cache.set(TODAY - timedelta(days=61), '"a-1"', ROWS)
+    cache.set(TODAY - timedelta(days=60), '"a-1"', ROWS)
+    assert cache.stats()["dates"] == 1
+
+def test_memory_bound_evicts_least_recently_used():
+    probe = DayCache()
+    probe.set(TODAY, '"a-1"', ROWS)
+    cache = DayCache(max_bytes=2 * probe.stats()["bytes"])
+    for days in range(3):
+        cache.set(TODAY - timedelta(days=days), '"a-1"', ROWS)
+    assert cache.stats()["dates"] == 2 and cache.stats()["evictions"] == 1
+    assert cache.get(TODAY, '"a-1"') is None
+
+def test_categories_are_shared_and_lookups_are_fast():
+    cache = DayCache()
+    rows = [{"amount": i, "category": "".join(["Fo", "od"]), "notes": ""} for i in range(50)]
+    cache.set(TODAY, '"a-1"', rows)
+    records = cache._entries[TODAY][1]
+    assert all(record.category is records[0].category for record in records)
+
+    timings = []
+    for _ in range(1000):
+        started = time.perf_counter()
+        cache.get(TODAY, '"a-1"')
+        timings.append(time.perf_counter() - started)
+    assert sorted(timings)[989] < 0.001
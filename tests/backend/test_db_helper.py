@@ -34,4 +34,27 @@ def test_insert_and_delete_expense():
 def test_fetch_expense_summary():
     summary = db_helper.fetch_expense_summary("2024-08-01", "2024-08-31")
     assert isinstance(summary, list)
-    assert len(summary) > 0
\ No newline at end of file
+    assert len(summary) > 0
+
+def test_replace_expenses_for_date():
+    rows = [(12.5, "Food", "Breakfast"), (40.0, "Shopping", "Shoes")]
+    assert db_helper.replace_expenses_for_date("2024-08-17", rows) is True
+    expenses = db_helper.fetch_expenses_for_date("2024-08-17")
+    assert len(expenses) == 2
+
+    # Same rows in a different order are detected and the write is skipped.
+    assert db_helper.replace_expenses_for_date("2024-08-17", list(reversed(rows))) is False
+
+    assert db_helper.replace_expenses_for_date("2024-08-17", []) is True
+    assert db_helper.fetch_expenses_for_date("2024-08-17") == []
+
+def test_rollup_follows_writes():
+    db_helper.replace_expenses_for_date("2024-08-18", [(5.0, "Food", "Coffee"), (7.5, "Food", "Snack")])
+    summary = db_helper.fetch_expense_summary("2024-08-18", "2024-08-18")
+    assert summary == [{"category": "Food", "total": 12.5}]
+    if db_helper.storage_engine == "mysql":
+        from backend import rollup
+        assert rollup.check("2024-08-18", "2024-08-18") == []
+
+    db_helper.delete_expenses_for_date("2024-08-18")
+    assert db_helper.fetch_expense_summary("2024-08-18", "2024-08-18") == []
@@ -0,0 +1,93 @@
+import threading
+import pytest
+from backend.db_pool import ConnectionPool, PoolTimeoutError
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.in_transaction = False
+        self.fail_ping = False
+        self.rollbacks = 0
+
+    def ping(self, reconnect=False):
+        if self.fail_ping:
+            raise RuntimeError("gone away")
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def is_connected(self):
+        return not self.fail_ping
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    created = []
+
+    def connect(**_):
+        connection = FakeConnection()
+        created.append(connection)
+        return connection
+
+    return ConnectionPool({}, connect=connect, **kwargs), created
+
+def test_connections_are_reused():
+    pool, created = make_pool(max_size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+    assert first is second
+    assert len(created) == 1
+    stats = pool.stats()
+    assert stats["acquired_total"] == 2
+    assert stats["in_use"] == 0
+    assert stats["idle"] == 1
+
+def test_acquire_times_out_when_exhausted():
+    pool, _ = make_pool(max_size=1, acquire_timeout=0.05)
+    held = pool.acquire()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    assert pool.stats()["timeouts"] == 1
+    pool.release(held)
+
+def test_waiter_gets_released_connection():
+    pool, created = make_pool(max_size=1, acquire_timeout=2)
+    held = pool.acquire()
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(pool.acquire()))
+    waiter.start()
+    pool.release(held)
+    waiter.join()
+    assert result == [held]
+    assert len(created) == 1
+
+def test_unhealthy_connection_is_replaced():
+    pool, created = make_pool(max_size=1, ping_interval=0)
+    with pool.connection() as connection:
+        connection.fail_ping = True
+    with pool.connection() as replacement:
+        pass
+    assert replacement is not connection
+    assert connection.closed
+    assert pool.stats()["discarded_total"] == 1
+
+def test_old_connection_is_recycled():
+    pool, created = make_pool(max_size=1, recycle_seconds=0.000001)
+    with pool.connection() as connection:
+        pass
+    with pool.connection() as replacement:
+        pass
+    assert replacement is not connection
+    assert pool.stats()["recycled_total"] == 1
+
+def test_open_transaction_is_rolled_back_on_release():
+    pool, _ = make_pool()
+    with pool.connection() as connection:
+        connection.in_transaction = True
+    assert connection.rollbacks == 1
@@ -0,0 +1,40 @@
+import json
+from datetime import date
+from decimal import Decimal
+from backend.expense_io import ImportParser, csv_chunks, ndjson_chunks
+
+BATCHES = [
+    [{"id": 1, "expense_date": date(2024, 8, 1), "amount": Decimal("12.50"), "category": "Food", "notes": "Lunch, with team"}],
+    [{"id": 2, "expense_date": date(2024, 8, 2), "amount": 30.0, "category": "Rent", "notes": ""}],
+]
+
+def test_ndjson_chunks_one_line_per_row():
+    lines = "".join(ndjson_chunks(BATCHES)).splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [1, 2]
+    assert json.loads(lines[0])["expense_date"] == "2024-08-01"
+    assert json.loads(lines[0])["amount"] == 12.5
+
+def test_csv_chunks_header_then_one_chunk_per_batch():
+    chunks = list(csv_chunks(BATCHES))
+    assert len(chunks) == 3
+    assert chunks[0].strip() == "id,expense_date,amount,category,notes"
+    assert chunks[1].strip() == '1,2024-08-01,12.50,Food,"Lunch, with team"'
+
+def test_import_parser_csv_across_chunks():
+    parser = ImportParser("csv")
+    body = b'expense_date,amount,category,notes\n2024-08-01,10,Food,"two\nlines"\n2024-08-02,5,Rent,x'
+    records = []
+    for i in range(0, len(body), 7):
+        records.extend(parser.feed(body[i:i + 7]))
+    records.extend(parser.close())
+    assert records == [
+        (2, {"expense_date": "2024-08-01", "amount": "10", "category": "Food", "notes": "two\nlines"}, None),
+        (4, {"expense_date": "2024-08-02", "amount": "5", "category": "Rent", "notes": "x"}, None),
+    ]
+
+def test_import_parser_reports_bad_lines():
+    parser = ImportParser("ndjson")
+    records = parser.feed(b'{"amount": 1}\n[1, 2]\nnot json\n')
+    assert records[0] == (1, {"amount": 1}, None)
+    assert records[1][2] == "Expected a JSON object"
+    assert records[2][2].startswith("Invalid JSON")
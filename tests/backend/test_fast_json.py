@@ -0,0 +1,17 @@
+import json
+from datetime import date
+from decimal import Decimal
+from backend import fast_json
+
+ROWS = [{"expense_date": date(2024, 8, 15), "amount": Decimal("12.50"), "category": "Café", "notes": ""}]
+
+def test_dumps_matches_json_module(monkeypatch):
+    encoded = fast_json.dumps(ROWS)
+    assert json.loads(encoded) == [{"expense_date": "2024-08-15", "amount": 12.5, "category": "Café", "notes": ""}]
+    monkeypatch.setattr(fast_json, "orjson", None)
+    assert fast_json.dumps(ROWS) == encoded
+
+def test_response_renders_without_validation():
+    response = fast_json.FastJSONResponse(ROWS, headers={"ETag": '"a-1"'})
+    assert response.headers["content-type"] == "application/json"
+    assert json.loads(response.body)[0]["amount"] == 12.5
@@ -0,0 +1,16 @@
+import os
+
+# Generous on purpose: this catches a heavy import or eager connection creeping back
+# into module scope, not small regressions. Override with IMPORT_BUDGET_SCALE on slow CI.
+BUDGET_SCALE = float(os.getenv("IMPORT_BUDGET_SCALE", "1"))
+
+def test_db_helper_import_is_lazy(profile_import):
+    report = profile_import("db_helper", "backend")
+    assert "mysql.connector" not in report["modules"]
+    assert report["seconds"] < 1.0 * BUDGET_SCALE
+
+def test_server_starts_without_database_settings(profile_import):
+    report = profile_import("server", "backend")
+    assert "mysql.connector" not in report["modules"]
+    assert "aiomysql" not in report["modules"]
+    assert report["seconds"] < 3.0 * BUDGET_SCALE
@@ -0,0 +1,40 @@
+import json
+import logging
+from backend import logging_setup
+from backend.logging_setup import SAMPLED, SamplingFilter, JsonFormatter, request_id_var, setup_logger
+
+def make_record(level=logging.INFO, extra=None):
+    record = logging.LogRecord("test", level, __file__, 1, "value %s", ("x",), None)
+    for key, value in (extra or {}).items():
+        setattr(record, key, value)
+    return record
+
+def test_sampling_only_drops_sampled_info_records():
+    drop_all = SamplingFilter(0.0)
+    assert drop_all.filter(make_record(extra=SAMPLED)) is False
+    assert drop_all.filter(make_record()) is True
+    assert drop_all.filter(make_record(logging.ERROR, extra=SAMPLED)) is True
+    assert SamplingFilter(1.0).filter(make_record(extra=SAMPLED)) is True
+
+def test_json_formatter_includes_request_id():
+    record = make_record(extra={"request_id": "abc123"})
+    payload = json.loads(JsonFormatter().format(record))
+    assert payload["message"] == "value x"
+    assert payload["request_id"] == "abc123"
+
+def test_records_are_written_by_background_listener(tmp_path):
+    log_file = str(tmp_path / "test.log")
+    logger = setup_logger("test_logging_setup", log_file=log_file)
+    setup_logger("test_logging_setup", log_file=log_file)
+    assert len(logger.handlers) == 1
+
+    token = request_id_var.set("req-42")
+    try:
+        logger.warning("disk is %s", "slow")
+    finally:
+        request_id_var.reset(token)
+    logging_setup.flush_logs()
+    with open(log_file) as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 1
+    assert "[req-42] disk is slow" in lines[0]
@@ -0,0 +1,38 @@
+import pytest
+from backend.metrics import Counter, Histogram, Registry, QUERY_ERRORS, QUERY_LATENCY, SLOW_QUERIES, observe_query
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.register(Histogram("latency_seconds", "Latency.", ["route"], buckets=(0.1, 1.0)))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5.0, "/a")
+    text = registry.render()
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/a",le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{route="/a"} 3' in text
+
+def test_counter_and_gauges_render():
+    registry = Registry()
+    counter = registry.register(Counter("errors_total", "Errors.", ["query"]))
+    counter.inc("fetch")
+    counter.inc("fetch")
+    registry.register_gauges("pool", "Pool counter.", lambda: {"in_use": 2, "name": "sync"})
+    text = registry.render()
+    assert 'errors_total{query="fetch"} 2' in text
+    assert "pool_in_use 2" in text
+    assert "pool_name" not in text
+
+def test_observe_query_counts_errors_and_slow_queries(monkeypatch):
+    monkeypatch.setenv("SLOW_QUERY_MS", "0")
+    before = QUERY_LATENCY.count("test_query")
+    with observe_query("test_query") as timer:
+        timer.rows = 3
+    with pytest.raises(RuntimeError):
+        with observe_query("test_query"):
+            raise RuntimeError("boom")
+    assert QUERY_LATENCY.count("test_query") == before + 2
+    assert QUERY_ERRORS.value("test_query") >= 1
+    assert SLOW_QUERIES.value("test_query") >= 2
@@ -0,0 +1,41 @@
+from datetime import date, timedelta
+import pytest
+from backend import db_helper, migrate, query_plans
+
+def test_migration_files_parse_in_order():
+    migrations = migrate.load_migrations()
+    versions = [m.version for m in migrations]
+    assert versions == sorted(versions)
+    assert versions[0] == 1
+    for migration in migrations:
+        assert migration.up, migration.name
+        assert migration.down, migration.name
+
+def test_parse_migration_splits_sections():
+    migration = migrate.parse_migration(7, "example", """
+-- a comment
+-- migrate:up
+CREATE TABLE t (id INT);
+CREATE INDEX idx_t ON t (id);
+
+-- migrate:down
+DROP TABLE t;
+""")
+    assert migration.up == ["CREATE TABLE t (id INT)", "CREATE INDEX idx_t ON t (id)"]
+    assert migration.down == ["DROP TABLE t"]
+
+@pytest.mark.skipif(db_helper.storage_engine != "mysql", reason="migrations and EXPLAIN plans are MySQL only")
+def test_db_helper_queries_use_indexes():
+    migrate.apply()
+    # Enough rows over enough dates that a scan is never the cheaper plan.
+    first = date(2023, 1, 1)
+    dates = [first + timedelta(days=day) for day in range(400)]
+    categories = ["Food", "Rent", "Shopping", "Entertainment", "Other"]
+    db_helper.bulk_insert_expenses([
+        (d, 1.25 * (i + 1), category, "plan") for d in dates for i, category in enumerate(categories)
+    ])
+    try:
+        assert query_plans.find_full_scans() == []
+    finally:
+        for d in dates:
+            db_helper.delete_expenses_for_date(d)
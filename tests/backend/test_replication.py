@@ -0,0 +1,91 @@
+from datetime import date
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend.replication import STICKY_COOKIE, ReadYourWritesMiddleware, ReplicatedStore, read_from_primary
+from backend.serve import check_settings
+from backend.storage import SQLiteStore
+from backend.versions import VersionStore
+
+AUG_1, AUG_2 = date(2024, 8, 1), date(2024, 8, 2)
+
+@pytest.fixture
+def stores(tmp_path):
+    # Two independent databases stand in for a primary and a replica that has not caught up,
+    # so which one answered shows up in the rows.
+    primary, replica = SQLiteStore(str(tmp_path / "primary.db")), SQLiteStore(str(tmp_path / "replica.db"))
+    replica.insert_expense(AUG_1, 1.0, "Food", "replica")
+    replica.insert_expense(AUG_2, 2.0, "Food", "replica")
+    yield primary, replica
+    primary.close()
+    replica.close()
+
+def notes(rows):
+    return [row["notes"] for row in rows]
+
+def test_reads_go_to_replica_except_recent_writes(stores):
+    primary, replica = stores
+    store = ReplicatedStore(primary, [replica], max_lag=60)
+    assert notes(store.fetch_expenses_for_date(AUG_1)) == ["replica"]
+
+    store.replace_expenses_for_date(AUG_2, [(5.0, "Food", "primary")])
+    assert notes(store.fetch_expenses_for_date(AUG_2)) == ["primary"]
+    assert store.fetch_expense_summary(AUG_1, AUG_2) == [{"category": "Food", "total": 5.0}]
+    assert notes(store.fetch_expenses_for_date(AUG_1)) == ["replica"]
+    assert store.stats()["replica_reads"] == 2 and store.stats()["primary_reads"] == 2
+
+def test_sticky_requests_and_lagging_replicas_read_primary(stores):
+    primary, replica = stores
+    store = ReplicatedStore(primary, [replica], max_lag=5, lag_check_interval=0)
+    token = read_from_primary.set(True)
+    try:
+        assert store.fetch_expenses_for_date(AUG_1) == []
+    finally:
+        read_from_primary.reset(token)
+
+    replica.replication_lag = lambda: 30.0
+    assert store.fetch_expenses_for_date(AUG_1) == []
+    assert store.stats()["healthy_replicas"] == 0
+
+def test_writes_by_other_workers_read_primary(stores):
+    primary, replica = stores
+    versions = VersionStore()
+    store = ReplicatedStore(primary, [replica], max_lag=60, versions=versions)
+    # Another worker wrote AUG_2 and bumped the shared versions; this store saw no write.
+    versions.bump(AUG_2)
+    assert notes(store.fetch_expenses_for_date(AUG_2)) == []
+    assert notes(store.fetch_expenses_for_date(AUG_1)) == ["replica"]
+    # A shared store is bumped by its owner, not again by the ReplicatedStore.
+    etag = versions.etag_for_date(AUG_1)
+    store.insert_expense(AUG_1, 1.0, "Food", "primary")
+    assert versions.etag_for_date(AUG_1) == etag
+
+def test_failed_replica_read_falls_back_to_primary(stores):
+    primary, replica = stores
+    store = ReplicatedStore(primary, [replica])
+    replica.fetch_expenses_for_date = lambda expense_date: 1 / 0
+    assert store.fetch_expenses_for_date(AUG_1) == []
+    assert store.stats()["replica_errors"] == 1
+
+def test_writes_make_the_client_sticky():
+    app = FastAPI()
+    app.add_middleware(ReadYourWritesMiddleware, sticky_seconds=10)
+
+    @app.get("/expenses/{expense_date}")
+    def read(expense_date: str):
+        return {"primary": read_from_primary.get()}
+
+    @app.post("/expenses/{expense_date}")
+    def write(expense_date: str):
+        return {}
+
+    client = TestClient(app)
+    assert client.get("/expenses/2024-08-01").json() == {"primary": False}
+    assert STICKY_COOKIE in client.post("/expenses/2024-08-01").cookies
+    assert client.get("/expenses/2024-08-01").json() == {"primary": True}
+
+def test_multiple_workers_need_shared_state():
+    assert check_settings(1, {}) == []
+    assert len(check_settings(4, {"INGEST_MODE": "writebehind"})) == 2
+    assert len(check_settings(4, {"VERSION_STORE_URL": "redis://cache:6379/0"})) == 1
+    assert check_settings(4, {"ANALYTICS_CACHE_URL": "redis://cache:6379/0"}) == []
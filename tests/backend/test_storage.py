@@ -0,0 +1,89 @@
+import threading
+from datetime import date
+import pytest
+from backend.storage import DuckDBStore, SQLiteStore
+
+AUG_15 = date(2024, 8, 15)
+
+@pytest.fixture(params=["sqlite", "duckdb"])
+def store(request, tmp_path):
+    if request.param == "duckdb":
+        pytest.importorskip("duckdb")
+        store = DuckDBStore(str(tmp_path / "expenses.duckdb"))
+    else:
+        store = SQLiteStore(str(tmp_path / "expenses.sqlite"))
+    yield store
+    store.close()
+
+def test_insert_fetch_and_delete(store):
+    store.insert_expense(AUG_15, 10.0, "Shopping", "Test expense")
+    store.insert_expense("2024-08-15", 20.0, "Food", "Lunch")
+    rows = store.fetch_expenses_for_date(AUG_15)
+    assert sorted((row["amount"], row["category"]) for row in rows) == [(10.0, "Shopping"), (20.0, "Food")]
+    assert all(row["expense_date"] == AUG_15 for row in rows)
+    store.delete_expenses_for_date(AUG_15)
+    assert store.fetch_expenses_for_date(AUG_15) == []
+    assert store.fetch_expense_summary(AUG_15, AUG_15) == []
+
+def test_replace_skips_unchanged_rows(store):
+    rows = [(12.5, "Food", "Breakfast"), (40.0, "Shopping", "Shoes")]
+    assert store.replace_expenses_for_date(AUG_15, rows) is True
+    assert store.replace_expenses_for_date(AUG_15, list(reversed(rows))) is False
+    assert store.replace_expenses_for_date(AUG_15, [(5.0, "Food", "Coffee")]) is True
+    assert store.fetch_expense_summary(AUG_15, AUG_15) == [{"category": "Food", "total": 5.0}]
+
+def test_replace_many_dates_in_one_transaction(store):
+    store.replace_expenses_for_date(AUG_15, [(1.0, "Food", "")])
+    changed = store.replace_expenses_for_dates({
+        AUG_15: [(1.0, "Food", "")],
+        date(2024, 8, 16): [(2.0, "Rent", "")],
+    })
+    assert changed == [date(2024, 8, 16)]
+    summary = store.fetch_expense_summary(AUG_15, date(2024, 8, 16))
+    assert sorted(summary, key=lambda row: row["category"]) == [
+        {"category": "Food", "total": 1.0}, {"category": "Rent", "total": 2.0},
+    ]
+
+def test_summaries_and_pages(store):
+    store.bulk_insert_expenses([
+        (date(2024, 8, 1), 10.0, "Food", ""),
+        (date(2024, 8, 1), 5.0, "Food", ""),
+        (date(2024, 8, 20), 7.0, "Rent", ""),
+        (date(2024, 9, 2), 3.0, "Food", ""),
+    ])
+    summary = store.fetch_expense_summary(date(2024, 8, 1), date(2024, 8, 31))
+    assert sorted((row["category"], row["total"]) for row in summary) == [("Food", 15.0), ("Rent", 7.0)]
+    august, first, empty = store.fetch_expense_summaries([
+        (date(2024, 8, 1), date(2024, 8, 31)), (date(2024, 8, 1), date(2024, 8, 1)), (date(2023, 1, 1), date(2023, 1, 2)),
+    ])
+    assert sorted((row["category"], row["total"]) for row in august) == sorted((row["category"], row["total"]) for row in summary)
+    assert first == [{"category": "Food", "total": 15.0}]
+    assert empty == []
+    monthly = store.fetch_monthly_summary(date(2024, 1, 1), date(2024, 12, 31), False)
+    assert [(row["year"], row["month"], row["total"]) for row in monthly] == [(2024, 8, 22.0), (2024, 9, 3.0)]
+
+    first = store.fetch_expenses_page(None, None, None, None, 2)
+    rest = store.fetch_expenses_page(None, None, None, (first[-1]["expense_date"], first[-1]["id"]), 10)
+    assert len(first) == 2 and len(rest) == 2
+    batches = list(store.stream_expense_records(None, date(2024, 8, 31), 2))
+    assert [len(batch) for batch in batches] == [2, 1]
+
+def test_writes_from_many_threads(store):
+    def write(day):
+        store.replace_expenses_for_date(date(2024, 8, day), [(1.0, "Food", "")])
+    threads = [threading.Thread(target=write, args=(day,)) for day in range(1, 9)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(store.fetch_all_records()) == 8
+
+def test_db_helper_uses_configured_store(tmp_path):
+    from backend import db_helper
+    previous = db_helper.set_store(SQLiteStore(str(tmp_path / "helper.sqlite")))
+    try:
+        assert db_helper.replace_expenses_for_date(AUG_15, [(9.0, "Food", "Soup")]) is True
+        assert db_helper.fetch_expense_summary(AUG_15, AUG_15) == [{"category": "Food", "total": 9.0}]
+        assert db_helper.get_pool_stats()["engine"] == "sqlite"
+    finally:
+        db_helper.set_store(previous).close()
@@ -0,0 +1,48 @@
+from datetime import date
+from decimal import Decimal
+import numpy as np
+from backend import timeseries
+
+ROWS = [
+    {"expense_date": date(2024, 8, 1), "amount": Decimal("10.00"), "category": "Food"},
+    {"expense_date": "2024-08-01", "amount": 5.0, "category": "Rent"},
+    {"expense_date": date(2024, 8, 5), "amount": 30.0, "category": "Food"},
+    {"expense_date": date(2024, 8, 7), "amount": 20.0, "category": "Food"},
+]
+
+def columns():
+    return timeseries.ExpenseColumns.from_batches([ROWS[:2], ROWS[2:]])
+
+def test_columns_use_compact_dtypes():
+    cols = columns()
+    assert cols.days.dtype == np.int32 and cols.codes.dtype == np.int16 and cols.amounts.dtype == np.float64
+    assert cols.categories == ["Food", "Rent"]
+    assert cols.days[0] == timeseries.day_number(date(2024, 8, 1))
+    assert len(cols.for_category("Food")) == 3
+    assert len(cols.for_category("Travel")) == 0
+
+def test_daily_weekly_and_rolling():
+    daily = timeseries.daily_totals(columns(), date(2024, 8, 1), date(2024, 8, 7))
+    assert daily.tolist() == [15.0, 0.0, 0.0, 0.0, 30.0, 0.0, 20.0]
+    # 2024-08-01 is a Thursday: the first week is clipped to Thu-Sun.
+    week_starts, totals = timeseries.weekly_totals(daily, date(2024, 8, 1))
+    assert week_starts == [date(2024, 7, 29), date(2024, 8, 5)]
+    assert totals.tolist() == [15.0, 50.0]
+    rolling = timeseries.rolling_mean(daily, 3)
+    assert timeseries.to_json_floats(rolling)[:3] == [None, None, 5.0]
+    assert rolling[-1] == 50.0 / 3
+
+def test_category_percentiles():
+    result = timeseries.category_percentiles(columns(), [0, 50, 100])
+    assert [(name, count, values.tolist()) for name, count, values in result] == [
+        ("Food", 3, [10.0, 20.0, 30.0]),
+        ("Rent", 1, [5.0, 5.0, 5.0]),
+    ]
+
+def test_burn_rate_projects_exhaustion():
+    daily = timeseries.daily_totals(columns(), date(2024, 8, 1), date(2024, 8, 10))
+    rate = timeseries.burn_rate(daily, date(2024, 8, 1), date(2024, 8, 5), budget=60.0)
+    assert rate["spent"] == 45.0 and rate["days_elapsed"] == 5 and rate["days_total"] == 10
+    assert rate["projected_total"] == 90.0
+    assert rate["exhausted_on"] == date(2024, 8, 7)
+    assert timeseries.burn_rate(daily, date(2024, 8, 1), date(2024, 8, 5), budget=100.0)["exhausted_on"] is None
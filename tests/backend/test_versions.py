@@ -0,0 +1,104 @@
+from datetime import date
+from backend.versions import VersionStore
+
+def test_write_changes_only_covering_etags():
+    versions = VersionStore()
+    day_etag = versions.etag_for_date(date(2024, 8, 15))
+    august = versions.etag_for_range(date(2024, 8, 1), date(2024, 8, 31))
+    september = versions.etag_for_range(date(2024, 9, 1), date(2024, 9, 30))
+
+    versions.bump("2024-08-15")
+    assert versions.etag_for_date(date(2024, 8, 15)) != day_etag
+    assert versions.etag_for_date(date(2024, 8, 16)) == versions.etag_for_date("2024-08-16")
+    assert versions.etag_for_range(date(2024, 8, 1), date(2024, 8, 31)) != august
+    assert versions.etag_for_range(date(2024, 9, 1), date(2024, 9, 30)) == september
+
+def test_etags_differ_between_processes():
+    assert VersionStore().etag_for_date(date(2024, 8, 15)) != VersionStore().etag_for_date(date(2024, 8, 15))
+
+def test_range_versions_combine_whole_months_and_edge_dates():
+    versions = VersionStore()
+    versions.bump("2024-03-31")
+    versions.bump("2024-06-10")
+    versions.bump("2024-01-15")
+    backend = versions.backend
+    assert backend.max_in_range(date(2024, 1, 1), date(2024, 12, 31)) == 3
+    assert backend.max_in_range(date(2024, 1, 16), date(2024, 12, 31)) == 2
+    assert backend.max_in_range(date(2024, 1, 16), date(2024, 6, 9)) == 1
+    assert backend.max_in_range(date(2024, 4, 1), date(2024, 6, 9)) == 0
+    assert backend.max_in_range(date(2023, 12, 20), date(2024, 1, 15)) == 3
+
+def test_recent_writes_are_remembered_per_date():
+    versions = VersionStore()
+    versions.bump("2024-08-15")
+    assert versions.written_within(date(2024, 8, 1), date(2024, 8, 31), 60)
+    assert not versions.written_within(date(2024, 8, 16), date(2024, 8, 31), 60)
+    assert not versions.written_within(date(2024, 8, 1), date(2024, 8, 31), -1)
+
+class FakeRedis:
+    """The parts of redis.Redis that RedisVersionBackend uses, with Redis's reply types."""
+
+    def __init__(self):
+        self.strings, self.zsets = {}, {}
+
+    def set(self, key, value, nx=False):
+        if not (nx and key in self.strings):
+            self.strings[key] = str(value).encode()
+
+    def get(self, key):
+        return self.strings.get(key)
+
+    def incr(self, key):
+        self.strings[key] = str(int(self.strings.get(key, b"0")) + 1).encode()
+        return int(self.strings[key])
+
+    def zadd(self, key, mapping, gt=False):
+        zset = self.zsets.setdefault(key, {})
+        for member, score in mapping.items():
+            if not gt or score > zset.get(member, float("-inf")):
+                zset[member] = float(score)
+
+    def zscore(self, key, member):
+        return self.zsets.get(key, {}).get(member)
+
+    def zmscore(self, key, members):
+        return [self.zscore(key, member) for member in members]
+
+    def zrangebyscore(self, key, low, high):
+        high = float("inf") if high == "+inf" else high
+        zset = self.zsets.get(key, {})
+        return [m.encode() for m, s in sorted(zset.items(), key=lambda item: item[1]) if low <= s <= high]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client, self.calls = client, []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+def test_redis_backend_shares_versions_between_workers(monkeypatch):
+    import redis
+    from backend.versions import RedisVersionBackend
+
+    client = FakeRedis()
+    monkeypatch.setattr(redis.Redis, "from_url", lambda url: client)
+    worker_a = VersionStore(RedisVersionBackend("redis://cache:6379/0"))
+    worker_b = VersionStore(RedisVersionBackend("redis://cache:6379/0"))
+    assert worker_a.etag_for_date("2024-08-15") == worker_b.etag_for_date("2024-08-15")
+
+    worker_a.bump("2024-08-15", "2024-09-02")
+    worker_b.bump("2024-01-10")
+    assert worker_b.etag_for_date("2024-08-15") == worker_a.etag_for_date("2024-08-15") == f'"{worker_a.backend.epoch}-1"'
+    assert worker_b.backend.max_in_range(date(2024, 1, 1), date(2024, 12, 31)) == 2
+    assert worker_b.backend.max_in_range(date(2024, 8, 1), date(2024, 9, 1)) == 1
+    assert worker_a.written_within(date(2024, 1, 1), date(2024, 1, 31), 60)
+
+    # A bump that lost the race to a newer one must not lower the stored version.
+    client.zadd("versions:date-versions", {"2024-08-15": 0}, gt=True)
+    assert worker_a.backend.get(date(2024, 8, 15)) == 1
@@ -0,0 +1,122 @@
+from datetime import date
+from backend.write_behind import Journal, WriteBehindQueue
+
+AUG_1, AUG_2 = date(2024, 8, 1), date(2024, 8, 2)
+
+class RecordingFlush:
+    def __init__(self, failures=0, bad_dates=()):
+        self.batches = []
+        self.failures = failures
+        self.bad_dates = set(bad_dates)
+
+    def __call__(self, submissions):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("database unavailable")
+        if self.bad_dates & set(submissions):
+            raise ValueError("Data too long for column 'category'")
+        self.batches.append(submissions)
+        return sorted(submissions)
+
+def test_repeated_submissions_are_coalesced(tmp_path):
+    flush, flushed = RecordingFlush(), []
+    queue = WriteBehindQueue(
+        Journal(tmp_path / "ingest.journal"), flush, on_flushed=flushed.extend, flush_interval=0.2, compact_bytes=0
+    )
+    queue.start()
+    first = queue.submit(AUG_1, [(10.0, "Food", "Lunch")])
+    second = queue.submit(AUG_1, [(12.0, "Food", "Dinner")])
+    other = queue.submit(AUG_2, [(5.0, "Rent", "")])
+    assert queue.pending_rows(AUG_1) == [(12.0, "Food", "Dinner")]
+    assert queue.drain(timeout=5)
+    queue.stop()
+
+    assert flush.batches == [{AUG_1: [(12.0, "Food", "Dinner")], AUG_2: [(5.0, "Rent", "")]}]
+    assert flushed == [AUG_1, AUG_2]
+    assert queue.status(first)["status"] == "superseded"
+    assert queue.status(second)["status"] == queue.status(other)["status"] == "written"
+    # Everything is written, so the journal was emptied.
+    assert (tmp_path / "ingest.journal").stat().st_size == 0
+
+def test_journal_is_replayed_after_a_crash(tmp_path):
+    path = tmp_path / "ingest.journal"
+    crashed = WriteBehindQueue(Journal(path), RecordingFlush())
+    ticket = crashed.submit(AUG_1, [(10.0, "Food", "Lunch")])
+    crashed.journal.close()
+    with open(path, "ab") as f:
+        f.write(b'{"ticket": "torn')
+
+    flush = RecordingFlush()
+    queue = WriteBehindQueue(Journal(path), flush, flush_interval=0)
+    queue.start()
+    assert queue.drain(timeout=5)
+    queue.stop()
+    assert flush.batches == [{AUG_1: [(10.0, "Food", "Lunch")]}]
+    assert queue.status(ticket)["status"] == "written"
+
+def test_failed_flush_is_retried(tmp_path):
+    flush = RecordingFlush(failures=1)
+    queue = WriteBehindQueue(Journal(tmp_path / "ingest.journal"), flush, flush_interval=0, retry_interval=0.01)
+    queue.start()
+    ticket = queue.submit(AUG_1, [(10.0, "Food", "Lunch")])
+    assert queue.drain(timeout=5)
+    queue.stop()
+    assert flush.batches == [{AUG_1: [(10.0, "Food", "Lunch")]}]
+    assert queue.stats()["flush_errors"] == 1
+    assert queue.status(ticket) == {"ticket": ticket, "expense_date": AUG_1, "status": "written", "error": None}
+
+def test_append_after_a_torn_record_is_not_lost(tmp_path):
+    path = tmp_path / "ingest.journal"
+    journal = Journal(path)
+    journal.append({"ticket": "a"})
+    journal.close()
+    with open(path, "ab") as f:
+        f.write(b'{"ticket": "to')
+
+    journal = Journal(path)
+    journal.append({"ticket": "b"})
+    journal.close()
+    assert Journal(path).read() == [{"ticket": "a"}, {"ticket": "b"}]
+
+def test_journal_is_compacted_to_unwritten_submissions(tmp_path):
+    path = tmp_path / "ingest.journal"
+    journal = Journal(path)
+    for ticket in "abc":
+        journal.append({"ticket": ticket})
+    journal.append({"done": ["a", "c"]})
+    assert journal.compact(lambda record: record.get("ticket") == "b") == 1
+    journal.append({"ticket": "d"})
+    journal.close()
+    assert Journal(path).read() == [{"ticket": "b"}, {"ticket": "d"}]
+
+def test_rejected_date_fails_without_blocking_others(tmp_path):
+    path = tmp_path / "ingest.journal"
+    flush = RecordingFlush(bad_dates=[AUG_1])
+    queue = WriteBehindQueue(Journal(path), flush, flush_interval=0.1, retry_interval=0.01)
+    queue.start()
+    bad = queue.submit(AUG_1, [(10.0, "x" * 300, "")])
+    good = queue.submit(AUG_2, [(5.0, "Rent", "")])
+    assert queue.drain(timeout=2)
+    queue.stop()
+
+    assert flush.batches == [{AUG_2: [(5.0, "Rent", "")]}]
+    assert queue.status(good)["status"] == "written"
+    assert queue.status(bad) == {
+        "ticket": bad, "expense_date": AUG_1, "status": "failed", "error": "Data too long for column 'category'",
+    }
+    assert queue.stats()["failed"] == 1 and queue.stats()["written"] == 1
+
+    # The failed ticket is marked done in the journal, so a restart does not retry it.
+    replayed = WriteBehindQueue(Journal(path), RecordingFlush())
+    replayed._replay()
+    assert replayed.stats()["pending_dates"] == 0
+
+def test_journal_is_compacted_once_it_has_grown(tmp_path):
+    path = tmp_path / "ingest.journal"
+    queue = WriteBehindQueue(Journal(path), RecordingFlush(), flush_interval=0, compact_bytes=2000)
+    queue.start()
+    for day in range(1, 21):
+        queue.submit(date(2024, 8, day), [(1.0, "Food", "")])
+        assert queue.drain(timeout=5)
+    assert 0 < path.stat().st_size <= 2000 + 200
+    queue.stop()
@@ -0,0 +1,46 @@
+from datetime import date
+from backend import db_helper
+from backend.storage import SQLiteStore
+from benchmarks import backend_bench
+
+def report(**results):
+    return {"results": results}
+
+def test_percentile_is_nearest_rank():
+    values = [10, 20, 30, 40, 50, 60, 70, 80, 90, 100]
+    assert backend_bench.percentile([], 0.5) is None
+    assert backend_bench.percentile([7], 0.99) == 7
+    assert backend_bench.percentile(values, 0.50) == 50
+    assert backend_bench.percentile(values, 0.95) == 100
+    assert backend_bench.percentile(values, 0.01) == 10
+
+def test_compare_reports_flags_regressions_beyond_threshold():
+    baseline = report(
+        get_expenses={"p50_ms": 10.0, "p95_ms": 20.0, "p99_ms": 30.0, "throughput_rps": 100.0, "errors": 0},
+        analytics={"p50_ms": 10.0, "p95_ms": None, "p99_ms": 0, "throughput_rps": 100.0, "errors": 0},
+    )
+    current = report(
+        get_expenses={"p50_ms": 10.9, "p95_ms": 23.0, "p99_ms": 25.0, "throughput_rps": 85.0, "errors": 2},
+        analytics={"p50_ms": 10.0, "p95_ms": 50.0, "p99_ms": 50.0, "throughput_rps": 200.0, "errors": 0},
+        post_expenses={"p50_ms": 99.0},
+    )
+    regressions = backend_bench.compare_reports(baseline, current, 0.10)
+    assert [(scenario, metric) for scenario, metric, *_ in regressions] == [
+        ("get_expenses", "p95_ms"), ("get_expenses", "throughput_rps"), ("get_expenses", "errors"),
+    ]
+    assert regressions[0][2:4] == (20.0, 23.0)
+    assert backend_bench.compare_reports(baseline, baseline, 0.10) == []
+
+def test_reset_clears_only_the_seeded_dates(tmp_path):
+    store = SQLiteStore(str(tmp_path / "bench.db"))
+    previous = db_helper.set_store(store)
+    try:
+        start = date(2024, 1, 1)
+        db_helper.bulk_insert_expenses(list(backend_bench.synthetic_rows(200, start, 40, seed=1)))
+        db_helper.insert_expense(date(2024, 3, 1), 5.0, "Food", "outside")
+        backend_bench.reset_dates(db_helper, start, 40)
+        assert db_helper.fetch_expense_summary(start, date(2024, 2, 9)) == []
+        assert len(db_helper.fetch_expenses_for_date(date(2024, 3, 1))) == 1
+    finally:
+        db_helper.set_store(previous)
+        store.close()
@@ -1,6 +1,58 @@
+import json
 import os
+import subprocess
 import sys
+import tempfile
+import pytest
 
 project_root = os.path.join(os.path.dirname(__file__), "..") 
 sys.path.insert(0, project_root)
-print(sys.path)
\ No newline at end of file
+# Backend modules import each other by bare name (e.g. ``from logging_setup import ...``).
+sys.path.insert(0, os.path.join(project_root, "backend"))
+# Frontend modules do the same (e.g. ``from api_client import client``).
+sys.path.insert(0, os.path.join(project_root, "frontend"))
+# Benchmarks too (e.g. ``from load_async_vs_sync import BACKEND_DIR``).
+sys.path.insert(0, os.path.join(project_root, "benchmarks"))
+print(sys.path)
+
+# Tests run against a throwaway SQLite database unless STORAGE_ENGINE (and for
+# mysql the DB_* settings) say otherwise. Set before any backend module is imported.
+os.environ.setdefault("STORAGE_ENGINE", "sqlite")
+os.environ.setdefault("STORAGE_PATH", os.path.join(tempfile.mkdtemp(prefix="expense-tests-"), "expenses.db"))
+
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+print(json.dumps({{"seconds": time.perf_counter() - started, "modules": sorted(sys.modules)}}))
+"""
+
+@pytest.fixture(autouse=True, scope="module")
+def module_database(tmp_path_factory):
+    """Give each test module that uses db_helper an empty SQLite database of its own."""
+    db_helper = sys.modules.get("backend.db_helper")
+    if db_helper is None or db_helper.storage_engine != "sqlite":
+        yield
+        return
+    from backend.storage import SQLiteStore
+
+    store = SQLiteStore(str(tmp_path_factory.mktemp("db") / "expenses.db"))
+    previous = db_helper.set_store(store)
+    yield
+    db_helper.set_store(previous)
+    store.close()
+
+@pytest.fixture
+def profile_import(tmp_path):
+    """Import a module in a fresh interpreter with no DB_* settings; returns its import time and loaded modules."""
+    def profile(module, directory):
+        env = {key: value for key, value in os.environ.items() if not key.startswith("DB_")}
+        env["PYTHONPATH"] = os.path.join(project_root, directory)
+        result = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE.format(module=module)],
+            cwd=tmp_path, env=env, capture_output=True, text=True, check=True,
+        )
+        report = json.loads(result.stdout.splitlines()[-1])
+        report["modules"] = set(report["modules"])
+        return report
+    return profile
@@ -0,0 +1,78 @@
+import json
+from requests.adapters import BaseAdapter
+from requests.models import Response
+from frontend.api_client import ApiClient
+
+class FakeBackend(BaseAdapter):
+    """Transport adapter that answers like the backend: ETags on GET, writes change the ETag."""
+
+    def __init__(self):
+        super().__init__()
+        self.version = 1
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append((request.method, request.path_url, request.headers.get("If-None-Match")))
+        response = Response()
+        response.request = request
+        response.url = request.url
+        etag = f'"v{self.version}"'
+        if request.method == "POST" and request.path_url.startswith("/expenses/"):
+            self.version += 1
+            body = {"message": "Expenses updated successfully"}
+        elif request.method == "GET" and request.headers.get("If-None-Match") == etag:
+            response.status_code = 304
+            response.headers["ETag"] = etag
+            response._content = b""
+            return response
+        else:
+            body = [{"amount": float(self.version), "category": "Food", "notes": ""}]
+        response.status_code = 200
+        response.headers["ETag"] = etag
+        response._content = json.dumps(body).encode()
+        return response
+
+    def close(self):
+        pass
+
+def make_client(ttl=60, max_entries=256):
+    client = ApiClient("http://backend", ttl=ttl, max_entries=max_entries)
+    backend = FakeBackend()
+    client.session.mount("http://", backend)
+    return client, backend
+
+def test_fresh_reads_come_from_the_cache():
+    client, backend = make_client()
+    first = client.get("/expenses/2024-08-01")
+    second = client.get("/expenses/2024-08-01")
+    assert first.status_code == 200 and second == first
+    assert len(backend.requests) == 1
+
+def test_stale_reads_revalidate_with_etag():
+    client, backend = make_client(ttl=0)
+    first = client.get("/expenses/2024-08-01")
+    again = client.get("/expenses/2024-08-01")
+    assert again.data == first.data
+    assert backend.requests[-1] == ("GET", "/expenses/2024-08-01", '"v1"')
+
+def test_writes_invalidate_cached_reads():
+    client, backend = make_client()
+    client.get("/expenses/2024-08-01")
+    client.query("/analytics/", {"start_date": "2024-08-01", "end_date": "2024-08-31"})
+    client.post("/expenses/2024-08-01", [{"amount": 2.0, "category": "Food", "notes": ""}])
+    assert client.get("/expenses/2024-08-01").data[0]["amount"] == 2.0
+    client.query("/analytics/", {"start_date": "2024-08-01", "end_date": "2024-08-31"})
+    assert [method for method, _, _ in backend.requests] == ["GET", "POST", "POST", "GET", "POST"]
+
+def test_cache_drops_least_recently_used_reads():
+    client, backend = make_client(max_entries=2)
+    client.get("/expenses/2024-08-01")
+    client.get("/expenses/2024-08-02")
+    client.get("/expenses/2024-08-01")
+    client.get("/expenses/2024-08-03")
+    assert len(client._cache) == 2
+    client.get("/expenses/2024-08-01")
+    client.get("/expenses/2024-08-02")
+    assert [path for _, path, _ in backend.requests] == [
+        "/expenses/2024-08-01", "/expenses/2024-08-02", "/expenses/2024-08-03", "/expenses/2024-08-02",
+    ]
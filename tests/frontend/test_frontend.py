@@ -2,17 +2,24 @@ import pytest
 import requests
 from unittest.mock import patch
 import streamlit as st
+from api_client import client
 from frontend.add_update_ui import add_update_tab
 from frontend.analyze_by_category import analyze_by_category_tab
 from frontend.analyze_by_month import analyze_by_month_tab
 
 
+@pytest.fixture(autouse=True)
+def expire_api_cache():
+    # The tabs share one API client; keep one test's mocked answers out of the next.
+    client.invalidate()
+
+
 def test_fetch_expenses_success():
     mock_response = [
         {"amount": 20.0, "category": "Food", "notes": "Lunch"},
         {"amount": 15.0, "category": "Entertainment", "notes": "Movie"}
     ]
-    with patch("requests.get") as mock_get:
+    with patch.object(client.session, "get") as mock_get:
         mock_get.return_value.status_code = 200
         mock_get.return_value.json.return_value = mock_response
         
@@ -22,7 +29,7 @@ def test_fetch_expenses_success():
         assert st._main._current_form is not None
 
 def test_fetch_expenses_failure():
-    with patch("requests.get") as mock_get:
+    with patch.object(client.session, "get") as mock_get:
         mock_get.return_value.status_code = 500
         mock_get.return_value.json.return_value = {"detail": "Server error"}
         
@@ -36,9 +43,9 @@ def test_analyze_by_category_success():
         {"category": "Food", "total": 50.0, "percentage": 50.0},
         {"category": "Shopping", "total": 50.0, "percentage": 50.0}
     ]
-    with patch("requests.post") as mock_post:
-        mock_post.return_value.status_code = 200
-        mock_post.return_value.json.return_value = mock_response
+    with patch.object(client.session, "get") as mock_get:
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = mock_response
         
         with st.container():
             analyze_by_category_tab()
@@ -46,8 +53,8 @@ def test_analyze_by_category_success():
         assert "Expense Breakdown" in st._main._titles
 
 def test_analyze_by_category_failure():
-    with patch("requests.post") as mock_post:
-        mock_post.return_value.status_code = 500
+    with patch.object(client.session, "get") as mock_get:
+        mock_get.return_value.status_code = 500
         
         with st.container():
             analyze_by_category_tab()
@@ -56,10 +63,10 @@ def test_analyze_by_category_failure():
 
 def test_analyze_by_month_success():
     mock_response = [
-        {"category": "Rent", "total": 500.0},
-        {"category": "Utilities", "total": 100.0}
+        {"year": 2024, "month": 1, "total": 500.0},
+        {"year": 2024, "month": 2, "total": 100.0}
     ]
-    with patch("requests.post") as mock_post:
+    with patch.object(client.session, "post") as mock_post:
         mock_post.return_value.status_code = 200
         mock_post.return_value.json.return_value = mock_response
         
@@ -69,7 +76,7 @@ def test_analyze_by_month_success():
         assert "Monthly Expense Analysis" in st._main._titles
 
 def test_analyze_by_month_failure():
-    with patch("requests.post") as mock_post:
+    with patch.object(client.session, "post") as mock_post:
         mock_post.return_value.status_code = 500
         
         with st.container():
@@ -0,0 +1,10 @@
+import os
+
+BUDGET_SCALE = float(os.getenv("IMPORT_BUDGET_SCALE", "1"))
+
+def test_tabs_import_without_plotting_libraries(profile_import):
+    for module in ("add_update_ui", "analyze_by_category", "analyze_by_month"):
+        report = profile_import(module, "frontend")
+        assert "pandas" not in report["modules"], module
+        assert "matplotlib" not in report["modules"], module
+        assert report["seconds"] < 3.0 * BUDGET_SCALE, module